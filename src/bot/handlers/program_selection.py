@@ -11,6 +11,7 @@ from ..keyboards.inline_keyboards import (
 )
 from ...data.models import UserProfile
 from ...data.json_storage import storage
+from ...services.recommendation_cache import recommendation_cache
 from ...utils.logger import logger
 
 router = Router() 
@@ -196,6 +197,8 @@ async def goals_done(callback: CallbackQuery, state: FSMContext):
     )
     
     await storage.save_user_profile(user_profile)
+    # Пока пользователь дойдет до кнопки рекомендаций, ответ уже будет готов
+    recommendation_cache.precompute(user_profile, await storage.load_programs())
     
     await callback.message.edit_text(
         "Профиль обновлен! Теперь вы можете получить персональные рекомендации.",
@@ -232,6 +235,7 @@ async def skip_profile(callback: CallbackQuery, state: FSMContext):
     )
     
     await storage.save_user_profile(user_profile)
+    recommendation_cache.precompute(user_profile, await storage.load_programs())
     
     await callback.message.edit_text(
         "Профиль сохранен! Вы можете дополнить его позже.",
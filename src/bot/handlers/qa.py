@@ -2,15 +2,37 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from typing import List
+import asyncio
 
 from ..states.user_states import UserStates
 from ..keyboards.inline_keyboards import get_main_menu_keyboard, get_menu_button_keyboard
 from ...services.llm_service import llm_service
 from ...data.json_storage import storage
+from ...services.search_index import course_index_service, tokenize, PHRASE_MATCH_SCORE, CourseHit
+from ...services.embedding_index import COURSE_DOCUMENT, SEMANTIC_MIN_SCORE
+from ...services.hybrid_retrieval import hybrid_retriever, build_context
+from ...services.course_scoring import course_scoring_service
+from ...services.intent_router import intent_router, OPEN_INTENT, COURSE_INTENT
+from ...services.generation_tracker import generation_tracker
+from ...services.prompt_prefix import prompt_prefixes
 from ...utils.logger import logger
+from ...utils.keyword_automaton import KeywordAutomaton
+from ...utils.config import settings
+from ...utils.async_tasks import cancel_and_wait
+from ...utils.deadline import Deadline
 
 router = Router()
 
+# Сколько ждать LLM, если уже найден локальный ответ по данным программ
+LOCAL_ANSWER_GRACE_SECONDS = 8.0
+# Общее время на ответ, включая все обращения к LLM
+QA_DEADLINE_SECONDS = 30.0
+# Сколько курсов показывать по смысловому поиску
+SEMANTIC_TOP_K = 5
+# Сколько ждать эмбеддинг вопроса перед запросом к LLM: поиск по смыслу только дополняет
+# контекст и не должен съедать время ответа, без него остаются результаты BM25
+RETRIEVAL_EMBED_SECONDS = 1.5
+
 @router.callback_query(F.data == "qa_mode")
 async def enter_qa_mode(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
@@ -33,6 +55,7 @@ async def process_question(message: Message, state: FSMContext):
     question = message.text.strip()
     
     if question.lower() in ['/menu', 'меню', 'назад']:
+        await generation_tracker.cancel(user_id)
         await message.answer(
             "Возвращаемся в главное меню.",
             reply_markup=get_main_menu_keyboard()
@@ -57,26 +80,73 @@ async def process_question(message: Message, state: FSMContext):
         logger.info("Irrelevant question filtered", user_id=user_id, question=question[:50])
         return
     
+    # Новый вопрос делает ответ на предыдущий ненужным
+    await generation_tracker.cancel(user_id, reason="new_question")
+    
+    # Структурированные вопросы (стоимость, общежитие, курсы) отвечаем из данных без LLM
+    try:
+        local_answer = _try_local_answer(question, await storage.load_programs())
+    except Exception as e:
+        logger.error("Local answer failed", user_id=user_id, error=str(e))
+        local_answer = None
+    
+    if local_answer:
+        await message.answer(
+            f"💡 **Ответ на ваш вопрос:**\n\n{local_answer}\n\n"
+            "❓ Есть еще вопросы? Задавайте!",
+            reply_markup=get_menu_button_keyboard(),
+            parse_mode="Markdown"
+        )
+        logger.info("Question answered locally", user_id=user_id)
+        return
+    
     # Показываем индикатор печати
     processing_msg = await message.answer(
         "Генерация ответа... Пожалуйста, подождите.",
         reply_markup=get_menu_button_keyboard()
     )
     
+    generation = await generation_tracker.start(
+        user_id, _generate_answer(message, question, user_id, processing_msg)
+    )
+    try:
+        await generation
+    except asyncio.CancelledError:
+        # Отменили сам обработчик - пробрасываем, отменили генерацию - просто выходим
+        if asyncio.current_task().cancelling():
+            raise
+
+async def _generate_answer(message: Message, question: str, user_id: str, processing_msg: Message):
+    """Генерирует и отправляет ответ; задача отменяется новым вопросом или выходом из режима"""
+    deadline = Deadline(QA_DEADLINE_SECONDS)
     try:
         # Загружаем только программы для прямых ответов
         programs = await storage.load_programs()
         
-        # Строим полный контекст со всеми программами и курсами
-        context = _build_full_programs_context(programs)
+        # Каталог собирается один раз на снимок программ и не меняется между вопросами
+        context = prompt_prefixes.get("qa", programs)
         
-        # Значительно ограничиваем размер контекста для быстрой работы
-        max_context_length = 15000  # Уменьшаем для быстрой работы
-        if len(context) > max_context_length:
-            context = context[:max_context_length] + "\n\n[Контекст сокращен]"
+        # Локальный поиск готовим заранее: если LLM не успеет или не справится, он станет ответом
+        data_answer = _try_data_search(question, programs)
+        # Курсы и фрагменты описаний программ, найденные по словам и по смыслу вопроса
+        retrieval = await hybrid_retriever.retrieve(
+            question, programs, embed_timeout=deadline.timeout(RETRIEVAL_EMBED_SECONDS)
+        )
+        if not data_answer:
+            # По словам ничего не нашлось - берем курсы, близкие по смыслу ("NLP" -> "Обработка естественного языка")
+            data_answer = _try_semantic_answer(retrieval.semantic)
         
-        # Генерируем прямой ответ через LLM
-        answer = await llm_service.answer_question(question, context)
+        # Генерируем прямой ответ через LLM; при наличии локального ответа ждем ограниченное время
+        if llm_service.breaker.is_open:
+            # Ollama недоступна - сразу отвечаем по данным, не дожидаясь таймаутов
+            logger.info("LLM circuit open, skipping LLM stages", user_id=user_id)
+            answer = None
+        else:
+            answer = await _race_llm_with_local(
+                llm_service.answer_question(question, context, deadline=deadline, retrieved=build_context(retrieval.documents)),
+                data_answer,
+                grace=deadline.timeout(LOCAL_ANSWER_GRACE_SECONDS)
+            )
         
         if answer:
             # LLM успешно ответил с данными
@@ -96,8 +166,6 @@ async def process_question(message: Message, state: FSMContext):
             logger.info("LLM failed with data, trying multi-level approach", user_id=user_id)
             
             # Этап 1: Проверяем, есть ли конкретные данные в вопросе
-            data_answer = _try_data_search(question, programs)
-            
             if data_answer:
                 # Найдены конкретные данные
                 await processing_msg.delete()
@@ -110,7 +178,7 @@ async def process_question(message: Message, state: FSMContext):
                 logger.info("Question answered via data search", user_id=user_id)
             else:
                 # Этап 2: Пробуем LLM для общих вопросов без больших данных
-                general_answer = await _try_general_llm_answer(question)
+                general_answer = None if llm_service.breaker.is_open else await _try_general_llm_answer(question, deadline)
                 
                 if general_answer and general_answer.strip():
                     await processing_msg.delete()
@@ -132,6 +200,13 @@ async def process_question(message: Message, state: FSMContext):
                     )
                     logger.warning("Used fallback answer", user_id=user_id, question=question[:50])
     
+    except asyncio.CancelledError:
+        # Ответ устарел: убираем индикатор, запрос к LLM уже прерван
+        try:
+            await processing_msg.delete()
+        except Exception:
+            pass
+        raise
     except Exception as e:
         logger.error("Error in Q&A processing", user_id=user_id, error=str(e))
         
@@ -146,6 +221,18 @@ async def process_question(message: Message, state: FSMContext):
             reply_markup=get_menu_button_keyboard()
         )
 
+def _build_qa_prefix(programs) -> str:
+    """Каталог программ для Q&A - стабильный префикс промпта"""
+    # Строим полный контекст со всеми программами и курсами
+    context = _build_full_programs_context(programs)
+    
+    # Значительно ограничиваем размер контекста для быстрой работы
+    max_context_length = 15000  # Уменьшаем для быстрой работы
+    if len(context) > max_context_length:
+        context = context[:max_context_length] + "\n\n[Контекст сокращен]"
+    
+    return context
+
 def _build_full_programs_context(programs) -> str:
     """Строит полный контекст со всеми данными о программах для Q&A"""
     if not programs:
@@ -184,7 +271,8 @@ def _filter_relevant_courses(programs, user_profile):
     if not user_profile or not user_profile.interests:
         return programs
     
-    user_interests = [interest.lower() for interest in user_profile.interests]
+    # Выборочные курсы всех программ, оцененные по профилю за один проход
+    scored_electives = course_scoring_service.rank(user_profile, programs, electives_only=True)
     
     filtered_programs = []
     for program in programs:
@@ -194,16 +282,9 @@ def _filter_relevant_courses(programs, user_profile):
         mandatory_courses = [course for course in program.courses if not course.is_elective]
         relevant_courses.extend(mandatory_courses)
         
-        # Фильтруем выборочные курсы по интересам
+        # Релевантные выборочные курсы - в порядке убывания оценки
         elective_courses = [course for course in program.courses if course.is_elective]
-        for course in elective_courses:
-            course_name_lower = course.name.lower()
-            for interest in user_interests:
-                # Проверяем совпадение по ключевым словам
-                interest_words = interest.split()
-                if any(word in course_name_lower for word in interest_words if len(word) > 2):
-                    relevant_courses.append(course)
-                    break
+        relevant_courses.extend(scored.course for scored in scored_electives if scored.program.id == program.id)
         
         # Если релевантных выборочных курсов мало, добавляем еще несколько
         if len([c for c in relevant_courses if c.is_elective]) < 3:
@@ -262,68 +343,89 @@ def _build_personalized_context(programs, user_profile):
     
     return context
 
+def _format_found_courses(hits: list) -> str:
+    """Форматирует найденные курсы для ответа пользователю"""
+    if len(hits) == 1:
+        program, course = hits[0].program, hits[0].course
+        course_type = "выборочный" if course.is_elective else "обязательный"
+        return f"Курс **{course.name}** есть в программе **{program.name}** ({course_type}, {course.credits} кредитов, {course.semester} семестр)."
+    
+    answer = f"Найдено курсов: {len(hits)}\n\n"
+    for hit in hits[:5]:  # Показываем максимум 5
+        course = hit.course
+        course_type = "выборочный" if course.is_elective else "обязательный"
+        answer += f"• **{course.name}** ({course_type})\n"
+        answer += f"  Программа: {hit.program.name}\n"
+        answer += f"  Кредиты: {course.credits}, Семестр: {course.semester}\n\n"
+    return answer
+
+async def _race_llm_with_local(llm_call, local_answer: str, grace: float = LOCAL_ANSWER_GRACE_SECONDS) -> str:
+    """Ждет ответ LLM; если есть локальный ответ, ждет не дольше grace секунд.
+    
+    Незавершенный запрос к LLM отменяется, что закрывает соединение и освобождает Ollama.
+    """
+    llm_task = asyncio.create_task(llm_call)
+    try:
+        if not local_answer:
+            return await llm_task
+        
+        done, _ = await asyncio.wait({llm_task}, timeout=grace)
+        if llm_task in done:
+            return llm_task.result()
+        
+        logger.info("LLM answer is late, using local answer", grace_seconds=grace)
+        return None
+    finally:
+        await cancel_and_wait(llm_task)
+
+def _try_local_answer(question: str, programs: list) -> str:
+    """Этап 0: Отвечает по шаблону, если намерение вопроса распознано локально"""
+    match = intent_router.classify(question)
+    if match.intents == (OPEN_INTENT,):
+        # Вопрос состоит из названия курса - ответ точный, LLM не нужна
+        question_tokens = set(tokenize(question))
+        exact_courses = [
+            hit for hit in course_index_service.get_index(programs).search_courses(question, fuzzy=False)
+            if hit.score >= PHRASE_MATCH_SCORE and question_tokens <= set(tokenize(hit.course.name))
+        ]
+        return _format_found_courses(exact_courses) if exact_courses else None
+    
+    if match.intents == (COURSE_INTENT,):
+        found_courses = course_index_service.get_index(programs).search_courses(question)
+        return _format_found_courses(found_courses) if found_courses else None
+    
+    return intent_router.answer_fields(question, match, programs)
+
 def _try_data_search(question: str, programs: list) -> str:
     """Этап 1: Ищет конкретные данные в программах и курсах"""
-    question_lower = question.lower()
-    logger.info("Trying data search", question=question_lower[:50])
-    
-    # Используем существующую логику поиска курсов
-    found_courses = []
+    logger.info("Trying data search", question=question.lower()[:50])
     
-    for program in programs:
-        for course in program.courses:
-            course_name_lower = course.name.lower()
-            
-            # Поиск по точному совпадению фразы (убираем знаки пунктуации)
-            course_clean = course_name_lower.replace(',', '').replace('.', '').replace('?', '').replace('!', '')
-            question_clean = question_lower.replace(',', '').replace('.', '').replace('?', '').replace('!', '')
-            
-            if course_clean in question_clean or question_clean in course_clean:
-                found_courses.append((program.name, course.name, course.credits, course.semester, course.is_elective))
-                continue
-            
-            # Поиск по ключевым словам
-            course_words = [word for word in course_clean.split() if len(word) > 2]
-            question_words = [word for word in question_clean.split() if len(word) > 2]
-            
-            matches = sum(1 for word in course_words if word in question_words)
-            if matches >= 2 and len(course_words) >= 2:
-                found_courses.append((program.name, course.name, course.credits, course.semester, course.is_elective))
-            elif matches >= 1 and len(course_words) >= 2:
-                partial_matches = 0
-                for course_word in course_words:
-                    for question_word in question_words:
-                        if (len(course_word) > 4 and len(question_word) > 4 and 
-                            (course_word in question_word or question_word in course_word)):
-                            partial_matches += 1
-                            break
-                
-                if partial_matches >= 1:
-                    found_courses.append((program.name, course.name, course.credits, course.semester, course.is_elective))
+    index = course_index_service.get_index(programs)
     
     # Если нашли курсы, возвращаем результат
+    found_courses = index.search_courses(question)
     if found_courses:
-        if len(found_courses) == 1:
-            program_name, course_name, credits, semester, is_elective = found_courses[0]
-            course_type = "выборочный" if is_elective else "обязательный"
-            return f"Курс **{course_name}** есть в программе **{program_name}** ({course_type}, {credits} кредитов, {semester} семестр)."
-        else:
-            answer = f"Найдено курсов: {len(found_courses)}\n\n"
-            for program_name, course_name, credits, semester, is_elective in found_courses[:5]:
-                course_type = "выборочный" if is_elective else "обязательный"
-                answer += f"• **{course_name}** ({course_type})\n"
-                answer += f"  Программа: {program_name}\n"
-                answer += f"  Кредиты: {credits}, Семестр: {semester}\n\n"
-            return answer
+        return _format_found_courses(found_courses)
     
     # Поиск по названиям программ
-    for program in programs:
-        if program.name.lower() in question_lower or any(word in program.name.lower().split() for word in question_lower.split() if len(word) > 3):
-            return f"Программа **{program.name}**: {program.description or 'Инновационная программа по ИИ'}. Включает {len(program.courses)} курсов, {program.total_credits} кредитов."
+    program = index.search_program(question)
+    if program:
+        return f"Программа **{program.name}**: {program.description or 'Инновационная программа по ИИ'}. Включает {len(program.courses)} курсов, {program.total_credits} кредитов."
     
     return None  # Конкретные данные не найдены
 
-async def _try_general_llm_answer(question: str) -> str:
+def _try_semantic_answer(semantic_results: list) -> str:
+    """Этап 1б: Курсы, найденные индексом эмбеддингов по смыслу вопроса"""
+    hits = [
+        CourseHit(document.program, document.course, score)
+        for document, score in semantic_results
+        if document.kind == COURSE_DOCUMENT and score >= SEMANTIC_MIN_SCORE
+    ][:SEMANTIC_TOP_K]
+    if hits:
+        logger.info("Courses found by semantic search", courses=len(hits), best_score=round(hits[0].score, 3))
+    return _format_found_courses(hits) if hits else None
+
+async def _try_general_llm_answer(question: str, deadline: Deadline = None) -> str:
     """Этап 2: Пробует LLM для общих вопросов без большого контекста"""
     from ...services.llm_service import llm_service
     
@@ -343,28 +445,37 @@ async def _try_general_llm_answer(question: str) -> str:
 """
     
     try:
-        result = await llm_service.generate_response(prompt)
+        # Второе обращение к LLM получает только остаток общего времени на ответ
+        result = await llm_service.generate_response(prompt, purpose="general", deadline=deadline)
         logger.info("General LLM attempt completed", result_length=len(result) if result else 0)
         return result
     except Exception as e:
         logger.error("General LLM failed", error=str(e))
         return None
 
-def _is_relevant_question(question: str) -> bool:
-    question_lower = question.lower()
-    
+# Наборы ключевых слов фильтра релевантности; дополняются через BLOCKED_KEYWORDS
+RELEVANCE_KEYWORDS = {
     # Явно запрещенные темы
-    forbidden_keywords = [
+    'off_topic': [
         'погода', 'новости', 'спорт', 'политика', 'развлечения',
-        'фильм', 'музыка', 'игра', 'готовка', 'путешествие',
+        'фильм', 'музыка', 'игра', 'готовка', 'путешествие'
+    ],
+    # Попытки изменить поведение бота
+    'prompt_injection': [
         'игнорируй', 'не следуй', 'забудь', 'отмени',
         'притворись', 'веди себя как', 'роль'
-    ]
-    
-    # Проверяем запрещенные темы
-    for keyword in forbidden_keywords:
-        if keyword in question_lower:
-            return False
+    ],
+    'blocked': settings.BLOCKED_KEYWORDS
+}
+
+_relevance_automaton = KeywordAutomaton(RELEVANCE_KEYWORDS)
+
+def _is_relevant_question(question: str) -> bool:
+    # Один проход по тексту находит все запрещенные категории
+    categories = _relevance_automaton.classify(question)
+    if categories:
+        logger.info("Question filtered", categories=sorted(categories))
+        return False
     
     # Все остальные вопросы считаем релевантными (более открытый подход)
     return True
@@ -444,59 +555,12 @@ def _get_personalized_programs_summary(programs: list, user_profile) -> str:
 
 def _generate_simple_fallback_answer(question: str, programs: list) -> str:
     """Генерирует простой прямой ответ на основе вопроса"""
-    question_lower = question.lower()
-    logger.info("Fallback search", question=question_lower, programs_count=len(programs))
-    
-    # Ищем курсы по названию (улучшенный поиск)
-    found_courses = []
-    
-    for program in programs:
-        for course in program.courses:
-            course_name_lower = course.name.lower()
-            
-            # Поиск по точному совпадению фразы (убираем знаки пунктуации)
-            course_clean = course_name_lower.replace(',', '').replace('.', '').replace('?', '').replace('!', '')
-            question_clean = question_lower.replace(',', '').replace('.', '').replace('?', '').replace('!', '')
-            
-            if course_clean in question_clean or question_clean in course_clean:
-                found_courses.append((program.name, course.name, course.credits, course.semester, course.is_elective))
-                continue
-            
-            # Поиск по ключевым словам (минимум 2 совпадения из 3+ символов)
-            course_words = [word for word in course_clean.split() if len(word) > 2]  # Снижаем до 2+ символов
-            question_words = [word for word in question_clean.split() if len(word) > 2]
-            
-            matches = sum(1 for word in course_words if word in question_words)
-            if matches >= 2 and len(course_words) >= 2:
-                found_courses.append((program.name, course.name, course.credits, course.semester, course.is_elective))
-            
-            # Дополнительный поиск по частичным совпадениям (для случаев с опечатками)
-            elif matches >= 1 and len(course_words) >= 2:
-                # Проверяем частичное совпадение слов (например, "алгоритм" найдет "алгоритмы")
-                partial_matches = 0
-                for course_word in course_words:
-                    for question_word in question_words:
-                        if (len(course_word) > 4 and len(question_word) > 4 and 
-                            (course_word in question_word or question_word in course_word)):
-                            partial_matches += 1
-                            break
-                
-                if partial_matches >= 1:
-                    found_courses.append((program.name, course.name, course.credits, course.semester, course.is_elective))
+    logger.info("Fallback search", question=question.lower(), programs_count=len(programs))
     
+    # Ищем курсы по названию через индекс
+    found_courses = course_index_service.get_index(programs).search_courses(question)
     if found_courses:
-        if len(found_courses) == 1:
-            program_name, course_name, credits, semester, is_elective = found_courses[0]
-            course_type = "выборочный" if is_elective else "обязательный"
-            return f"Курс **{course_name}** есть в программе **{program_name}** ({course_type}, {credits} кредитов, {semester} семестр)."
-        else:
-            answer = f"Найдено курсов: {len(found_courses)}\n\n"
-            for program_name, course_name, credits, semester, is_elective in found_courses[:5]:  # Показываем максимум 5
-                course_type = "выборочный" if is_elective else "обязательный"
-                answer += f"• **{course_name}** ({course_type})\n"
-                answer += f"  Программа: {program_name}\n"
-                answer += f"  Кредиты: {credits}, Семестр: {semester}\n\n"
-            return answer
+        return _format_found_courses(found_courses)
     
     # Общий ответ если ничего конкретного не найдено
     return f"""
@@ -521,4 +585,6 @@ def _get_programs_summary(programs: list) -> str:
         summary += f"• **{program.name}** - {program.description or 'Инновационная программа по ИИ'}\n"
         summary += f"  └ {len(program.courses)} курсов, {program.total_credits} кредитов\n"
     
-    return summary 
\ No newline at end of file
+    return summary
+
+prompt_prefixes.register("qa", _build_qa_prefix, llm_service.prime_qa_prefix, purpose="qa")
@@ -9,13 +9,20 @@ from ..keyboards.inline_keyboards import (
     get_export_keyboard, get_profile_setup_keyboard,
     get_menu_button_keyboard, get_program_actions_keyboard
 )
-from ...services.recommendation_service import recommendation_service
+from ...services.recommendation_service import recommendation_service, profile_keywords
+from ...services.llm_service import llm_service
+from ...services.prompt_prefix import prompt_prefixes
+from ...services.recommendation_cache import recommendation_cache
 from ...data.json_storage import storage
 from ...utils.logger import logger
+from ...utils.deadline import Deadline
 import re
 
 router = Router()
 
+# Время на генерацию персональных рекомендаций; длина ответа подстраивается под него
+RECOMMENDATIONS_DEADLINE_SECONDS = 30.0
+
 @router.callback_query(F.data == "get_recommendations")
 async def get_recommendations(callback: CallbackQuery, state: FSMContext):
     user_id = str(callback.from_user.id)
@@ -43,8 +50,8 @@ async def get_recommendations(callback: CallbackQuery, state: FSMContext):
             await callback.answer()
             return
         
-        # Генерируем персональные рекомендации через LLM
-        recommendation = await _generate_personalized_recommendations_llm(user_profile, programs)
+        # Рекомендация для такого же профиля обычно уже посчитана после сохранения профиля
+        recommendation = await recommendation_cache.get(user_profile, programs)
         
         if not recommendation:
             # Fallback рекомендации если LLM недоступна
@@ -69,16 +76,27 @@ async def get_recommendations(callback: CallbackQuery, state: FSMContext):
 
 async def _generate_personalized_recommendations_llm(user_profile, programs):
     """Генерирует персональные рекомендации через LLM с точки зрения выбора"""
-    from ...services.llm_service import llm_service
-    
-    # Формируем контекст с профилем пользователя и всеми данными о программах
+    # Формируем контекст с профилем пользователя; каталог и инструкции - общий префикс промпта
     user_context = f"""
 Профиль пользователя:
 - Образование/опыт: {user_profile.background or 'Не указано'}
 - Интересы: {', '.join(user_profile.interests) if user_profile.interests else 'Не указаны'}
 - Цели обучения: {', '.join(user_profile.goals) if user_profile.goals else 'Не указаны'}
+
+Ответ:
 """
     
+    try:
+        return await llm_service.chat(
+            prompt_prefixes.get("recommendations", programs), user_context,
+            purpose="recommendations", deadline=Deadline(RECOMMENDATIONS_DEADLINE_SECONDS)
+        )
+    except Exception as e:
+        logger.error("Failed to generate LLM recommendations", error=str(e))
+        return None
+
+def _build_recommendations_prefix(programs) -> str:
+    """Инструкции и полный каталог программ - одинаковы для всех пользователей"""
     # Формируем полную информацию о программах и курсах
     programs_context = "Доступные магистерские программы ИТМО:\n\n"
     for program in programs:
@@ -105,11 +123,9 @@ async def _generate_personalized_recommendations_llm(user_profile, programs):
         
         programs_context += "=" * 50 + "\n\n"
     
-    prompt = f"""
+    return f"""
 Ты - опытный консультант по образованию, который сам прошел обучение в сфере ИИ. 
 
-{user_context}
-
 {programs_context}
 
 ЗАДАЧА: На основе профиля пользователя выбери программу, на которую бы ты сам пошел, будучи на его месте, и объясни почему именно эта программа подходит под его профиль.
@@ -128,28 +144,20 @@ async def _generate_personalized_recommendations_llm(user_profile, programs):
 4. Практические советы
 
 СТИЛЬ: Личный, экспертный, с конкретными рекомендациями. Используй эмодзи.
-
-Ответ:
 """
-    
-    try:
-        return await llm_service.generate_response(prompt)
-    except Exception as e:
-        logger.error("Failed to generate LLM recommendations", error=str(e))
-        return None
 
 def _generate_fallback_recommendations(user_profile) -> str:
     """Fallback рекомендации когда LLM недоступна"""
     
-    background = user_profile.background.lower() if user_profile.background else ""
-    interests = [interest.lower() for interest in user_profile.interests]
-    goals = [goal.lower() for goal in user_profile.goals]
+    # Анализируем профиль: каждое поле классифицируется за один проход
+    background_categories = profile_keywords.classify(user_profile.background or "")
+    interest_categories = profile_keywords.classify_many(user_profile.interests)
+    goal_categories = profile_keywords.classify_many(user_profile.goals)
     
-    # Анализируем профиль
-    has_tech_background = any(keyword in background for keyword in ['информатик', 'программ', 'it', 'техническ'])
-    interested_in_ml = any(keyword in interest for interest in interests for keyword in ['машинное обучение', 'данные', 'ml'])
-    interested_in_products = any(keyword in interest for interest in interests for keyword in ['продукт', 'стартап', 'бизнес'])
-    wants_career = any(keyword in goal for goal in goals for keyword in ['карьер', 'it'])
+    has_tech_background = 'tech_background' in background_categories
+    interested_in_ml = 'ml' in interest_categories
+    interested_in_products = 'products' in interest_categories
+    wants_career = 'career' in goal_categories
     
     recommendations = f"""
 🎯 *ПЕРСОНАЛЬНЫЕ РЕКОМЕНДАЦИИ*
@@ -532,4 +540,11 @@ async def export_as_message(callback: CallbackQuery, state: FSMContext):
             reply_markup=get_main_menu_keyboard()
         )
     
-    await callback.answer() 
\ No newline at end of file
+    await callback.answer()
+
+prompt_prefixes.register(
+    "recommendations", _build_recommendations_prefix,
+    lambda prefix: llm_service.prime_prefix(prefix, purpose="recommendations"),
+    purpose="recommendations"
+)
+recommendation_cache.register(_generate_personalized_recommendations_llm)
@@ -8,6 +8,7 @@ from ..states.user_states import UserStates
 from ..keyboards.inline_keyboards import get_main_menu_keyboard, get_profile_setup_keyboard
 from ...data.models import UserProfile
 from ...data.json_storage import storage
+from ...services.generation_tracker import generation_tracker
 from ...utils.logger import logger
 
 router = Router()
@@ -18,6 +19,7 @@ async def start_command(message: Message, state: FSMContext):
     username = message.from_user.username
     
     logger.info("User started bot", user_id=user_id, username=username)
+    await generation_tracker.cancel(user_id)
     
     # Проверяем, есть ли уже профиль пользователя
     user_profile = await storage.load_user_profile(user_id)
@@ -93,6 +95,7 @@ async def profile_command(message: Message):
 @router.message(Command("reset"))
 async def reset_command(message: Message, state: FSMContext):
     user_id = str(message.from_user.id)
+    await generation_tracker.cancel(user_id)
     
     # Удаляем профиль пользователя
     user_file = storage.users_dir / f"{user_id}.json"
@@ -110,6 +113,8 @@ async def reset_command(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "back_to_main")
 async def back_to_main(callback: CallbackQuery, state: FSMContext):
+    await generation_tracker.cancel(str(callback.from_user.id))
+    
     try:
         # Пытаемся отредактировать сообщение (работает для текстовых сообщений)
         await callback.message.edit_text(
@@ -0,0 +1,259 @@
+"""Компактный бинарный формат снимка программ.
+
+Структура файла (little-endian):
+    заголовок | таблица программ | таблицы курсов | списки строк | смещения строк | блоб строк
+
+Все строки хранятся один раз в таблице строк, записи ссылаются на них по индексу.
+Файл читается через mmap: заголовки программ декодируются сразу, курсы программы -
+только при первом обращении к program.courses, строки - по мере необходимости.
+"""
+import mmap
+import struct
+from pathlib import Path
+from datetime import datetime
+from typing import List, Optional, Dict, Callable
+from pydantic import PrivateAttr
+from .models import Program, Course, ProgramDetails, ProgramType
+
+MAGIC = b"AMPS"
+FORMAT_VERSION = 2
+NO_STRING = 0xFFFFFFFF
+
+DETAILS_FIELDS = tuple(ProgramDetails.model_fields)
+
+# magic, версия формата, число полей ProgramDetails, число программ, число строк,
+# смещение списков, смещение таблицы строк
+HEADER = struct.Struct("<4sHHIIII")
+# id, name, type, url, description, parsed_at, хэши курсов и остальных полей,
+# total_credits, duration_semesters, has_details, поля ProgramDetails, смещение курсов, число курсов
+PROGRAM_RECORD = struct.Struct(f"<8I2iI{len(DETAILS_FIELDS)}I2I")
+# id, name, block, category, description, credits, hours, semester, is_elective,
+# начало и длина списка prerequisites
+COURSE_RECORD = struct.Struct("<5I3iI2I")
+UINT32 = struct.Struct("<I")
+
+class SnapshotFormatError(ValueError):
+    pass
+
+class LazyProgram(Program):
+    """Программа, курсы которой декодируются из снимка при первом обращении"""
+    _courses_loader: Optional[Callable[[], List[Course]]] = PrivateAttr(default=None)
+
+    def __getattr__(self, item):
+        if item == "courses" and self._courses_loader is not None:
+            courses = self._courses_loader()
+            self.__dict__["courses"] = courses
+            return courses
+        return super().__getattr__(item)
+
+    def model_dump(self, **kwargs):
+        self.courses  # Материализуем курсы перед сериализацией
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs):
+        self.courses
+        return super().model_dump_json(**kwargs)
+
+class _StringTable:
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        index = self._index.get(value)
+        if index is None:
+            index = len(self.strings)
+            self._index[value] = index
+            self.strings.append(value)
+        return index
+
+def encode_programs(programs: List[Program]) -> bytes:
+    """Кодирует программы в бинарный снимок"""
+    strings = _StringTable()
+    lists: List[int] = []
+    course_tables = []
+    program_fields = []
+
+    for program in programs:
+        course_table = bytearray()
+        for course in program.courses:
+            prerequisites_start = len(lists)
+            lists.extend(strings.add(item) for item in course.prerequisites)
+            course_table += COURSE_RECORD.pack(
+                strings.add(course.id),
+                strings.add(course.name),
+                strings.add(course.block),
+                strings.add(course.category),
+                strings.add(course.description),
+                course.credits,
+                course.hours,
+                course.semester,
+                int(course.is_elective),
+                prerequisites_start,
+                len(course.prerequisites)
+            )
+        course_tables.append(bytes(course_table))
+
+        details = program.details
+        courses_hash, fields_hash = program.content_hashes()
+        program_fields.append([
+            strings.add(program.id),
+            strings.add(program.name),
+            strings.add(program.type.value),
+            strings.add(program.url),
+            strings.add(program.description),
+            strings.add(program.parsed_at.isoformat()),
+            strings.add(courses_hash),
+            strings.add(fields_hash),
+            program.total_credits,
+            program.duration_semesters,
+            int(details is not None),
+            *(strings.add(getattr(details, field)) if details else NO_STRING for field in DETAILS_FIELDS),
+            len(program.courses)
+        ])
+
+    courses_offset = HEADER.size + PROGRAM_RECORD.size * len(programs)
+    program_table = bytearray()
+    for fields, course_table in zip(program_fields, course_tables):
+        *head, courses_count = fields
+        program_table += PROGRAM_RECORD.pack(*head, courses_offset, courses_count)
+        courses_offset += len(course_table)
+
+    lists_offset = courses_offset
+    lists_table = b"".join(UINT32.pack(item) for item in lists)
+    strings_offset = lists_offset + len(lists_table)
+
+    encoded_strings = [value.encode("utf-8") for value in strings.strings]
+    string_offsets = bytearray()
+    position = 0
+    for encoded in encoded_strings:
+        string_offsets += UINT32.pack(position)
+        position += len(encoded)
+    string_offsets += UINT32.pack(position)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(DETAILS_FIELDS), len(programs), len(encoded_strings), lists_offset, strings_offset)
+    return b"".join([header, bytes(program_table), *course_tables, lists_table, bytes(string_offsets), *encoded_strings])
+
+class ProgramsSnapshotReader:
+    """Читает бинарный снимок через mmap и декодирует данные по требованию"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._buffer) < HEADER.size:
+            self._buffer.close()
+            raise SnapshotFormatError(f"Snapshot is too short: {self.path}")
+
+        (magic, version, details_count, self._program_count, self._string_count,
+         self._lists_offset, strings_offset) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or details_count != len(DETAILS_FIELDS):
+            self._buffer.close()
+            raise SnapshotFormatError(f"Unsupported snapshot format: {self.path}")
+
+        self._string_offsets_start = strings_offset
+        self._string_blob_start = strings_offset + UINT32.size * (self._string_count + 1)
+        self._string_offsets: Optional[tuple] = None
+        self._strings: Dict[int, str] = {}
+
+    def close(self) -> None:
+        """Освобождает mmap.
+
+        Выданные программы остаются рабочими: данные снимка копируются в память
+        и освобождаются вместе с последней программой, которая на них ссылается.
+        """
+        if isinstance(self._buffer, mmap.mmap):
+            buffer = self._buffer
+            self._buffer = bytes(buffer)
+            buffer.close()
+
+    def __enter__(self) -> "ProgramsSnapshotReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _string(self, index: int) -> Optional[str]:
+        if index == NO_STRING:
+            return None
+        value = self._strings.get(index)
+        if value is None:
+            if self._string_offsets is None:
+                # Таблица смещений читается одним вызовом, сами строки декодируются по одной
+                self._string_offsets = struct.unpack_from(
+                    f"<{self._string_count + 1}I", self._buffer, self._string_offsets_start
+                )
+            start = self._string_blob_start + self._string_offsets[index]
+            end = self._string_blob_start + self._string_offsets[index + 1]
+            value = self._buffer[start:end].decode("utf-8")
+            self._strings[index] = value
+        return value
+
+    def _decode_courses(self, offset: int, count: int) -> List[Course]:
+        courses = []
+        for record in COURSE_RECORD.iter_unpack(self._buffer[offset:offset + COURSE_RECORD.size * count]):
+            (course_id, name, block, category, description,
+             credits, hours, semester, is_elective, prerequisites_start, prerequisites_count) = record
+            prerequisites = [
+                self._string(UINT32.unpack_from(self._buffer, self._lists_offset + UINT32.size * i)[0])
+                for i in range(prerequisites_start, prerequisites_start + prerequisites_count)
+            ]
+            # Данные валидировались при сохранении, поэтому собираем модели без повторной валидации
+            courses.append(Course.model_construct(
+                id=self._string(course_id),
+                name=self._string(name),
+                credits=credits,
+                hours=hours,
+                semester=semester,
+                is_elective=bool(is_elective),
+                block=self._string(block),
+                category=self._string(category),
+                prerequisites=prerequisites,
+                description=self._string(description)
+            ))
+        return courses
+
+    def _courses_loader(self, offset: int, count: int) -> Callable[[], List[Course]]:
+        decoded: List[List[Course]] = []
+
+        def load() -> List[Course]:
+            if not decoded:
+                decoded.append(self._decode_courses(offset, count))
+            return decoded[0]
+
+        return load
+
+    def programs(self) -> List[Program]:
+        programs = []
+        for i in range(self._program_count):
+            record = PROGRAM_RECORD.unpack_from(self._buffer, HEADER.size + PROGRAM_RECORD.size * i)
+            (program_id, name, program_type, url, description, parsed_at, courses_hash, fields_hash,
+             total_credits, duration_semesters, has_details) = record[:11]
+            details_values = record[11:11 + len(DETAILS_FIELDS)]
+            courses_offset, courses_count = record[-2:]
+
+            details = None
+            if has_details:
+                details = ProgramDetails.model_construct(**{
+                    field: self._string(value) for field, value in zip(DETAILS_FIELDS, details_values)
+                })
+
+            program = LazyProgram.model_construct(
+                id=self._string(program_id),
+                name=self._string(name),
+                type=ProgramType(self._string(program_type)),
+                url=self._string(url),
+                total_credits=total_credits,
+                duration_semesters=duration_semesters,
+                description=self._string(description),
+                details=details,
+                parsed_at=datetime.fromisoformat(self._string(parsed_at))
+            )
+            program._courses_loader = self._courses_loader(courses_offset, courses_count)
+            # Хэши сохранены вместе со снимком: отпечаток снимка не требует декодировать курсы
+            program._content_hashes = (self._string(courses_hash), self._string(fields_hash))
+            programs.append(program)
+        return programs
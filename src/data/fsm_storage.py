@@ -0,0 +1,158 @@
+"""Хранилище состояний FSM aiogram в SQLite.
+
+MemoryStorage теряет состояния при перезапуске (пользователь, заполнявший профиль,
+оказывается вне сценария) и хранит данные всех когда-либо писавших пользователей.
+Здесь каждая запись сразу пишется в SQLite, а в памяти остается ограниченный LRU-кэш
+недавно активных пользователей. Записи без изменений дольше TTL удаляются и из базы,
+и из кэша. Запросы к базе (и ожидание fsync при commit) выполняются в потоке, чтобы не
+останавливать цикл событий; lock сохраняет порядок операций и атомарность чтения-изменения-записи.
+"""
+import asyncio
+import copy
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from ..utils.logger import logger
+
+DEFAULT_STATE_TTL_SECONDS = 7 * 24 * 3600
+# Сколько пользователей держать в памяти
+MAX_CACHED_RECORDS = 1000
+# Как часто удалять устаревшие записи (проверяется при записи)
+EVICTION_INTERVAL_SECONDS = 3600
+
+class _Record(NamedTuple):
+    state: Optional[str]
+    data: Dict[str, Any]
+    updated_at: float
+
+class SQLiteStorage(BaseStorage):
+    def __init__(self, path: Path, ttl_seconds: float = DEFAULT_STATE_TTL_SECONDS,
+                 max_cached: int = MAX_CACHED_RECORDS, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_cached = max_cached
+        self._clock = clock
+        self._key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._cache: "OrderedDict[str, _Record]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Соединением пользуются потоки asyncio.to_thread, но всегда по одному (под self._lock)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL без fsync на каждую запись: commit короче и реже ждет диск
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS fsm_states ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+        # Устаревшие записи удаляются при первой записи; до этого _load их не возвращает
+        self._last_eviction = 0.0
+
+    def _is_stale(self, record: _Record) -> bool:
+        return self.ttl_seconds > 0 and self._clock() - record.updated_at > self.ttl_seconds
+
+    def _cache_put(self, key: str, record: _Record) -> None:
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    # Синхронные запросы к базе: вызываются через asyncio.to_thread
+
+    def _select(self, key: str) -> Optional[tuple]:
+        return self._connection.execute(
+            "SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (key,)
+        ).fetchone()
+
+    def _write(self, key: str, state: Optional[str], data_json: Optional[str], updated_at: float) -> None:
+        if data_json is None:
+            self._connection.execute("DELETE FROM fsm_states WHERE key = ?", (key,))
+        else:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                (key, state, data_json, updated_at)
+            )
+        self._connection.commit()
+
+    def _delete_stale(self, threshold: float) -> int:
+        removed = self._connection.execute("DELETE FROM fsm_states WHERE updated_at < ?", (threshold,)).rowcount
+        self._connection.commit()
+        return removed
+
+    async def _load(self, key: str) -> Optional[_Record]:
+        record = self._cache.get(key)
+        if record is None:
+            row = await asyncio.to_thread(self._select, key)
+            if row is None:
+                return None
+            record = _Record(row[0], json.loads(row[1]), row[2])
+        if self._is_stale(record):
+            self._cache.pop(key, None)
+            return None
+        self._cache_put(key, record)
+        return record
+
+    async def _save(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Пишет в базу, затем в кэш; пустая запись удаляется"""
+        updated_at = self._clock()
+        # Несериализуемые данные - ошибка обработчика: TypeError до записи, а не молча строка
+        data_json = None if state is None and not data else json.dumps(data, ensure_ascii=False)
+        await asyncio.to_thread(self._write, key, state, data_json, updated_at)
+        if data_json is None:
+            self._cache.pop(key, None)
+        else:
+            self._cache_put(key, _Record(state, data, updated_at))
+
+        if self._clock() - self._last_eviction >= EVICTION_INTERVAL_SECONDS:
+            await self._evict_stale()
+
+    async def _evict_stale(self) -> int:
+        self._last_eviction = self._clock()
+        if self.ttl_seconds <= 0:
+            return 0
+        threshold = self._last_eviction - self.ttl_seconds
+        removed = await asyncio.to_thread(self._delete_stale, threshold)
+        for key in [key for key, record in self._cache.items() if record.updated_at < threshold]:
+            del self._cache[key]
+        if removed:
+            logger.info("Stale FSM states evicted", removed=removed)
+        return removed
+
+    async def evict_stale(self) -> int:
+        """Удаляет записи, не менявшиеся дольше TTL"""
+        async with self._lock:
+            return await self._evict_stale()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self._key_builder.build(key)
+        async with self._lock:
+            record = await self._load(storage_key)
+            await self._save(storage_key, state.state if isinstance(state, State) else state, record.data if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with self._lock:
+            record = await self._load(self._key_builder.build(key))
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        storage_key = self._key_builder.build(key)
+        async with self._lock:
+            record = await self._load(storage_key)
+            await self._save(storage_key, record.state if record else None, copy.deepcopy(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self._lock:
+            record = await self._load(self._key_builder.build(key))
+        # Изменение вложенных списков обработчиком не должно менять кэш в обход базы
+        return copy.deepcopy(record.data) if record else {}
+
+    async def close(self) -> None:
+        async with self._lock:
+            await asyncio.to_thread(self._connection.close)
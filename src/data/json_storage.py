@@ -1,9 +1,12 @@
 import json
+import os
+import uuid
 import asyncio
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union, Tuple
 from datetime import datetime
-from .models import Program, UserProfile, UserSession
+from .models import Program, UserProfile, UserSession, ProgramsDiff
+from .binary_snapshot import encode_programs, ProgramsSnapshotReader, SnapshotFormatError
 from ..utils.config import settings
 from ..utils.logger import logger
 
@@ -12,34 +15,262 @@ class JSONStorage:
         self.data_dir = data_dir or settings.DATA_DIR
         self.static_dir = self.data_dir / "static"
         self.users_dir = self.data_dir / "users"
+        # Версии снимков программ и указатель на текущую версию
+        self.programs_versions_dir = self.static_dir / "programs_versions"
+        self.programs_pointer_file = self.static_dir / "programs.current"
+        self.programs_retention = max(1, settings.PROGRAMS_SNAPSHOT_RETENTION)
+        # Результаты, вычисленные по снимку программ (сравнение программ и т.п.)
+        self.artifacts_dir = self.static_dir / "artifacts"
+        # Программы загруженной версии: повторная загрузка возвращает те же объекты
+        # (из бинарного снимка курсы декодируются лениво)
+        self._programs_snapshot: Optional[Tuple[str, List[Program]]] = None
+        # Читатель бинарного снимка загруженной версии; закрывается при смене версии
+        self._programs_reader: Optional[ProgramsSnapshotReader] = None
         self._ensure_directories()
     
     def _ensure_directories(self):
         self.static_dir.mkdir(parents=True, exist_ok=True)
         self.users_dir.mkdir(parents=True, exist_ok=True)
+        self.programs_versions_dir.mkdir(parents=True, exist_ok=True)
+        self.artifacts_dir.mkdir(parents=True, exist_ok=True)
     
-    async def save_programs(self, programs: List[Program]) -> None:
+    def _write_atomic(self, file_path: Path, content: Union[str, bytes]) -> None:
+        """Пишет файл во временный и переименовывает: читатель видит либо старый, либо новый файл целиком"""
+        # Уникальное имя: одновременные записи одного файла не пишут в общий временный файл
+        tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+        try:
+            binary = isinstance(content, bytes)
+            with open(tmp_path, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
+    def _programs_version_file(self, version: str) -> Path:
+        return self.programs_versions_dir / f"programs_{version}.json"
+    
+    def _programs_binary_file(self, version: str) -> Path:
+        return self.programs_versions_dir / f"programs_{version}.bin"
+    
+    def list_programs_versions(self) -> List[str]:
+        """Возвращает сохраненные версии снимков программ от старых к новым"""
+        return sorted(
+            path.stem[len("programs_"):]
+            for path in self.programs_versions_dir.glob("programs_*.json")
+        )
+    
+    def _read_programs_pointer(self) -> Dict[str, Any]:
+        if not self.programs_pointer_file.exists():
+            return {}
+        
+        try:
+            with open(self.programs_pointer_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to read programs pointer", error=str(e))
+            return {}
+    
+    def get_current_programs_version(self) -> Optional[str]:
+        version = self._read_programs_pointer().get("version")
+        return version if version and self._programs_version_file(version).exists() else None
+    
+    def is_programs_pinned(self) -> bool:
+        """Текущая версия закреплена откатом: обновление с сайта ее не заменяет"""
+        return bool(self._read_programs_pointer().get("pinned")) and self.get_current_programs_version() is not None
+    
+    def _set_current_programs_version(self, version: str, pinned: bool = False) -> None:
+        pointer = {"version": version, "pinned": pinned, "updated_at": datetime.now().isoformat()}
+        self._write_atomic(self.programs_pointer_file, json.dumps(pointer, ensure_ascii=False))
+    
+    def _legacy_programs_file(self) -> Path:
+        # Снимок до появления версий
+        return self.static_dir / "programs.json"
+    
+    def _prune_programs_versions(self) -> None:
+        """Оставляет текущую версию и programs_retention предыдущих"""
+        current = self.get_current_programs_version()
+        versions = [version for version in self.list_programs_versions() if version != current]
+        for version in versions[:-self.programs_retention]:
+            try:
+                self._programs_binary_file(version).unlink(missing_ok=True)
+                self._programs_version_file(version).unlink()
+                logger.info("Old programs snapshot removed", version=version)
+            except OSError as e:
+                logger.error("Failed to remove programs snapshot", version=version, error=str(e))
+    
+    async def save_programs(self, programs: List[Program]) -> str:
         programs_data = [program.model_dump() for program in programs]
-        file_path = self.static_dir / "programs.json"
+        version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        file_path = self._programs_version_file(version)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(programs_data, f, ensure_ascii=False, indent=2, default=str)
+        self._write_atomic(file_path, json.dumps(programs_data, ensure_ascii=False, indent=2, default=str))
+        try:
+            self._write_atomic(self._programs_binary_file(version), encode_programs(programs))
+        except Exception as e:
+            # JSON-версия уже записана, бинарный снимок - только ускорение загрузки
+            logger.error("Failed to write binary programs snapshot", version=version, error=str(e))
+        self._set_current_programs_version(version)
+        self._prune_programs_versions()
         
-        logger.info("Programs saved", count=len(programs), file=str(file_path))
+        logger.info("Programs saved", count=len(programs), version=version, file=str(file_path))
+        return version
     
-    async def load_programs(self) -> List[Program]:
-        file_path = self.static_dir / "programs.json"
+    async def rollback_programs(self, version: Optional[str] = None, pin: bool = True) -> Optional[str]:
+        """Переключает указатель на указанную версию, по умолчанию - на предыдущую перед текущей.
+        
+        Версия закрепляется (pin): иначе обновление при следующем запуске снова сохранит
+        данные с сайта и незаметно отменит откат. Снимается закрепление через unpin_programs.
+        """
+        versions = self.list_programs_versions()
         
+        if version is None:
+            current = self.get_current_programs_version()
+            older = [v for v in versions if current is None or v < current]
+            version = older[-1] if older else None
+        
+        if not version or version not in versions:
+            logger.warning("Programs snapshot for rollback not found", version=version)
+            return None
+        
+        self._set_current_programs_version(version, pinned=pin)
+        logger.info("Programs rolled back", version=version, pinned=pin)
+        return version
+    
+    async def unpin_programs(self) -> bool:
+        """Снимает закрепление текущей версии; False, если она не была закреплена"""
+        version = self.get_current_programs_version()
+        if not version or not self.is_programs_pinned():
+            return False
+        
+        self._set_current_programs_version(version)
+        logger.info("Programs version unpinned", version=version)
+        return True
+    
+    def _set_programs_snapshot(self, version: str, programs: List[Program],
+                               reader: Optional[ProgramsSnapshotReader] = None) -> None:
+        previous_reader = self._programs_reader
+        self._programs_snapshot = (version, programs)
+        self._programs_reader = reader
+        if previous_reader is not None:
+            previous_reader.close()
+    
+    def _load_programs_snapshot(self, version: str) -> Optional[List[Program]]:
+        """Загружает программы из бинарного снимка версии; курсы декодируются при обращении"""
+        if self._programs_snapshot and self._programs_snapshot[0] == version:
+            return list(self._programs_snapshot[1])
+        
+        binary_file = self._programs_binary_file(version)
+        if not binary_file.exists():
+            return None
+        
+        reader = None
+        try:
+            reader = ProgramsSnapshotReader(binary_file)
+            programs = reader.programs()
+        except (OSError, SnapshotFormatError) as e:
+            if reader is not None:
+                reader.close()
+            logger.error("Failed to read binary programs snapshot", version=version, error=str(e))
+            return None
+        
+        self._set_programs_snapshot(version, programs, reader)
+        logger.info("Programs loaded", count=len(programs), version=version, format="binary")
+        return list(programs)
+    
+    def _read_programs_json(self, file_path: Path) -> List[Program]:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return [Program(**item) for item in data]
+    
+    async def load_programs_version(self, version: str) -> List[Program]:
+        """Загружает программы указанной сохраненной версии"""
+        programs = self._load_programs_snapshot(version)
+        if programs is not None:
+            return programs
+        
+        file_path = self._programs_version_file(version)
         if not file_path.exists():
             logger.warning("Programs file not found", file=str(file_path))
             return []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        programs = self._read_programs_json(file_path)
+        self._set_programs_snapshot(version, programs)
+        logger.info("Programs loaded", count=len(programs), version=version)
+        return list(programs)
+    
+    async def load_programs(self) -> List[Program]:
+        version = self.get_current_programs_version()
+        if version:
+            return await self.load_programs_version(version)
+        
+        file_path = self._legacy_programs_file()
+        if not file_path.exists():
+            logger.warning("Programs file not found", file=str(file_path))
+            return []
         
-        programs = [Program(**item) for item in data]
+        programs = self._read_programs_json(file_path)
         logger.info("Programs loaded", count=len(programs))
-        return programs
+        if not programs:
+            return programs
+        
+        # Переносим снимок в версии: дальше он читается из бинарного снимка и доступен для отката
+        try:
+            version = await self.save_programs(programs)
+        except OSError as e:
+            logger.error("Failed to migrate legacy programs file", error=str(e))
+            return programs
+        logger.info("Legacy programs file migrated", count=len(programs), version=version)
+        return await self.load_programs_version(version)
+    
+    async def append_programs_changelog(self, diff: ProgramsDiff) -> None:
+        """Дописывает разницу между снимками программ в журнал изменений (JSON Lines)"""
+        file_path = self.static_dir / "programs_changelog.jsonl"
+        
+        with open(file_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(diff.model_dump(), ensure_ascii=False, default=str) + "\n")
+        
+        logger.info("Programs changelog appended", changes=len(diff.changes), file=str(file_path))
+    
+    def _artifact_file(self, name: str, snapshot_version: str, suffix: str = ".json") -> Path:
+        return self.artifacts_dir / f"{name}_{snapshot_version}{suffix}"
+    
+    async def save_snapshot_artifact(self, name: str, snapshot_version: str, data: Dict[str, Any],
+                                     payload: Optional[bytes] = None) -> None:
+        """Сохраняет результат, вычисленный по снимку программ; результаты по другим снимкам удаляются.
+        
+        payload - двоичные данные рядом с JSON (например, матрица для memory-map);
+        пишутся первыми, поэтому JSON появляется только вместе с ними.
+        """
+        if payload is not None:
+            self._write_atomic(self._artifact_file(name, snapshot_version, ".bin"), payload)
+        file_path = self._artifact_file(name, snapshot_version)
+        self._write_atomic(file_path, json.dumps(data, ensure_ascii=False, default=str))
+        
+        current = {file_path, self._artifact_file(name, snapshot_version, ".bin")}
+        for stale in self.artifacts_dir.glob(f"{name}_*"):
+            if stale not in current and stale.suffix in (".json", ".bin"):
+                stale.unlink(missing_ok=True)
+        logger.info("Snapshot artifact saved", name=name, snapshot_version=snapshot_version)
+    
+    def snapshot_artifact_payload(self, name: str, snapshot_version: str) -> Optional[Path]:
+        """Путь к двоичным данным результата, если они сохранены"""
+        file_path = self._artifact_file(name, snapshot_version, ".bin")
+        return file_path if file_path.exists() else None
+    
+    async def load_snapshot_artifact(self, name: str, snapshot_version: str) -> Optional[Dict[str, Any]]:
+        file_path = self._artifact_file(name, snapshot_version)
+        if not file_path.exists():
+            return None
+        
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to read snapshot artifact", name=name, error=str(e))
+            return None
     
     async def save_user_profile(self, profile: UserProfile) -> None:
         file_path = self.users_dir / f"{profile.user_id}.json"
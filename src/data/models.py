@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+import hashlib
+import json
+from pydantic import BaseModel, PrivateAttr
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime
 from enum import Enum
 
@@ -45,6 +47,71 @@ class Program(BaseModel):
     description: Optional[str] = None
     details: Optional[ProgramDetails] = None  # Дополнительная информация
     parsed_at: datetime
+    # Хэши курсов и остальных полей: считаются один раз или читаются из бинарного снимка
+    _content_hashes: Optional[Tuple[str, str]] = PrivateAttr(default=None)
+    
+    def content_hashes(self) -> Tuple[str, str]:
+        """Хэши содержимого программы: (курсы, остальные поля).
+        
+        parsed_at и id курсов меняются при каждом парсинге и, как и при сравнении снимков,
+        не учитываются: повторный парсинг тех же данных дает те же хэши.
+        """
+        if self._content_hashes is None:
+            courses = [course.model_dump(mode="json", exclude={"id"}) for course in self.courses]
+            fields = self.model_dump(mode="json", exclude={"courses", "parsed_at"})
+            self._content_hashes = (_content_hash(courses), _content_hash(fields))
+        return self._content_hashes
+    
+    def model_copy(self, **kwargs):
+        copy = super().model_copy(**kwargs)
+        # Копию обычно меняют (например, оставляют часть курсов), хэши считаются заново
+        copy._content_hashes = None
+        return copy
+
+def _content_hash(data) -> str:
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+class CourseChange(BaseModel):
+    """Изменение курса между двумя снимками программ"""
+    key: str  # Стабильный ключ курса (название + семестр), id курсов при парсинге не стабильны
+    name: str
+    fields: List[str] = []  # Изменившиеся поля курса
+
+class ProgramChange(BaseModel):
+    """Структурные изменения одной программы"""
+    program_id: str
+    status: str  # added / removed / changed
+    changed_fields: List[str] = []  # Поля самой программы (name, description, ...)
+    changed_details: List[str] = []  # Поля ProgramDetails
+    added_courses: List[str] = []
+    removed_courses: List[str] = []
+    changed_courses: List[CourseChange] = []
+    
+    @property
+    def courses_changed(self) -> bool:
+        return bool(self.added_courses or self.removed_courses or self.changed_courses) or self.status != "changed"
+
+class ProgramsDiff(BaseModel):
+    """Разница между предыдущим и новым набором программ"""
+    changes: List[ProgramChange] = []
+    created_at: datetime
+    
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changes)
+    
+    @property
+    def affected_program_ids(self) -> List[str]:
+        return [change.program_id for change in self.changes]
+    
+    @property
+    def courses_changed(self) -> bool:
+        return any(change.courses_changed for change in self.changes)
+    
+    @property
+    def details_changed(self) -> bool:
+        return any(change.changed_details or change.changed_fields or change.status != "changed" for change in self.changes)
 
 class UserProfile(BaseModel):
     user_id: str
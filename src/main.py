@@ -1,15 +1,18 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from .utils.config import settings
 from .utils.logger import setup_logging, logger
+from .data.fsm_storage import SQLiteStorage
 from .bot.handlers import start, program_selection, recommendations, qa
 from .bot.middlewares.logging_middleware import LoggingMiddleware
 from .services.llm_service import llm_service
 from .services.parser_service import ITMOParser
-from .data.json_storage import storage
+from .services.program_changes import program_changes
+from .services.model_warmup import model_warmup
+from .services.recommendation_service import recommendation_service
+from .services.embedding_index import embedding_index_service
 
 async def on_startup():
     logger.info("Bot starting up...")
@@ -18,6 +21,8 @@ async def on_startup():
     ollama_available = await llm_service.check_connection()
     if not ollama_available:
         logger.warning("Ollama not available, some features may not work")
+    # Фоновая проверка серверов Ollama: исключенные возвращаются в пул, когда снова отвечают
+    llm_service.pool.start_health_checks(settings.OLLAMA_HEALTH_CHECK_INTERVAL)
     
     # Парсим данные программ при старте
     try:
@@ -25,25 +30,44 @@ async def on_startup():
         programs = await parser.parse_all_programs()
         
         if programs:
-            await storage.save_programs(programs)
-            logger.info("Programs data updated", count=len(programs))
+            diff = await program_changes.apply_refresh(programs)
+            logger.info("Programs data updated", count=len(programs), changes=len(diff.changes))
         else:
             logger.warning("No programs data obtained")
     
     except Exception as e:
         logger.error("Failed to parse programs on startup", error=str(e))
     
+    # Откат версии из src.manage применяется без перезапуска бота
+    program_changes.start_watch(settings.PROGRAMS_VERSION_CHECK_INTERVAL)
+    
+    # Прогрев и предвычисления - в фоне и по уже обновленному снимку: опрос Telegram
+    # начинается сразу, а результаты не устаревают сразу после обновления данных
+    if ollama_available:
+        # Модель и каталог загружаются заранее, чтобы первый ответ не ждал загрузку;
+        # если прогрев уже запущен обновлением данных, второй не начинается
+        model_warmup.start_warm_up()
+        # Сравнение программ считается один раз на снимок; если его еще нет - готовим заранее
+        recommendation_service.precompute_comparison()
+        # Эмбеддинги каталога для смыслового поиска: с диска, а если снимок новый - через Ollama
+        embedding_index_service.start_precompute()
+    model_warmup.start(settings.OLLAMA_KEEP_WARM_INTERVAL, settings.OLLAMA_KEEP_WARM_HOURS)
+    
     logger.info("Bot startup completed")
 
 async def on_shutdown():
     logger.info("Bot shutting down...")
+    await model_warmup.stop()
+    await program_changes.stop_watch()
+    await llm_service.pool.stop_health_checks()
 
 async def create_bot() -> Bot:
     bot = Bot(token=settings.TELEGRAM_TOKEN)
     return bot
 
 async def create_dispatcher() -> Dispatcher:
-    storage_fsm = MemoryStorage()
+    # Состояния на диске: перезапуск не прерывает заполнение профиля
+    storage_fsm = SQLiteStorage(settings.FSM_STORAGE_PATH, ttl_seconds=settings.FSM_STATE_TTL_HOURS * 3600)
     dp = Dispatcher(storage=storage_fsm)
     
     # Добавляем middleware
@@ -79,6 +103,7 @@ async def main():
         raise
     finally:
         await bot.session.close()
+        await dp.storage.close()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import sys
+
+from .utils.logger import setup_logging
+from .data.json_storage import storage
+from .services.program_changes import program_changes
+
+async def list_versions() -> int:
+    current = storage.get_current_programs_version()
+    pinned = storage.is_programs_pinned()
+    versions = storage.list_programs_versions()
+    
+    if not versions:
+        print("Сохраненных версий программ нет.")
+        return 0
+    
+    for version in versions:
+        marker = "*" if version == current else " "
+        suffix = " (закреплена)" if version == current and pinned else ""
+        print(f"{marker} {version}{suffix}")
+    return 0
+
+async def rollback(version: str = None) -> int:
+    diff = await program_changes.rollback(version)
+    
+    if diff is None:
+        print("Версия для отката не найдена.")
+        return 1
+    
+    print(f"Текущая версия программ: {storage.get_current_programs_version()} (закреплена)")
+    print("Обновление с сайта не заменит ее, пока не выполнен programs-unpin.")
+    return 0
+
+async def unpin() -> int:
+    if not await storage.unpin_programs():
+        print("Текущая версия программ не закреплена.")
+        return 1
+    
+    print(f"Закрепление версии {storage.get_current_programs_version()} снято.")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Управление данными бота")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    subparsers.add_parser("programs-versions", help="Список сохраненных версий программ")
+    
+    rollback_parser = subparsers.add_parser("programs-rollback", help="Откатить программы на предыдущую версию")
+    rollback_parser.add_argument("--version", help="Версия для отката (по умолчанию - предыдущая)")
+    
+    subparsers.add_parser("programs-unpin", help="Разрешить обновлению с сайта заменить закрепленную версию")
+    
+    args = parser.parse_args(argv)
+    setup_logging()
+    
+    if args.command == "programs-versions":
+        return asyncio.run(list_versions())
+    if args.command == "programs-unpin":
+        return asyncio.run(unpin())
+    return asyncio.run(rollback(args.version))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Оценка релевантности курсов профилю пользователя.
+
+Для снимка программ один раз строится матрица курс x термин: стемы названия курса
+с весами TF-IDF, строки нормированы, поэтому длинные названия не получают преимущества.
+Профиль переводится в вектор тех же терминов (интересы весят больше целей и опыта),
+и оценки всех курсов получаются одним умножением матрицы на вектор. Если NumPy не
+установлен, то же умножение выполняется по разреженным строкам на чистом Python.
+"""
+import math
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from ..data.models import Course, Program, ProgramsDiff, UserProfile
+from ..utils.logger import logger
+from ..utils.text_normalization import stem_set
+from .program_changes import program_changes, courses_fingerprint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Вклад полей профиля: интересы выбираются прямо под курсы, цели и опыт - косвенный сигнал
+INTEREST_WEIGHT = 1.0
+GOAL_WEIGHT = 0.5
+BACKGROUND_WEIGHT = 0.25
+
+class CourseScore(NamedTuple):
+    program: Program
+    course: Course
+    score: float
+    # Формулировки из профиля, совпавшие с названием курса
+    matched: Tuple[str, ...]
+
+    @property
+    def explanation(self) -> str:
+        return f"совпадает с вашим профилем: {', '.join(self.matched)}"
+
+class _ProfileTerms(NamedTuple):
+    weights: Dict[int, float]
+    # (формулировка, ее стемы) для объяснения совпадений
+    phrases: List[Tuple[str, FrozenSet[str]]]
+
+class CourseScoringEngine:
+    """Матрица курс x термин для одного снимка программ"""
+
+    def __init__(self, programs: List[Program], use_numpy: Optional[bool] = None,
+                 stems_cache: Optional[Dict[str, Tuple[str, List[FrozenSet[str]]]]] = None):
+        """stems_cache - стемы названий курсов по id программы вместе с хэшем курсов:
+        программы с тем же хэшем повторно не разбираются. Веса TF-IDF зависят от всех
+        курсов снимка и пересчитываются целиком, это только арифметика по готовым стемам."""
+        self.programs = programs
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self._entries: List[Tuple[int, Program, Course]] = []
+        self._stems: List[FrozenSet[str]] = []
+        self._vocabulary: Dict[str, int] = {}
+
+        for program_idx, program in enumerate(programs):
+            courses_hash = program.content_hashes()[0]
+            cached = stems_cache.get(program.id) if stems_cache is not None else None
+            if cached is None or cached[0] != courses_hash:
+                cached = (courses_hash, [stem_set(course.name) for course in program.courses])
+                if stems_cache is not None:
+                    stems_cache[program.id] = cached
+
+            for course, stems in zip(program.courses, cached[1]):
+                for term in stems:
+                    self._vocabulary.setdefault(term, len(self._vocabulary))
+                self._entries.append((program_idx, program, course))
+                self._stems.append(stems)
+
+        document_frequency = [0] * len(self._vocabulary)
+        for stems in self._stems:
+            for term in stems:
+                document_frequency[self._vocabulary[term]] += 1
+        total = len(self._entries)
+        idf = [math.log((total + 1) / (df + 1)) + 1 for df in document_frequency]
+
+        # Разреженные строки: номер термина -> вес; нормированы по длине
+        self._rows: List[Dict[int, float]] = []
+        for stems in self._stems:
+            row = {self._vocabulary[term]: idf[self._vocabulary[term]] for term in stems}
+            norm = math.sqrt(sum(weight * weight for weight in row.values())) or 1.0
+            self._rows.append({term: weight / norm for term, weight in row.items()})
+
+        if self.use_numpy:
+            self._matrix = np.zeros((total, len(self._vocabulary)), dtype=np.float32)
+            for row_idx, row in enumerate(self._rows):
+                for term, weight in row.items():
+                    self._matrix[row_idx, term] = weight
+            self._program_ids = np.array([program_idx for program_idx, _, _ in self._entries], dtype=np.int32)
+            self._electives = np.array([course.is_elective for _, _, course in self._entries], dtype=bool)
+        else:
+            self._postings: Dict[int, List[Tuple[int, float]]] = {}
+            for row_idx, row in enumerate(self._rows):
+                for term, weight in row.items():
+                    self._postings.setdefault(term, []).append((row_idx, weight))
+
+    def rebind(self, programs: List[Program]) -> None:
+        """Подменяет программы и курсы на объекты нового снимка с теми же курсами"""
+        self.programs = programs
+        self._entries = [
+            (program_idx, program, course)
+            for program_idx, program in enumerate(programs) for course in program.courses
+        ]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return len(self._entries), len(self._vocabulary)
+
+    def _profile_terms(self, profile: UserProfile) -> _ProfileTerms:
+        weights: Dict[int, float] = {}
+        phrases = []
+        sources = [(interest, INTEREST_WEIGHT) for interest in profile.interests]
+        sources += [(goal, GOAL_WEIGHT) for goal in profile.goals]
+        if profile.background:
+            sources.append((profile.background, BACKGROUND_WEIGHT))
+
+        for phrase, weight in sources:
+            stems = stem_set(phrase)
+            phrases.append((phrase, stems))
+            for term in stems:
+                term_idx = self._vocabulary.get(term)
+                if term_idx is not None:
+                    weights[term_idx] = weights.get(term_idx, 0.0) + weight
+        return _ProfileTerms(weights, phrases)
+
+    def _scores(self, weights: Dict[int, float]) -> List[float]:
+        """Оценки всех курсов: матрица курсов, умноженная на вектор профиля"""
+        if self.use_numpy:
+            vector = np.zeros(len(self._vocabulary), dtype=np.float32)
+            for term, weight in weights.items():
+                vector[term] = weight
+            return self._matrix @ vector
+
+        scores = [0.0] * len(self._entries)
+        for term, weight in weights.items():
+            for row_idx, course_weight in self._postings[term]:
+                scores[row_idx] += course_weight * weight
+        return scores
+
+    def _candidates(self, scores, program_id: Optional[str], electives_only: bool) -> Iterable[int]:
+        program_idx = None
+        if program_id is not None:
+            program_idx = next((idx for idx, program in enumerate(self.programs) if program.id == program_id), -1)
+        if self.use_numpy:
+            mask = scores > 0
+            if program_idx is not None:
+                mask &= self._program_ids == program_idx
+            if electives_only:
+                mask &= self._electives
+            return np.flatnonzero(mask).tolist()
+
+        return [
+            row_idx for row_idx, (entry_program_idx, _, course) in enumerate(self._entries)
+            if scores[row_idx] > 0
+            and (program_idx is None or entry_program_idx == program_idx)
+            and (not electives_only or course.is_elective)
+        ]
+
+    def rank(self, profile: UserProfile, program_id: Optional[str] = None,
+             electives_only: bool = False, limit: Optional[int] = None) -> List[CourseScore]:
+        """Курсы с ненулевой оценкой по убыванию релевантности"""
+        terms = self._profile_terms(profile)
+        if not terms.weights:
+            return []
+
+        scores = self._scores(terms.weights)
+        ranked = sorted(self._candidates(scores, program_id, electives_only), key=lambda row_idx: (-scores[row_idx], row_idx))
+        if limit is not None:
+            ranked = ranked[:limit]
+
+        results = []
+        for row_idx in ranked:
+            _, entry_program, course = self._entries[row_idx]
+            # Объяснения нужны только для возвращаемых курсов
+            matched = tuple(phrase for phrase, stems in terms.phrases if stems & self._stems[row_idx])
+            results.append(CourseScore(entry_program, course, float(scores[row_idx]), matched))
+        return results
+
+class CourseScoringService:
+    """Хранит матрицу для текущего снимка программ и перестраивает ее только при изменениях курсов"""
+
+    def __init__(self):
+        self._engine: Optional[CourseScoringEngine] = None
+        self._fingerprint: Optional[tuple] = None
+        # Стемы курсов по программам: при изменении одной программы остальные не разбираются заново
+        self._stems: Dict[str, Tuple[str, List[FrozenSet[str]]]] = {}
+
+    def get_engine(self, programs: List[Program]) -> CourseScoringEngine:
+        fingerprint = courses_fingerprint(programs)
+        if self._engine is None or fingerprint != self._fingerprint:
+            self._engine = CourseScoringEngine(programs, stems_cache=self._stems)
+            self._fingerprint = fingerprint
+            courses, terms = self._engine.size
+            logger.info("Course scoring matrix built", courses=courses, terms=terms, numpy=self._engine.use_numpy)
+        elif any(old is not new for old, new in zip(self._engine.programs, programs)):
+            # Курсы те же, поменялись описания или детали программ
+            self._engine.rebind(programs)
+        return self._engine
+
+    def rank(self, profile: UserProfile, programs: List[Program], **kwargs) -> List[CourseScore]:
+        return self.get_engine(programs).rank(profile, **kwargs)
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        # Матрица строится только по названиям курсов
+        changed = [change for change in diff.changes if change.courses_changed]
+        if not changed:
+            return
+        for change in changed:
+            self._stems.pop(change.program_id, None)
+        self._engine = None
+        self._fingerprint = None
+
+course_scoring_service = CourseScoringService()
+program_changes.subscribe(course_scoring_service.on_programs_changed)
@@ -0,0 +1,246 @@
+"""Смысловой поиск по курсам и описаниям программ.
+
+Лексический поиск не связывает "NLP" с курсом "Обработка естественного языка". Для каждого
+снимка программ тексты курсов и фрагменты описаний программ один раз переводятся в эмбеддинги
+моделью OLLAMA_EMBED_MODEL. Нормированная матрица float32 сохраняется рядом со снимком и после
+перезапуска открывается через memory-map без повторных запросов к Ollama; после обновления
+данных заново считаются только эмбеддинги изменившихся документов. Поиск стоит одного
+эмбеддинга запроса и одного умножения матрицы на вектор. Без NumPy смысловой поиск выключен.
+"""
+import asyncio
+import re
+from typing import Collection, List, NamedTuple, Optional, Tuple
+from ..data.json_storage import storage
+from ..data.models import Course, Program, ProgramsDiff
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.logger import logger
+from .intent_router import FIELD_TITLES
+from .llm_service import llm_service
+from .program_changes import program_changes, snapshot_version
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EMBEDDING_ARTIFACT = "embeddings"
+# Текстов в одном запросе к /api/embed при построении индекса
+EMBED_BATCH_SIZE = 32
+EMBED_BATCH_TIMEOUT = 120.0
+# Эмбеддинг вопроса не должен заметно задерживать ответ
+QUERY_EMBED_TIMEOUT = 5.0
+# Минимальное косинусное сходство, при котором документ считается близким по смыслу
+SEMANTIC_MIN_SCORE = 0.6
+# Максимальная длина фрагмента описания программы
+CHUNK_CHARS = 600
+
+COURSE_DOCUMENT = 'course'
+DETAILS_DOCUMENT = 'details'
+
+# Поля ProgramDetails, попадающие в индекс, и их заголовки
+DETAIL_TITLES = {
+    **FIELD_TITLES,
+    'about_program': "О программе",
+    'study_directions': "Направления подготовки",
+    'additional_opportunities': "Дополнительные возможности",
+    'manager_contacts': "Контакты менеджера",
+}
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+class Document(NamedTuple):
+    """Единица поиска: курс или фрагмент описания программы"""
+    key: str
+    kind: str
+    text: str
+    program: Program
+    course: Optional[Course] = None
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Делит текст на фрагменты по границам предложений"""
+    chunks, current = [], ""
+    for sentence in _SENTENCE_RE.split(" ".join(text.split())):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+def snapshot_documents(programs: List[Program]) -> List[Document]:
+    """Курсы и фрагменты описаний всех программ снимка в стабильном порядке"""
+    documents = []
+    for program in programs:
+        for course in program.courses:
+            text = f"Курс «{course.name}» программы «{program.name}»"
+            extra = [value for value in (course.category, course.description) if value]
+            if extra:
+                text += ". " + ". ".join(extra)
+            documents.append(Document(f"{program.id}/course/{course.id}", COURSE_DOCUMENT, text, program, course))
+
+        sections = [("description", "Описание", program.description)]
+        if program.details:
+            sections += [(field, title, getattr(program.details, field)) for field, title in DETAIL_TITLES.items()]
+        for field, title, value in sections:
+            if not value:
+                continue
+            for chunk_idx, chunk in enumerate(chunk_text(value)):
+                documents.append(Document(
+                    f"{program.id}/{field}/{chunk_idx}", DETAILS_DOCUMENT,
+                    f"{program.name}. {title}: {chunk}", program
+                ))
+    return documents
+
+class EmbeddingIndex:
+    """Нормированная матрица эмбеддингов документов одного снимка"""
+
+    def __init__(self, documents: List[Document], matrix, model: str):
+        self.documents = documents
+        self.matrix = matrix
+        self.model = model
+        self._kinds = np.array([document.kind for document in documents])
+
+    @staticmethod
+    def normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def search(self, query_vector, top_k: int = 5, kinds: Optional[Collection[str]] = None) -> List[Tuple[Document, float]]:
+        """Ближайшие по косинусу документы полным перебором"""
+        scores = self.matrix @ self.normalize(query_vector)
+        if kinds is not None:
+            scores = np.where(np.isin(self._kinds, list(kinds)), scores, -np.inf)
+
+        top_k = min(top_k, len(self.documents))
+        if top_k <= 0:
+            return []
+        # Частичная сортировка: порядок важен только для top_k лучших
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.documents[idx], float(scores[idx])) for idx in top if np.isfinite(scores[idx])]
+
+class EmbeddingIndexService:
+    """Строит индекс один раз на снимок программ и хранит его между перезапусками"""
+
+    def __init__(self):
+        self._index: Optional[EmbeddingIndex] = None
+        self._version: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Индекс прошлого снимка: эмбеддинги неизменившихся документов берутся из него
+        self._previous: Optional[EmbeddingIndex] = None
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None and bool(llm_service.embed_model)
+
+    def ready_for(self, programs: List[Program]) -> Optional[EmbeddingIndex]:
+        """Индекс текущего снимка, если он уже построен; в обработчиках индекс не строится"""
+        if self._index is None or not programs or self._version != snapshot_version(programs):
+            return None
+        return self._index
+
+    async def refresh(self, programs: List[Program]) -> Optional[EmbeddingIndex]:
+        """Загружает индекс снимка с диска или строит его через Ollama"""
+        if not self.enabled or not programs:
+            return None
+        version = snapshot_version(programs)
+        async with self._lock:
+            if self._version == version and self._index is not None:
+                return self._index
+
+            documents = snapshot_documents(programs)
+            index = await self._load(version, documents) or await self._build(version, documents)
+            if index is not None:
+                self._index, self._version = index, version
+                self._previous = None
+            return index
+
+    async def _load(self, version: str, documents: List[Document]) -> Optional[EmbeddingIndex]:
+        meta = await storage.load_snapshot_artifact(EMBEDDING_ARTIFACT, version)
+        path = storage.snapshot_artifact_payload(EMBEDDING_ARTIFACT, version)
+        if not meta or path is None:
+            return None
+        # Матрица другой модели или другого набора документов не подходит
+        if meta.get("model") != llm_service.embed_model or meta.get("keys") != [document.key for document in documents]:
+            return None
+        try:
+            matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(len(documents), meta["dimensions"]))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Failed to map embedding matrix", error=str(e))
+            return None
+        logger.info("Embedding index loaded", documents=len(documents), snapshot_version=version)
+        return EmbeddingIndex(documents, matrix, meta["model"])
+
+    async def _build(self, version: str, documents: List[Document]) -> Optional[EmbeddingIndex]:
+        if not documents:
+            return None
+        # Текст документа включает название программы, поэтому после обновления данных
+        # через Ollama проходят только документы изменившихся программ
+        previous_rows = {}
+        previous = self._previous
+        if previous is not None and previous.model == llm_service.embed_model:
+            previous_rows = {document.text: row for row, document in enumerate(previous.documents)}
+        missing = list(dict.fromkeys(document.text for document in documents if document.text not in previous_rows))
+
+        vectors = {}
+        for start in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[start:start + EMBED_BATCH_SIZE]
+            embeddings = await llm_service.embed(batch, timeout=EMBED_BATCH_TIMEOUT)
+            if embeddings is None:
+                logger.warning("Embedding index not built", model=llm_service.embed_model, embedded=len(vectors))
+                return None
+            vectors.update(zip(batch, embeddings))
+
+        matrix = EmbeddingIndex.normalize([
+            vectors[document.text] if document.text in vectors else previous.matrix[previous_rows[document.text]]
+            for document in documents
+        ])
+        await storage.save_snapshot_artifact(
+            EMBEDDING_ARTIFACT, version,
+            {"model": llm_service.embed_model, "dimensions": matrix.shape[1], "keys": [document.key for document in documents]},
+            payload=matrix.tobytes()
+        )
+        logger.info("Embedding index built", documents=len(documents), embedded=len(vectors), dimensions=matrix.shape[1])
+        return EmbeddingIndex(documents, matrix, llm_service.embed_model)
+
+    async def search(self, query: str, programs: List[Program], top_k: int = 5,
+                     kinds: Optional[Collection[str]] = None,
+                     timeout: float = QUERY_EMBED_TIMEOUT) -> List[Tuple[Document, float]]:
+        """Документы, близкие к запросу по смыслу; пусто, если индекса еще нет
+        или эмбеддинг запроса не получен за timeout секунд"""
+        index = self.ready_for(programs)
+        if index is None or not query.strip() or timeout <= 0:
+            return []
+        embeddings = await llm_service.embed([query], timeout=timeout)
+        if not embeddings:
+            return []
+        return index.search(embeddings[0], top_k, kinds)
+
+    async def precompute(self) -> None:
+        try:
+            await self.refresh(await storage.load_programs())
+        except Exception as e:
+            logger.error("Failed to build embedding index", error=str(e))
+
+    def start_precompute(self) -> asyncio.Task:
+        """Строит индекс в фоне, чтобы не задерживать запуск и обновление данных"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.precompute())
+        return self._task
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        if self._index is not None:
+            self._previous = self._index
+        self._index = None
+        self._version = None
+        # Построение по старому снимку больше не нужно
+        if self._task:
+            await cancel_and_wait(self._task)
+        if self.enabled:
+            self.start_precompute()
+
+embedding_index_service = EmbeddingIndexService()
+program_changes.subscribe(embedding_index_service.on_programs_changed)
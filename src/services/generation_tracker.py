@@ -0,0 +1,38 @@
+import asyncio
+from typing import Dict, Coroutine, Optional
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.logger import logger
+
+class GenerationTracker:
+    """Хранит текущую генерацию ответа каждого пользователя.
+    
+    Новый вопрос или выход из режима вопросов отменяет предыдущую генерацию:
+    запрос к Ollama прерывается, и устаревший ответ не отправляется.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self, user_id: str, coro: Coroutine) -> asyncio.Task:
+        await self.cancel(user_id, reason="new_question")
+        task = asyncio.create_task(coro)
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda finished: self._forget(user_id, finished))
+        return task
+
+    async def cancel(self, user_id: str, reason: str = "left_qa_mode") -> bool:
+        task = self._tasks.pop(user_id, None)
+        if task is None or task.done():
+            return False
+        logger.info("Generation cancelled", user_id=user_id, reason=reason)
+        await cancel_and_wait(task)
+        return True
+
+    def get(self, user_id: str) -> Optional[asyncio.Task]:
+        return self._tasks.get(user_id)
+
+    def _forget(self, user_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(user_id) is task:
+            del self._tasks[user_id]
+
+generation_tracker = GenerationTracker()
@@ -0,0 +1,137 @@
+"""Гибридный поиск контекста для ответа на вопрос.
+
+Лексический индекс (BM25 по стемам) надежно находит точные названия курсов, индекс
+эмбеддингов - перефразированные вопросы. Оба ищут по одним документам (курсы и фрагменты
+описаний программ), а их ранжирования объединяются по reciprocal rank fusion:
+документ получает сумму 1 / (k + место) по спискам, в которых он встретился, поэтому
+оценки разной природы не нужно приводить к одной шкале.
+"""
+import asyncio
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from ..data.models import Program, ProgramsDiff
+from ..utils.logger import logger
+from ..utils.token_budget import token_estimator
+from .embedding_index import Document, embedding_index_service, snapshot_documents, QUERY_EMBED_TIMEOUT
+from .program_changes import program_changes, snapshot_fingerprint
+from .search_index import BM25Index
+
+# Сглаживающая константа RRF: чем больше, тем меньше разница между соседними местами
+RRF_K = 60
+# Сколько кандидатов берется из каждого индекса до объединения
+RETRIEVAL_CANDIDATES = 20
+# Бюджет найденного контекста в сообщении пользователя (каталог уже в системном сообщении)
+RETRIEVAL_CONTEXT_TOKENS = 600
+
+class RetrievedDocument(NamedTuple):
+    document: Document
+    score: float
+    # Места в списках каждого индекса (с единицы); None - индекс документ не нашел
+    lexical_rank: Optional[int]
+    semantic_rank: Optional[int]
+
+class Retrieval(NamedTuple):
+    documents: List[RetrievedDocument]
+    lexical: List[Tuple[Document, float]]
+    semantic: List[Tuple[Document, float]]
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Объединяет ранжирования ключей документов; порядок при равенстве - по первому появлению"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    order = {key: idx for idx, key in enumerate(scores)}
+    return sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+
+def format_document(document: Document) -> str:
+    """Строка контекста: для курса - с типом, кредитами и семестром"""
+    course = document.course
+    if course is None:
+        return document.text
+    course_type = "выборочный" if course.is_elective else "обязательный"
+    return (
+        f"Курс «{course.name}» программы «{document.program.name}»: "
+        f"{course_type}, {course.credits} кредитов, {course.semester} семестр"
+    )
+
+def build_context(documents: List[RetrievedDocument], max_tokens: int = RETRIEVAL_CONTEXT_TOKENS) -> str:
+    """Найденные документы по убыванию оценки, пока они помещаются в бюджет токенов"""
+    lines, used = [], 0
+    for retrieved in documents:
+        line = f"- {format_document(retrieved.document)}"
+        tokens = token_estimator.estimate(line)
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
+
+class LexicalDocumentIndex:
+    """BM25 по документам снимка программ"""
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        self._index = BM25Index([document.text for document in documents])
+
+    def search(self, query: str, top_k: int = RETRIEVAL_CANDIDATES) -> List[Tuple[Document, float]]:
+        return [(self.documents[idx], score) for score, idx in self._index.search(query, top_k)]
+
+class HybridRetriever:
+    def __init__(self):
+        self._lexical: Optional[LexicalDocumentIndex] = None
+        self._fingerprint: Optional[tuple] = None
+        # Индекс строится в потоке: одновременные запросы не должны строить его дважды
+        self._build_lock = threading.Lock()
+
+    def lexical_index(self, programs: List[Program]) -> LexicalDocumentIndex:
+        fingerprint = snapshot_fingerprint(programs)
+        with self._build_lock:
+            if self._lexical is None or fingerprint != self._fingerprint:
+                self._lexical = LexicalDocumentIndex(snapshot_documents(programs))
+                self._fingerprint = fingerprint
+                logger.info("Lexical document index built", documents=len(self._lexical.documents))
+            return self._lexical
+
+    def _search_lexical(self, query: str, programs: List[Program]) -> List[Tuple[Document, float]]:
+        return self.lexical_index(programs).search(query, RETRIEVAL_CANDIDATES)
+
+    async def retrieve(self, query: str, programs: List[Program], top_k: int = RETRIEVAL_CANDIDATES,
+                       embed_timeout: float = QUERY_EMBED_TIMEOUT) -> Retrieval:
+        """Ищет в обоих индексах и объединяет результаты.
+        
+        embed_timeout ограничивает ожидание эмбеддинга запроса: если он не успел,
+        используются только результаты BM25.
+        """
+        if not programs or not query.strip():
+            return Retrieval([], [], [])
+
+        # BM25 растет с каталогом, а после обновления данных индекс еще и перестраивается:
+        # поиск идет в потоке одновременно с запросом эмбеддинга и не блокирует цикл событий
+        lexical, semantic = await asyncio.gather(
+            asyncio.to_thread(self._search_lexical, query, programs),
+            embedding_index_service.search(query, programs, top_k=RETRIEVAL_CANDIDATES, timeout=embed_timeout)
+        )
+
+        documents = {document.key: document for document, _ in lexical + semantic}
+        lexical_ranks = {document.key: rank for rank, (document, _) in enumerate(lexical, 1)}
+        semantic_ranks = {document.key: rank for rank, (document, _) in enumerate(semantic, 1)}
+        fused = reciprocal_rank_fusion([
+            [document.key for document, _ in lexical],
+            [document.key for document, _ in semantic]
+        ])
+        return Retrieval(
+            [
+                RetrievedDocument(documents[key], score, lexical_ranks.get(key), semantic_ranks.get(key))
+                for key, score in fused[:top_k]
+            ],
+            lexical,
+            semantic
+        )
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        self._lexical = None
+        self._fingerprint = None
+
+hybrid_retriever = HybridRetriever()
+program_changes.subscribe(hybrid_retriever.on_programs_changed)
@@ -0,0 +1,106 @@
+"""Размеченные примеры вопросов для локального классификатора намерений.
+
+Ключ - намерение (поле ProgramDetails, course_search или open для открытых вопросов,
+которые передаются LLM). Модель обучается на этих примерах при первом обращении.
+"""
+from typing import Dict, List
+
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    'cost_per_year': [
+        "Сколько стоит обучение?",
+        "Какая стоимость контракта?",
+        "Цена обучения в год",
+        "Сколько платить за магистратуру",
+        "Сколько денег нужно на учебу",
+        "Во сколько обойдется год обучения",
+        "Обучение платное?",
+        "Какая оплата за семестр",
+        "Стоимость программы искусственный интеллект",
+        "Сколько стоит контрактное обучение на AI Product",
+    ],
+    'duration': [
+        "Сколько длится обучение?",
+        "Сколько лет учиться в магистратуре",
+        "Какой срок обучения",
+        "Длительность программы",
+        "За сколько семестров можно закончить",
+        "Как долго идет обучение",
+        "Продолжительность магистратуры",
+        "Сколько времени занимает программа",
+    ],
+    'language': [
+        "На каком языке ведется обучение?",
+        "Преподавание на английском?",
+        "Язык обучения",
+        "Лекции на русском языке?",
+        "Нужно ли знать английский для учебы",
+        "На каком языке читают курсы",
+    ],
+    'dormitory': [
+        "Есть ли общежитие?",
+        "Дают ли общагу иногородним",
+        "Где жить во время учебы",
+        "Предоставляется ли жилье студентам",
+        "Можно ли заселиться в общежитие",
+        "Есть место в общежитии для магистрантов?",
+    ],
+    'military_center': [
+        "Есть ли военный учебный центр?",
+        "Есть военка?",
+        "Дают ли отсрочку от армии",
+        "Можно ли получить военную подготовку",
+        "Военная кафедра есть?",
+        "Что с армией во время учебы",
+    ],
+    'form_of_study': [
+        "Какая форма обучения?",
+        "Обучение очное или заочное?",
+        "Можно учиться дистанционно?",
+        "Занятия проходят онлайн?",
+        "Нужно ли ходить на пары очно",
+        "Можно ли совмещать с работой",
+        "Формат занятий вечерний?",
+    ],
+    'accreditation': [
+        "Есть ли государственная аккредитация?",
+        "Программа аккредитована?",
+        "Диплом государственного образца?",
+        "Какой диплом выдают по окончании",
+    ],
+    'program_manager': [
+        "Кто менеджер программы?",
+        "Кто руководит программой",
+        "С кем связаться по вопросам программы",
+        "Контакты координатора",
+        "Как связаться с куратором",
+        "Кому написать по поводу поступления на программу",
+    ],
+    'course_search': [
+        "Есть ли курс по компьютерному зрению?",
+        "Какие курсы есть по машинному обучению",
+        "Какие дисциплины изучают на программе",
+        "Есть предмет по обработке естественного языка?",
+        "Изучают ли глубокое обучение",
+        "Какие выборочные дисциплины по NLP",
+        "Есть ли в программе курс по Python",
+        "Какие предметы в первом семестре",
+    ],
+    'open': [
+        "Что такое машинное обучение?",
+        "Какая программа лучше подходит для меня?",
+        "Чем отличаются программы?",
+        "Как подготовиться к поступлению?",
+        "Какие перспективы после окончания",
+        "Стоит ли идти в магистратуру после бакалавриата",
+        "Какие экзамены нужно сдавать",
+        "Расскажи о программе подробнее",
+        "Какие навыки нужны для поступления",
+        "Где работают выпускники",
+        "Помоги выбрать программу",
+        "Что почитать перед началом учебы",
+        "Как проходит вступительное испытание",
+        "Сложно ли поступить",
+        "Можно ли поступить без технического образования",
+        "Какие проекты делают студенты",
+    ],
+}
@@ -0,0 +1,175 @@
+import math
+from collections import Counter
+from typing import List, Dict, Optional, NamedTuple, Tuple
+from ..data.models import Program
+from ..utils.keyword_automaton import KeywordAutomaton
+from ..utils.text_normalization import normalize
+from ..utils.logger import logger
+from .intent_examples import INTENT_EXAMPLES
+from .search_index import course_index_service
+
+OPEN_INTENT = 'open'
+COURSE_INTENT = 'course_search'
+# Минимальная вероятность намерения по модели, ниже - вопрос уходит в LLM
+MODEL_MIN_CONFIDENCE = 0.7
+
+# Поле ProgramDetails -> заголовок строки ответа
+FIELD_TITLES = {
+    'cost_per_year': "Стоимость контрактного обучения (в год)",
+    'duration': "Длительность обучения",
+    'language': "Язык обучения",
+    'dormitory': "Общежитие",
+    'military_center': "Военный учебный центр",
+    'form_of_study': "Форма обучения",
+    'accreditation': "Государственная аккредитация",
+    'program_manager': "Менеджер программы",
+}
+
+# Правила: намерение -> фразы и формы вопроса ("слово*" - по основе). Совпадение правила дает
+# ответ без LLM, поэтому отдельные слова допускаются только однозначные ("общежитие"): "контракт",
+# "цена", "военный", "контакты" встречаются и в вопросах не о полях программы ("цена ошибки",
+# "контакты приемной комиссии"). Вопросы без фраз из правил классифицирует модель
+INTENT_KEYWORDS = {
+    'cost_per_year': [
+        'стоимость обучения', 'стоимость программы', 'стоимость контракт*', 'какая стоимость',
+        'сколько стоит', 'цена обучения', 'оплата обучения', 'сколько платить', 'платное обучение', 'обучение платн*',
+    ],
+    'duration': ['длительность', 'продолжительность', 'сколько длится', 'сколько лет', 'срок обучения'],
+    'language': ['язык обучения', 'на каком языке', 'на английском', 'на русском'],
+    'dormitory': ['общежит*', 'общаг*'],
+    'military_center': ['военный учебный центр', 'военная кафедра', 'военная подготовка', 'военк*', 'отсрочка от армии'],
+    'form_of_study': [
+        'форма обучения', 'очное или заочное', 'очное обучение', 'заочное обучение', 'дистанционное обучение',
+        'учиться заочно', 'учиться дистанционно',
+    ],
+    'accreditation': ['аккредит*'],
+    'program_manager': [
+        'менеджер программы', 'куратор программы', 'координатор программы', 'с кем связаться',
+        'контакты менеджера', 'контакты куратора', 'контакты координатора', 'контакты программы',
+    ],
+    COURSE_INTENT: ['есть ли курс', 'какие курсы', 'какие дисциплины', 'какие предметы'],
+}
+
+class IntentMatch(NamedTuple):
+    intents: Tuple[str, ...]
+    confidence: float
+    source: str
+
+class NaiveBayesIntentModel:
+    """Мультиномиальный наивный Байес по стемам вопроса"""
+
+    def __init__(self, examples: Dict[str, List[str]], alpha: float = 1.0):
+        self.alpha = alpha
+        self.intents = list(examples)
+        total_examples = sum(len(texts) for texts in examples.values())
+        self._log_priors: Dict[str, float] = {}
+        self._token_counts: Dict[str, Counter] = {}
+        self._totals: Dict[str, int] = {}
+        vocabulary = set()
+
+        for intent, texts in examples.items():
+            counts = Counter()
+            for text in texts:
+                counts.update(self._features(text))
+            self._token_counts[intent] = counts
+            self._totals[intent] = sum(counts.values())
+            self._log_priors[intent] = math.log(len(texts) / total_examples)
+            vocabulary.update(counts)
+
+        self._vocabulary_size = len(vocabulary)
+        self._vocabulary = vocabulary
+
+    @staticmethod
+    def _features(text: str) -> Tuple[str, ...]:
+        # Вопросительные слова ("сколько", "где") важны для намерения, поэтому стоп-слова сохраняются
+        return normalize(text, keep_stop_words=True)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Возвращает наиболее вероятное намерение и его апостериорную вероятность"""
+        features = [token for token in self._features(text) if token in self._vocabulary]
+        if not features:
+            return OPEN_INTENT, 0.0
+
+        scores = {}
+        for intent in self.intents:
+            denominator = self._totals[intent] + self.alpha * self._vocabulary_size
+            counts = self._token_counts[intent]
+            scores[intent] = self._log_priors[intent] + sum(
+                math.log((counts[token] + self.alpha) / denominator) for token in features
+            )
+
+        best_intent = max(scores, key=scores.get)
+        best_score = scores[best_intent]
+        normalizer = sum(math.exp(score - best_score) for score in scores.values())
+        return best_intent, 1.0 / normalizer
+
+class IntentRouter:
+    """Отвечает на структурированные вопросы из данных программ без обращения к LLM"""
+
+    def __init__(self):
+        self._rules = KeywordAutomaton(INTENT_KEYWORDS)
+        self._model: Optional[NaiveBayesIntentModel] = None
+
+    @property
+    def model(self) -> NaiveBayesIntentModel:
+        if self._model is None:
+            self._model = NaiveBayesIntentModel(INTENT_EXAMPLES)
+        return self._model
+
+    def classify(self, question: str) -> IntentMatch:
+        # Правила: все намерения в порядке упоминания в вопросе
+        matched = []
+        for intent, _ in self._rules.find(question):
+            if intent not in matched:
+                matched.append(intent)
+
+        field_intents = tuple(intent for intent in matched if intent in FIELD_TITLES)
+        if field_intents:
+            return IntentMatch(field_intents, 1.0, 'rules')
+        if matched:
+            return IntentMatch((COURSE_INTENT,), 1.0, 'rules')
+
+        intent, confidence = self.model.predict(question)
+        if intent == OPEN_INTENT or confidence < MODEL_MIN_CONFIDENCE:
+            return IntentMatch((OPEN_INTENT,), confidence, 'model')
+        return IntentMatch((intent,), confidence, 'model')
+
+    def answer_fields(self, question: str, match: IntentMatch, programs: List[Program]) -> Optional[str]:
+        """Ответ по шаблону на вопрос о полях программы или None, если данных нет"""
+        fields = tuple(intent for intent in match.intents if intent in FIELD_TITLES)
+        if not fields or not programs:
+            return None
+
+        # Если программа названа в вопросе - отвечаем только про нее
+        program = course_index_service.get_index(programs).search_program(question)
+        answer = self._format_fields(fields, [program] if program else programs)
+
+        if answer:
+            logger.info("Question answered by intent router", intents=list(fields), source=match.source, confidence=round(match.confidence, 3))
+        return answer
+
+    def _format_fields(self, fields: Tuple[str, ...], programs: List[Program]) -> Optional[str]:
+        sections = []
+        for field in fields:
+            lines = []
+            for program in programs:
+                value = self._field_value(program, field)
+                if value:
+                    lines.append(f"• {program.name}: {value}")
+            if lines:
+                sections.append(f"**{FIELD_TITLES[field]}:**\n" + "\n".join(lines))
+        return "\n\n".join(sections) if sections else None
+
+    @staticmethod
+    def _field_value(program: Program, field: str) -> Optional[str]:
+        details = program.details
+        value = getattr(details, field, None) if details else None
+        value = " ".join(value.split()) if value else None
+
+        if field == 'duration' and not value and program.duration_semesters:
+            return f"{program.duration_semesters} семестра"
+        if field == 'program_manager' and value and details.manager_contacts:
+            return f"{value} ({details.manager_contacts.strip()})"
+        return value
+
+intent_router = IntentRouter()
@@ -1,75 +1,422 @@
 import httpx
 import asyncio
-from typing import Optional, List, Dict
+import hashlib
+import time
+from typing import Optional, List, Dict, Callable, Tuple
 from ..utils.logger import logger
 from ..utils.config import settings
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.circuit_breaker import CircuitBreaker
+from ..utils.deadline import Deadline
+from ..utils.latency import LatencyTracker
+from ..utils.token_budget import TokenBudget, plan_budget, token_estimator, USER_MESSAGE_RESERVE_TOKENS
+from .ollama_pool import OllamaPool, OllamaBackend, NoBackendAvailable, parse_backends, model_tag
+from .model_routing import ModelRouter, parse_model_routes
+
+# Если до дедлайна осталось меньше, запрос не отправляется: ответ все равно не успеет
+MIN_REQUEST_SECONDS = 2.0
+# Доля оставшегося времени, которую может занять генерация ответа
+DEADLINE_DECODE_SHARE = 0.8
+MIN_NUM_PREDICT = 64
 
 class OllamaService:
     def __init__(self):
-        self.base_url = settings.OLLAMA_BASE_URL
+        self.pool = OllamaPool(parse_backends(settings.OLLAMA_BACKENDS) or parse_backends([settings.OLLAMA_BASE_URL]))
+        self.base_url = self.pool.primary_url
         self.model = settings.OLLAMA_MODEL
+        # Модели для отдельных типов запросов; остальные идут на self.model
+        self.router = ModelRouter(parse_model_routes(settings.OLLAMA_MODEL_ROUTES))
+        self.embed_model = settings.OLLAMA_EMBED_MODEL
         self.timeout = 30.0  # Таймаут для стабильной работы
+        self.keep_alive = settings.OLLAMA_KEEP_ALIVE
+        self.prime_timeout = 120.0  # Первичная обработка каталога на CPU может быть долгой
         self._available_models = []
+        self._primed_prefixes: set = set()
+        # Один num_ctx на модель - наибольший из нужных ее префиксам: запрос с другим размером
+        # перезагрузил бы модель и сбросил KV-кэш префиксов других типов запросов
+        self._context_sizes: Dict[str, int] = {}
+        # Пока Ollama недоступна или перегружена, запросы отклоняются сразу, а не через timeout
+        self.breaker = CircuitBreaker("ollama")
+        self.latencies = LatencyTracker()
+        # Скорость генерации каждой модели (токенов в секунду) по eval_count/eval_duration из ответов Ollama
+        self._decode_rates: Dict[str, float] = {}
+    
+    def model_for(self, purpose: str) -> str:
+        """Модель для типа запроса; если назначенной модели нет ни на одном сервере - основная"""
+        model = self.router.model_for(purpose, self.model)
+        if model != self.model and not self._has_model(model):
+            return self.model
+        return model
+    
+    def routed_models(self) -> List[str]:
+        """Все модели, которые сейчас используются: основная и доступные из маршрутов"""
+        models = [self.model]
+        for model in self.router.routes.values():
+            if model not in models and self._has_model(model):
+                models.append(model)
+        return models
+    
+    def _has_model(self, model: str) -> bool:
+        return model_tag(model) in {model_tag(name) for name in self.pool.available_models()}
+    
+    def _budget(self, prompt: str, purpose: str, reserve_tokens: int = 0) -> TokenBudget:
+        return plan_budget(token_estimator, prompt, purpose, settings.OLLAMA_MIN_CTX, settings.OLLAMA_MAX_CTX, reserve_tokens)
+    
+    def _context_size(self, model: str, required: int) -> int:
+        """Закрепленный размер контекста модели; растет, только если промпт в него не помещается"""
+        current = self._context_sizes.get(model)
+        if current is not None and current >= required:
+            return current
+        if current is not None:
+            logger.info("Model context size raised", model=model, num_ctx=required, previous=current)
+        self._context_sizes[model] = required
+        return required
+    
+    def reserve_context(self, system: str, purpose: str) -> int:
+        """Учитывает стабильный префикс в размере контекста до первых запросов с ним.
+        
+        Резервируется и основная модель: на нее переходят при эскалации ответа маленькой модели.
+        """
+        required = self._chat_budget(system, "", purpose).num_ctx
+        for model in {self.model_for(purpose), self.model}:
+            self._context_size(model, required)
+        return self._context_sizes[self.model_for(purpose)]
+    
+    def _generation_options(self, budget: TokenBudget) -> Dict:
+        # Здесь num_ctx - необходимый промпту размер; в запрос идет закрепленный размер модели
+        return {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "num_ctx": budget.num_ctx,
+            "num_predict": budget.num_predict,  # Бюджет ответа для конкретного места вызова
+            "stop": ["Human:", "Assistant:", "User:"]
+        }
+    
+    async def generate_response(self, prompt: str, context: Optional[str] = None, purpose: str = "default",
+                                deadline: Optional[Deadline] = None) -> Optional[str]:
+        full_prompt = self._build_prompt(prompt, context)
+        payload = {
+            "model": self.model,
+            "prompt": full_prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": self._generation_options(self._budget(full_prompt, purpose))
+        }
+        return await self._generate("/api/generate", payload, lambda result: result.get("response", ""), len(prompt), purpose, deadline)
+    
+    async def chat(self, system: str, user: str, purpose: str = "default", deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Запрос через chat API: system - стабильный префикс (инструкции и каталог), user - вопрос.
+        
+        Пока модель загружена (keep_alive), Ollama переиспользует KV-кэш совпадающего префикса,
+        поэтому при повторных запросах вычисляется только сообщение пользователя.
+        """
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": self._generation_options(self._chat_budget(system, user, purpose))
+        }
+        return await self._generate("/api/chat", payload, lambda result: result.get("message", {}).get("content", ""), len(user), purpose, deadline)
     
-    async def generate_response(self, prompt: str, context: Optional[str] = None) -> Optional[str]:
+    def _chat_budget(self, system: str, user: str, purpose: str) -> TokenBudget:
+        # Короткие вопросы укладываются в резерв, поэтому размер контекста определяется префиксом
+        reserve = max(token_estimator.estimate(user), USER_MESSAGE_RESERVE_TOKENS)
+        return self._budget(system, purpose, reserve)
+    
+    async def prime_prefix(self, system: str, purpose: str = "default") -> bool:
+        """Заранее вычисляет префикс, чтобы первый вопрос после обновления данных не ждал его обработки"""
+        prefix_hash = hashlib.sha1(system.encode("utf-8")).hexdigest()
+        if self.breaker.is_open:
+            return False
+        
         try:
-            # Проверяем доступность модели и автоматически выбираем доступную
             if not await self._ensure_model_available():
-                logger.warning("No suitable model available for generation")
-                return None
-                
-            full_prompt = self._build_prompt(prompt, context)
+                return False
+        except Exception as e:
+            logger.warning("Prompt prefix priming failed", error=str(e))
+            return False
+        
+        # KV-кэш у каждого сервера свой, поэтому префикс вычисляется на всех серверах с моделью
+        model = self.model_for(purpose)
+        candidates = self.pool.candidates(model)
+        if not candidates:
+            logger.warning("Prompt prefix priming skipped: no Ollama backend available", model=model)
+            return False
+        backends = [backend for backend in candidates if (backend.url, model, prefix_hash) not in self._primed_prefixes]
+        results = await asyncio.gather(*(self._prime_backend(backend, model, system, purpose, prefix_hash) for backend in backends))
+        return all(results)
+    
+    async def _prime_backend(self, backend: OllamaBackend, model: str, system: str, purpose: str, prefix_hash: str) -> bool:
+        try:
+            # Тот же num_ctx, что и у последующих вопросов, иначе модель перезагрузится и кэш пропадет
+            options = self._generation_options(self._chat_budget(system, "", purpose))
+            options["num_ctx"] = self._context_size(model, options["num_ctx"])
+            options["num_predict"] = 1
+            payload = {
+                "model": model,
+                "messages": [{"role": "system", "content": system}],
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": options
+            }
+            async with self.pool.acquire(model, backend):
+                result = await self._post(backend, "/api/chat", payload, self.prime_timeout)
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": full_prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.7,
-                            "top_p": 0.9,
-                            "num_ctx": 32768,  # Максимальный контекст для большинства моделей при 12GB памяти
-                            "num_predict": 2048,  # Максимальное количество токенов в ответе
-                            "stop": ["Human:", "Assistant:", "User:"]
-                        }
-                    }
-                )
+            # Префикс вычислялся целиком - уточняем оценку токенов
+            prompt_eval_count = result.get("prompt_eval_count")
+            if isinstance(prompt_eval_count, int):
+                token_estimator.observe(system, prompt_eval_count)
+            
+            self._primed_prefixes.add((backend.url, model, prefix_hash))
+            logger.info("Prompt prefix primed", model=model, backend=backend.url, prefix_length=len(system))
+            return True
+        except Exception as e:
+            logger.warning("Prompt prefix priming failed", backend=backend.url, error=str(e))
+            return False
+    
+    async def _post(self, backend: OllamaBackend, path: str, payload: Dict, timeout: float) -> Dict:
+        """POST на конкретный сервер пула с учетом результата в его состоянии"""
+        try:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.post(f"{backend.url}{path}", json=payload)
                 response.raise_for_status()
-                
                 result = response.json()
-                generated_text = result.get("response", "").strip()
-                
-                if generated_text:
-                    logger.info(
-                        "LLM response generated successfully",
-                        model=self.model,
-                        prompt_length=len(prompt),
-                        response_length=len(generated_text)
-                    )
-                    return generated_text
-                else:
-                    logger.warning("LLM returned empty response")
-                    return None
+        except asyncio.CancelledError:
+            raise
+        except httpx.HTTPStatusError as e:
+            # 4xx - ошибка запроса, а не сервера
+            if e.response.status_code >= 500:
+                self.pool.report_failure(backend, str(e))
+            raise
+        except Exception as e:
+            self.pool.report_failure(backend, str(e))
+            raise
+        
+        self.pool.report_success(backend, payload["model"])
+        return result
+    
+    async def load_model(self) -> bool:
+        """Загружает модели на всех серверах запросом без промпта; для загруженных - продлевает keep_alive"""
+        if self.breaker.is_open or not await self._ensure_model_available():
+            return False
+        loads = [
+            self._load_on(backend, model)
+            for model in self.routed_models()
+            for backend in self.pool.candidates(model)
+        ]
+        results = await asyncio.gather(*loads)
+        return bool(results) and all(results)
+    
+    async def _load_on(self, backend: OllamaBackend, model: str) -> bool:
+        payload = {
+            "model": model,
+            "keep_alive": self.keep_alive,
+            "options": {"num_ctx": self._context_sizes.get(model, settings.OLLAMA_MIN_CTX)}
+        }
+        try:
+            async with self.pool.acquire(model, backend):
+                await self._post(backend, "/api/generate", payload, self.prime_timeout)
+            return True
+        except Exception as e:
+            logger.warning("Model warm-up failed", backend=backend.url, model=model, error=str(e))
+            return False
+    
+    async def embed(self, texts: List[str], timeout: Optional[float] = None) -> Optional[List[List[float]]]:
+        """Эмбеддинги текстов (/api/embed); None - модель эмбеддингов недоступна или запрос не удался"""
+        if not texts or not self.embed_model or self.breaker.is_open or not self._has_model(self.embed_model):
+            return None
+        payload = {"model": self.embed_model, "input": texts, "keep_alive": self.keep_alive}
+        try:
+            result, _ = await self._post_with_failover("/api/embed", payload, timeout or self.timeout)
+        except Exception as e:
+            logger.warning("Embedding request failed", model=self.embed_model, texts=len(texts), error=str(e))
+            return None
+        
+        embeddings = result.get("embeddings") or []
+        return embeddings if len(embeddings) == len(texts) else None
+    
+    def forget_cold_prefixes(self) -> None:
+        """Забывает прогретые префиксы серверов, где модель выгружена: ее KV-кэш потерян"""
+        backends = {backend.url: backend for backend in self.pool.backends}
+        self._primed_prefixes = {
+            (url, model, prefix_hash) for url, model, prefix_hash in self._primed_prefixes
+            if url in backends and backends[url].has_loaded(model)
+        }
+    
+    async def _post_with_failover(self, path: str, payload: Dict, timeout: float,
+                                  first: Optional[OllamaBackend] = None, exclude=()) -> Tuple[Dict, OllamaBackend]:
+        """Отправляет запрос через пул; если сервер не принял соединение, пробует следующий"""
+        model = payload["model"]
+        tried = set(exclude)
+        while True:
+            async with self.pool.acquire(model, first, exclude=tried) as backend:
+                first = None
+                try:
+                    return await self._post(backend, path, payload, timeout), backend
+                except httpx.ConnectError:
+                    # Соединение не установлено, генерация не начиналась - повтор на другом сервере безопасен
+                    tried.add(backend.url)
+                    if not self.pool.candidates(model, exclude=tried):
+                        raise
+                    logger.warning("Ollama backend refused connection, trying next", backend=backend.url)
+    
+    async def _post_hedged(self, path: str, payload: Dict, timeout: float, purpose: str) -> Tuple[Dict, OllamaBackend]:
+        """Если ответ не пришел за обычное для этого типа запроса время, дублирует его на другой сервер.
+        
+        Берется ответ, пришедший первым, второй запрос отменяется и освобождает свой сервер.
+        """
+        model = payload["model"]
+        delay = self._hedge_delay(purpose, model)
+        if delay is None or delay >= timeout or len(self.pool.candidates(model)) < 2:
+            return await self._post_with_failover(path, payload, timeout)
+        
+        primary_backend = self.pool.pick(model)
+        tasks = [asyncio.create_task(self._post_with_failover(path, payload, timeout, primary_backend))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return tasks[0].result()
+            
+            logger.info("LLM request hedged", purpose=purpose, delay=round(delay, 2), backend=primary_backend.url)
+            tasks.append(asyncio.create_task(
+                self._post_with_failover(path, payload, timeout - delay, exclude={primary_backend.url})
+            ))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                await cancel_and_wait(task)
+    
+    def _hedge_delay(self, purpose: str, model: str) -> Optional[float]:
+        """Задержка дублирования - процентиль длительности полного ответа.
         
+        Обычно дублируют по времени до первого токена, но запросы идут без stream: первого
+        токена клиент не видит, и ждет он полный ответ. Поэтому и замеряется, и сравнивается
+        с задержкой одна величина - время до полного ответа.
+        """
+        if settings.OLLAMA_HEDGE_PERCENTILE <= 0:
+            return None
+        return self.latencies.percentile(f"{purpose}/{model}", settings.OLLAMA_HEDGE_PERCENTILE)
+    
+    def _fit_to_deadline(self, options: Dict, timeout: float, model: str) -> None:
+        """Ограничивает длину ответа тем, что модель успеет сгенерировать до дедлайна"""
+        decode_rate = self._decode_rates.get(model)
+        if not decode_rate:
+            return
+        affordable = int(timeout * DEADLINE_DECODE_SHARE * decode_rate)
+        options["num_predict"] = max(min(options["num_predict"], affordable), MIN_NUM_PREDICT)
+    
+    def _observe_decode_rate(self, model: str, result: Dict) -> None:
+        eval_count, eval_duration = result.get("eval_count"), result.get("eval_duration")
+        if not isinstance(eval_count, int) or not isinstance(eval_duration, int) or eval_duration <= 0:
+            return
+        rate = eval_count / (eval_duration / 1e9)
+        previous = self._decode_rates.get(model)
+        self._decode_rates[model] = rate if previous is None else previous + 0.2 * (rate - previous)
+    
+    async def _generate(self, path: str, payload: Dict, extract: Callable[[Dict], str], prompt_length: int,
+                        purpose: str = "default", deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Запрос к модели, назначенной типу запроса, с переходом на основную при неудачном ответе"""
+        # Проверяем доступность модели и автоматически выбираем доступную
+        if not self.breaker.is_open and not await self._ensure_model_available():
+            logger.warning("No suitable model available for generation")
+            self.breaker.record_failure("model unavailable")
+            return None
+        
+        model = self.model_for(purpose)
+        options = payload["options"]
+        text = await self._request(model, path, {**payload, "options": dict(options)}, extract, prompt_length, purpose, deadline)
+        
+        if model != self.model and self.router.needs_escalation(text):
+            logger.info("Escalating to main model", purpose=purpose, small_model=model, model=self.model)
+            escalated = await self._request(self.model, path, {**payload, "options": dict(options)}, extract, prompt_length, purpose, deadline)
+            # Если основная модель не ответила, короткий ответ маленькой модели лучше, чем никакого
+            text = escalated or text
+        return text
+    
+    async def _request(self, model: str, path: str, payload: Dict, extract: Callable[[Dict], str], prompt_length: int,
+                       purpose: str, deadline: Optional[Deadline]) -> Optional[str]:
+        timeout = self.timeout
+        if deadline:
+            timeout = deadline.timeout(self.timeout)
+            if timeout < MIN_REQUEST_SECONDS:
+                logger.info("LLM request skipped, deadline exhausted", purpose=purpose, remaining=round(timeout, 2))
+                return None
+            self._fit_to_deadline(payload["options"], timeout, model)
+        
+        if not self.breaker.allow():
+            logger.info("LLM circuit open, failing fast", model=model)
+            return None
+        payload["options"]["num_ctx"] = self._context_size(model, payload["options"]["num_ctx"])
+        
+        started = time.monotonic()
+        try:
+            payload["model"] = model
+            result, backend = await self._post_hedged(path, payload, timeout, purpose)
+            duration = time.monotonic() - started
+            self.breaker.record_success(duration)
+            # Время до полного ответа - та же величина, с которой сравнивается задержка дублирования
+            self.latencies.observe(f"{purpose}/{model}", duration)
+            self._observe_decode_rate(model, result)
+            
+            generated_text = (extract(result) or "").strip()
+            
+            if generated_text:
+                logger.info(
+                    "LLM response generated successfully",
+                    model=model,
+                    backend=backend.url,
+                    prompt_length=prompt_length,
+                    response_length=len(generated_text),
+                    num_ctx=payload["options"]["num_ctx"],
+                    prompt_eval_count=result.get("prompt_eval_count")
+                )
+                return generated_text
+            else:
+                logger.warning("LLM returned empty response")
+                return None
+        
+        except NoBackendAvailable:
+            logger.error("No Ollama backend available", model=model)
+            self.breaker.record_failure("no backend")
+            return None
+        except asyncio.CancelledError:
+            # Выход из клиента закрывает соединение, и Ollama прекращает генерацию
+            logger.info("LLM request cancelled", model=model)
+            self.breaker.record_cancelled()
+            raise
         except httpx.TimeoutException:
-            logger.error("LLM request timeout", timeout=self.timeout)
+            logger.error("LLM request timeout", timeout=timeout, purpose=purpose)
+            # Не ошибка Ollama, только если истек сам дедлайн и времени было меньше, чем нужно
+            # исправному серверу (такой же успешный ответ выключатель счел бы медленным)
+            if deadline and deadline.expired and timeout < self.breaker.slow_call_seconds:
+                self.breaker.record_cancelled()
+            else:
+                self.breaker.record_failure("timeout")
             return None
         except httpx.HTTPStatusError as e:
             logger.error("LLM HTTP error", status_code=e.response.status_code, error=str(e))
+            self.breaker.record_failure(f"HTTP {e.response.status_code}")
             return None
         except Exception as e:
             logger.error("LLM generation failed", error=str(e))
+            self.breaker.record_failure(str(e))
             return None
     
     async def generate_recommendations(self, user_profile: str, programs_data: str) -> Optional[str]:
-        prompt = f"""
+        system = f"""
         Ты - консультант по образованию в области искусственного интеллекта.
         
-        Профиль пользователя:
-        {user_profile}
-        
         Доступные программы обучения:
         {programs_data}
         
@@ -79,29 +426,22 @@ class OllamaService:
         1. Рекомендуемую программу с обоснованием
         2. Конкретные выборочные дисциплины
         3. Краткий план развития
-        
-        Ответ:
         """
         
-        return await self.generate_response(prompt)
+        return await self.chat(system, f"Профиль пользователя:\n{user_profile}\n\nОтвет:", purpose="recommendations")
     
-    async def answer_question(self, question: str, context: str = None) -> Optional[str]:
-        logger.info("answer_question called", question_length=len(question), context_length=len(context) if context else 0)
-        
+    def qa_system_prompt(self, context: Optional[str] = None) -> str:
+        """Стабильная часть промпта Q&A: инструкции и каталог программ"""
         context_info = ""
         if context:
             context_info = f"""
-            Контекст о программах обучения:
-            {context}
-            """
+Контекст о программах обучения:
+{context}
+"""
         
-        prompt = f"""
+        return f"""
 Ты ассистент-консультант по магистерским программам ИТМО по ИИ. Отвечай кратко и точно на конкретные вопросы.
 
-{context_info}
-
-Вопрос: {question}
-
 ИНСТРУКЦИИ:
 - Дай прямой конкретный ответ на вопрос
 - Используй ТОЛЬКО информацию из предоставленных данных о программах
@@ -110,11 +450,21 @@ class OllamaService:
 - Будь кратким и по существу
 
 СТИЛЬ: Прямой, конкретный, как в обычном чате. Без лишних формальностей.
-
-Ответ:
-"""
+{context_info}"""
+    
+    async def prime_qa_prefix(self, context: str) -> bool:
+        return await self.prime_prefix(self.qa_system_prompt(context), purpose="qa")
+    
+    async def answer_question(self, question: str, context: str = None, deadline: Optional[Deadline] = None,
+                              retrieved: Optional[str] = None) -> Optional[str]:
+        """retrieved - найденные по вопросу сведения; идут в сообщение пользователя, чтобы не менять префикс"""
+        logger.info("answer_question called", question_length=len(question), context_length=len(context) if context else 0)
         
-        result = await self.generate_response(prompt)
+        user = f"Вопрос: {question}\n\nОтвет:"
+        if retrieved:
+            user = f"Сведения, относящиеся к вопросу:\n{retrieved}\n\n{user}"
+        # Каталог идет в системном сообщении, которое не меняется между вопросами
+        result = await self.chat(self.qa_system_prompt(context), user, purpose="qa", deadline=deadline)
         logger.info("answer_question result", result_length=len(result) if result else 0)
         return result
     
@@ -126,41 +476,39 @@ class OllamaService:
     async def _ensure_model_available(self) -> bool:
         """Проверяет доступность модели и автоматически выбирает подходящую"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                
-                models = response.json().get("models", [])
-                self._available_models = [model["name"] for model in models]
-                
-                # Проверяем, доступна ли настроенная модель
-                if self.model in self._available_models:
+            # Списки моделей обновляет проверка здоровья пула; запрашиваем заново, только если модели нет
+            if self.model not in self.pool.available_models():
+                await self.pool.health_check()
+            self._available_models = self.pool.available_models()
+            
+            # Проверяем, доступна ли настроенная модель
+            if self.model in self._available_models:
+                return True
+            
+            # Пытаемся найти подходящую модель
+            preferred_models = [
+                "llama3:latest", "llama3", "llama2:latest", "llama2",
+                "codellama:latest", "codellama", "mistral:latest", "mistral"
+            ]
+            
+            for preferred in preferred_models:
+                if preferred in self._available_models:
+                    old_model = self.model
+                    self.model = preferred
+                    logger.info(
+                        "Auto-selected available model",
+                        old_model=old_model,
+                        new_model=self.model,
+                        available_models=self._available_models
+                    )
                     return True
-                
-                # Пытаемся найти подходящую модель
-                preferred_models = [
-                    "llama3:latest", "llama3", "llama2:latest", "llama2",
-                    "codellama:latest", "codellama", "mistral:latest", "mistral"
-                ]
-                
-                for preferred in preferred_models:
-                    if preferred in self._available_models:
-                        old_model = self.model
-                        self.model = preferred
-                        logger.info(
-                            "Auto-selected available model",
-                            old_model=old_model,
-                            new_model=self.model,
-                            available_models=self._available_models
-                        )
-                        return True
-                
-                logger.warning(
-                    "No suitable model found",
-                    configured_model=self.model,
-                    available_models=self._available_models
-                )
-                return False
+            
+            logger.warning(
+                "No suitable model found",
+                configured_model=self.model,
+                available_models=self._available_models
+            )
+            return False
                 
         except Exception as e:
             logger.error("Failed to check model availability", error=str(e))
@@ -168,24 +516,22 @@ class OllamaService:
 
     async def check_connection(self) -> bool:
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                
-                models = response.json().get("models", [])
-                available_models = [model["name"] for model in models]
-                
-                if self.model not in available_models:
-                    logger.warning(
-                        "Configured model not available",
-                        model=self.model,
-                        available_models=available_models
-                    )
-                    # Пытаемся автоматически выбрать доступную модель
-                    return await self._ensure_model_available()
-                
-                logger.info("Ollama connection successful", model=self.model)
-                return True
+            if not await self.pool.health_check():
+                logger.error("Failed to connect to Ollama", backends=[backend.url for backend in self.pool.backends])
+                return False
+            
+            available_models = self.pool.available_models()
+            if self.model not in available_models:
+                logger.warning(
+                    "Configured model not available",
+                    model=self.model,
+                    available_models=available_models
+                )
+                # Пытаемся автоматически выбрать доступную модель
+                return await self._ensure_model_available()
+            
+            logger.info("Ollama connection successful", model=self.model, backends=len(self.pool.backends))
+            return True
         
         except Exception as e:
             logger.error("Failed to connect to Ollama", error=str(e))
@@ -0,0 +1,47 @@
+"""Выбор модели по типу запроса.
+
+Короткие ответы (Q&A, общий вопрос) может давать маленькая быстрая модель, длинные
+рекомендации и сравнения - основная модель (OLLAMA_MODEL). Если маленькая модель вернула
+пустой, слишком короткий или неуверенный ответ, запрос повторяется на основной.
+"""
+from typing import Dict, List, Optional
+from ..utils.keyword_automaton import KeywordAutomaton
+from ..utils.logger import logger
+
+# Ответ короче этого считается неудачным
+MIN_CONFIDENT_ANSWER_CHARS = 20
+# Неуверенность ищется только в начале ответа: оговорки в середине длинного ответа допустимы
+UNCERTAINTY_SCAN_CHARS = 300
+
+UNCERTAINTY_KEYWORDS = {
+    'uncertain': [
+        'не знаю', 'не могу ответить', 'затрудняюсь', 'нет информации', 'нет данных',
+        'не располагаю', 'не увер*', "i don't know", 'i am not sure', 'i cannot answer'
+    ]
+}
+
+def parse_model_routes(entries: List[str]) -> Dict[str, str]:
+    """Разбирает записи вида "тип_запроса=модель" """
+    routes = {}
+    for entry in entries:
+        purpose, sep, model = entry.partition("=")
+        if not sep or not purpose.strip() or not model.strip():
+            if entry.strip():
+                logger.warning("Invalid model route", route=entry)
+            continue
+        routes[purpose.strip()] = model.strip()
+    return routes
+
+class ModelRouter:
+    def __init__(self, routes: Dict[str, str]):
+        self.routes = routes
+        self._uncertainty = KeywordAutomaton(UNCERTAINTY_KEYWORDS)
+
+    def model_for(self, purpose: str, default_model: str) -> str:
+        return self.routes.get(purpose, default_model)
+
+    def needs_escalation(self, text: Optional[str]) -> bool:
+        """Ответ пустой, слишком короткий или начинается с признания в незнании"""
+        if not text or len(text.strip()) < MIN_CONFIDENT_ANSWER_CHARS:
+            return True
+        return bool(self._uncertainty.classify(text[:UNCERTAINTY_SCAN_CHARS]))
@@ -0,0 +1,96 @@
+"""Прогрев модели при запуске и поддержание ее в памяти в рабочие часы.
+
+Ollama выгружает модель через keep_alive после последнего запроса, и первый вопрос
+после простоя ждет загрузку модели и обработку каталога. Прогрев заранее загружает
+модель на всех серверах и вычисляет стабильные префиксы промптов, а периодический
+запрос в рабочие часы не дает модели выгрузиться. После обновления данных прогрев
+повторяется для новых префиксов; все прогревы идут через этот сервис.
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional, Tuple
+from ..data.json_storage import storage
+from ..data.models import ProgramsDiff
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.logger import logger
+from .llm_service import llm_service
+from .program_changes import program_changes
+from .prompt_prefix import prompt_prefixes
+
+def parse_hours(value: str) -> Optional[Tuple[int, int]]:
+    """Разбирает "8-23" в (8, 23); пустая строка - круглые сутки"""
+    if not value.strip():
+        return None
+    start, _, end = value.partition("-")
+    return int(start) % 24, int(end or start) % 24
+
+def in_hours(hours: Optional[Tuple[int, int]], now: datetime) -> bool:
+    if hours is None:
+        return True
+    start, end = hours
+    if start <= end:
+        return start <= now.hour < end
+    # Интервал через полночь, например 22-6
+    return now.hour >= start or now.hour < end
+
+class ModelWarmupService:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    async def warm_up(self) -> bool:
+        """Загружает модель и прогревает префиксы промптов на всех серверах"""
+        await llm_service.pool.health_check()
+        # Где модель выгружалась, кэш префиксов потерян - их нужно вычислить заново
+        llm_service.forget_cold_prefixes()
+
+        programs = await storage.load_programs()
+        if programs:
+            await prompt_prefixes.warmup(programs)
+        # Запрос без промпта продлевает keep_alive, даже если префиксы уже прогреты
+        warmed = await llm_service.load_model()
+        logger.info("Model warm-up completed", model=llm_service.model, success=warmed)
+        return warmed
+
+    async def _warm_up_in_background(self) -> None:
+        try:
+            await self.warm_up()
+        except Exception as e:
+            logger.error("Model warm-up failed", error=str(e))
+
+    def start_warm_up(self) -> asyncio.Task:
+        """Прогревает модель в фоне: бот начинает принимать сообщения, не дожидаясь загрузки модели"""
+        if self._warm_up_task is None or self._warm_up_task.done():
+            self._warm_up_task = asyncio.create_task(self._warm_up_in_background())
+        return self._warm_up_task
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        """Прогревает префиксы нового снимка; прогрев по старому снимку больше не нужен"""
+        if self._warm_up_task:
+            await cancel_and_wait(self._warm_up_task)
+        # В фоне: обновление данных не должно ждать модель
+        self.start_warm_up()
+
+    async def _keep_warm_loop(self, interval: float, hours: Optional[Tuple[int, int]]) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if not in_hours(hours, datetime.now()):
+                continue
+            try:
+                await self.warm_up()
+            except Exception as e:
+                logger.error("Keep-warm ping failed", error=str(e))
+
+    def start(self, interval: float, hours: str = "") -> None:
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._keep_warm_loop(interval, parse_hours(hours)))
+
+    async def stop(self) -> None:
+        tasks = [self._task, self._warm_up_task]
+        self._task = self._warm_up_task = None
+        for task in tasks:
+            if task:
+                await cancel_and_wait(task)
+
+model_warmup = ModelWarmupService()
+program_changes.subscribe(model_warmup.on_programs_changed)
@@ -0,0 +1,185 @@
+"""Пул серверов Ollama с балансировкой по числу активных запросов.
+
+Запрос уходит на доступный сервер с наименьшим числом запросов в работе на единицу веса.
+Серверы, где нужная модель уже загружена в память (/api/ps), предпочтительнее тех,
+где она только скачана (/api/tags); серверы без модели не выбираются.
+После нескольких ошибок подряд сервер исключается из пула на время, которое растет
+с каждым повторным исключением. Независимо от этого фоновая проверка здоровья снимает
+с маршрутизации недоступные серверы и возвращает их, как только они снова отвечают.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Collection, List, Optional, Set, Tuple, AsyncIterator
+import httpx
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.logger import logger
+
+DEFAULT_WEIGHT = 1.0
+# Ошибок подряд до исключения сервера из пула
+EJECT_AFTER_FAILURES = 3
+BASE_EJECTION_SECONDS = 30.0
+MAX_EJECTION_SECONDS = 600.0
+HEALTH_CHECK_TIMEOUT = 5.0
+
+class NoBackendAvailable(Exception):
+    """Нет ни одного доступного сервера с нужной моделью"""
+
+def parse_backends(entries: List[str]) -> List[Tuple[str, float]]:
+    """Разбирает записи вида "url" или "url|вес" """
+    backends = []
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, weight = entry.partition("|")
+        try:
+            value = float(weight) if weight else DEFAULT_WEIGHT
+        except ValueError:
+            logger.warning("Invalid Ollama backend weight", backend=entry)
+            value = DEFAULT_WEIGHT
+        if value > 0:
+            backends.append((url.strip().rstrip("/"), value))
+    return backends
+
+def model_tag(name: str) -> str:
+    """Имя модели с тегом: Ollama сообщает "llama3:latest" для модели, заданной как "llama3" """
+    return name if ":" in name else f"{name}:latest"
+
+class OllamaBackend:
+    def __init__(self, url: str, weight: float = DEFAULT_WEIGHT):
+        self.url = url
+        self.weight = weight
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        # None - список моделей еще не получен
+        self.models: Optional[Set[str]] = None
+        self.loaded_models: Set[str] = set()
+
+    def is_available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def has_loaded(self, model: str) -> bool:
+        return model_tag(model) in {model_tag(name) for name in self.loaded_models}
+
+    def affinity(self, model: str) -> int:
+        """2 - модель загружена в память, 1 - скачана или список неизвестен, 0 - модели нет"""
+        if self.has_loaded(model):
+            return 2
+        if self.models is None or model_tag(model) in {model_tag(name) for name in self.models}:
+            return 1
+        return 0
+
+    def load(self) -> float:
+        return (self.in_flight + 1) / self.weight
+
+class OllamaPool:
+    def __init__(self, backends: List[Tuple[str, float]]):
+        self.backends = [OllamaBackend(url, weight) for url, weight in backends]
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def primary_url(self) -> str:
+        return self.backends[0].url
+
+    def available_models(self) -> List[str]:
+        """Модели, доступные хотя бы на одном работающем сервере"""
+        now = time.monotonic()
+        models = set()
+        for backend in self.backends:
+            if backend.is_available(now) and backend.models:
+                models |= backend.models
+        return sorted(models)
+
+    def candidates(self, model: str, exclude: Collection[str] = ()) -> List[OllamaBackend]:
+        """Доступные серверы, на которых есть модель; exclude - адреса уже опробованных серверов"""
+        now = time.monotonic()
+        return [
+            backend for backend in self.backends
+            if backend.url not in exclude and backend.is_available(now) and backend.affinity(model)
+        ]
+
+    def pick(self, model: str, exclude: Collection[str] = ()) -> OllamaBackend:
+        candidates = self.candidates(model, exclude)
+        if not candidates:
+            raise NoBackendAvailable(model)
+        # Сначала сервер с загруженной моделью, затем наименьшая нагрузка на единицу веса
+        return min(candidates, key=lambda b: (-b.affinity(model), b.load()))
+
+    @asynccontextmanager
+    async def acquire(self, model: str, backend: Optional[OllamaBackend] = None,
+                      exclude: Collection[str] = ()) -> AsyncIterator[OllamaBackend]:
+        """Занимает сервер на время запроса; backend - конкретный сервер вместо выбора балансировщиком"""
+        backend = backend or self.pick(model, exclude)
+        backend.in_flight += 1
+        try:
+            yield backend
+        finally:
+            backend.in_flight -= 1
+
+    def report_success(self, backend: OllamaBackend, model: Optional[str] = None) -> None:
+        backend.consecutive_failures = 0
+        backend.ejections = 0
+        if model:
+            # После ответа модель остается в памяти на время keep_alive
+            backend.loaded_models.add(model)
+
+    def report_failure(self, backend: OllamaBackend, error: str = "") -> None:
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures < EJECT_AFTER_FAILURES:
+            return
+        cooldown = min(BASE_EJECTION_SECONDS * 2 ** backend.ejections, MAX_EJECTION_SECONDS)
+        backend.ejected_until = time.monotonic() + cooldown
+        backend.ejections += 1
+        backend.consecutive_failures = 0
+        backend.loaded_models.clear()
+        logger.warning("Ollama backend ejected", backend=backend.url, cooldown=cooldown, error=error)
+
+    async def _check_backend(self, client: httpx.AsyncClient, backend: OllamaBackend) -> bool:
+        try:
+            response = await client.get(f"{backend.url}/api/tags")
+            response.raise_for_status()
+            models = {model["name"] for model in response.json().get("models", [])}
+
+            response = await client.get(f"{backend.url}/api/ps")
+            response.raise_for_status()
+            loaded = {model["name"] for model in response.json().get("models", [])}
+        except Exception as e:
+            if backend.healthy:
+                logger.warning("Ollama backend health check failed", backend=backend.url, error=str(e))
+            backend.healthy = False
+            backend.loaded_models.clear()
+            return False
+
+        if not backend.healthy:
+            logger.info("Ollama backend reinstated", backend=backend.url)
+        backend.healthy = True
+        backend.models = models
+        backend.loaded_models = loaded
+        return True
+
+    async def health_check(self) -> bool:
+        """Проверяет все серверы параллельно; True, если доступен хотя бы один"""
+        async with httpx.AsyncClient(timeout=HEALTH_CHECK_TIMEOUT) as client:
+            results = await asyncio.gather(*(self._check_backend(client, backend) for backend in self.backends))
+        return any(results)
+
+    async def _health_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                logger.error("Ollama health check loop failed", error=str(e))
+
+    def start_health_checks(self, interval: float) -> None:
+        if interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(interval))
+
+    async def stop_health_checks(self) -> None:
+        task, self._health_task = self._health_task, None
+        if task:
+            await cancel_and_wait(task)
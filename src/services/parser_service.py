@@ -1,6 +1,7 @@
 import httpx
-from bs4 import BeautifulSoup
-from typing import List, Optional, Dict, Tuple
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Optional, Dict, Tuple, Iterable, Iterator
+from itertools import chain, islice
 from urllib.parse import urljoin, urlparse
 import re
 from ..data.models import Program, Course, ProgramType, ProgramDetails
@@ -15,6 +16,37 @@ from pathlib import Path
 from ..utils.config import settings
 import json
 
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+# Теги, которые не нужны ни для текста страницы, ни для поиска ссылок: их содержимое
+# разбирается отдельно по исходному HTML (__NEXT_DATA__ и inline-скрипты)
+_SKIPPED_PAGE_TAGS = frozenset({'html', 'head', 'body', 'script', 'style', 'noscript', 'link', 'template', 'svg'})
+_NEXT_DATA_RE = re.compile(r'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.I | re.S)
+_SCRIPT_BODY_RE = re.compile(r'<script\b[^>]*>(.*?)</script>', re.I | re.S)
+_SCRIPT_CURRICULUM_URL_PATTERNS = (
+    re.compile(r'["\']https?://[^"\']*(?:plan|curriculum|academic)[^"\']*\.pdf["\']', re.I),
+    re.compile(r'["\']https?://api\.itmo\.su[^"\']*plan[^"\']*\.pdf["\']', re.I),
+    re.compile(r'academic_plan["\']:\s*["\']([^"\']+\.pdf)["\']', re.I),
+)
+
+# Паттерны разбора строк учебного плана в Excel (компилируются один раз на модуль)
+_EXCEL_HEADER_SCAN_ROWS = 20
+_EXCEL_HEADER_KEYWORDS = (
+    ('semester', ('семестр', 'semester')),
+    ('name', ('наименование', 'дисципли', 'модул', 'название', 'name')),
+    ('credits', ('з.е', 'кредит', 'зачет', 'credit')),
+    ('hours', ('час', 'hour')),
+)
+_MANDATORY_CATEGORY_RE = re.compile(r'Обязательные\s+дисциплины', re.I)
+_ELECTIVE_CATEGORY_RE = re.compile(r'Пул\s+выборных\s+дисциплин', re.I)
+_BLOCK_MARKER_RE = re.compile(r'Блок\s+\d+', re.I)
+_BLOCK_NAME_RE = re.compile(r'Блок\s+\d+\.?\s*(.+)', re.I)
+_DIGITS_RE = re.compile(r'\d+')
+
 class ITMOParser:
     def __init__(self):
         self.base_url = "https://abit.itmo.ru"
@@ -270,7 +302,10 @@ class ITMOParser:
             response = await client.get(url)
             response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        html = response.text
+        soup = self._build_page_soup(html)
+        # __NEXT_DATA__ разбираем один раз и переиспользуем для деталей и поиска учебного плана
+        next_data = self._extract_next_data(html)
         
         # Извлекаем название программы
         title_elem = soup.find('h1') or soup.find('title')
@@ -278,10 +313,10 @@ class ITMOParser:
         
         # Извлекаем описание и дополнительную информацию
         description = await self._extract_description(soup)
-        details = await self._extract_program_details(soup)
+        details = await self._extract_program_details(soup, next_data)
         
         # Ищем ссылку на учебный план
-        curriculum_url = await self._find_curriculum_link(soup, url)
+        curriculum_url = await self._find_curriculum_link(soup, url, next_data, html)
         
         # Парсим учебный план
         courses = []
@@ -311,6 +346,25 @@ class ITMOParser:
         logger.info("Program parsed", program_id=program.id, courses_count=len(courses))
         return program
     
+    def _build_page_soup(self, html: str) -> BeautifulSoup:
+        """Строит дерево страницы без скриптов, стилей и прочих неконтентных тегов"""
+        strainer = SoupStrainer(lambda name, attrs: name not in _SKIPPED_PAGE_TAGS)
+        return BeautifulSoup(html, _HTML_PARSER, parse_only=strainer)
+    
+    def _extract_next_data(self, html: str) -> dict:
+        """Находит и разбирает JSON из <script id="__NEXT_DATA__"> напрямую в исходном HTML"""
+        match = _NEXT_DATA_RE.search(html)
+        if not match:
+            return {}
+        
+        try:
+            data = json.loads(match.group(1))
+        except ValueError as e:
+            logger.debug("Failed to parse JSON data", error=str(e))
+            return {}
+        
+        return data if isinstance(data, dict) else {}
+    
     async def _extract_description(self, soup: BeautifulSoup) -> Optional[str]:
         # Ищем описание программы в различных местах
         selectors = [
@@ -334,8 +388,11 @@ class ITMOParser:
         
         return None
     
-    async def _extract_program_details(self, soup: BeautifulSoup) -> Optional[ProgramDetails]:
-        """Извлекает детали программы с очисткой и структурированием данных"""
+    async def _extract_program_details(self, soup: BeautifulSoup, next_data: Optional[dict] = None) -> Optional[ProgramDetails]:
+        """Извлекает детали программы с очисткой и структурированием данных.
+        
+        next_data - уже разобранный __NEXT_DATA__; если не передан, ищется в самом дереве.
+        """
         details = ProgramDetails()
         
         # Получаем весь текст страницы для анализа
@@ -343,10 +400,10 @@ class ITMOParser:
         
         try:
             # Поиск в JSON данных страницы
-            next_data_script = soup.find('script', {'id': '__NEXT_DATA__'})
-            if next_data_script and next_data_script.string:
-                data = json.loads(next_data_script.string)
-                self._extract_details_from_json_clean(data, details)
+            if next_data is None:
+                next_data = self._next_data_from_soup(soup)
+            if next_data:
+                self._extract_details_from_json_clean(next_data, details)
             
             # Дополнительное извлечение из HTML с регулярными выражениями
             self._extract_details_from_html_clean(soup, page_text, details)
@@ -761,18 +818,37 @@ class ITMOParser:
         return cleaned.strip()
 
     
-    async def _find_curriculum_link(self, soup: BeautifulSoup, base_url: str) -> Optional[str]:
+    def _next_data_from_soup(self, soup: BeautifulSoup) -> dict:
+        """Достает __NEXT_DATA__ из дерева, построенного без фильтрации скриптов"""
+        next_data_script = soup.find('script', {'id': '__NEXT_DATA__'})
+        if next_data_script and next_data_script.string:
+            try:
+                return json.loads(next_data_script.string)
+            except ValueError as e:
+                logger.debug("Failed to parse JSON data", error=str(e))
+        return {}
+    
+    async def _find_curriculum_link(
+        self,
+        soup: BeautifulSoup,
+        base_url: str,
+        next_data: Optional[dict] = None,
+        html: Optional[str] = None
+    ) -> Optional[str]:
         """
-        Ищет ссылку на учебный план, включая поиск в JSON данных страницы
+        Ищет ссылку на учебный план, включая поиск в JSON данных страницы.
+        
+        next_data и html передаются из _parse_program_page, чтобы не разбирать
+        __NEXT_DATA__ повторно и искать в скриптах, не попавших в дерево.
         """
         logger.info("Searching for curriculum link", base_url=base_url)
         
         # 1. Ищем в JSON данных страницы (Next.js __NEXT_DATA__)
         try:
-            next_data_script = soup.find('script', {'id': '__NEXT_DATA__'})
-            if next_data_script and next_data_script.string:
-                data = json.loads(next_data_script.string)
-                
+            if next_data is None:
+                next_data = self._next_data_from_soup(soup)
+            
+            if next_data:
                 # Ищем academic_plan в JSON
                 def find_academic_plan(obj, path=""):
                     if isinstance(obj, dict):
@@ -791,7 +867,7 @@ class ITMOParser:
                                 return result
                     return None
                 
-                academic_plan_url = find_academic_plan(data)
+                academic_plan_url = find_academic_plan(next_data)
                 if academic_plan_url:
                     return academic_plan_url
                     
@@ -800,23 +876,20 @@ class ITMOParser:
         
         # 2. Ищем URL в JavaScript коде
         try:
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    # Ищем URL паттерны для учебных планов
-                    patterns = [
-                        r'["\']https?://[^"\']*(?:plan|curriculum|academic)[^"\']*\.pdf["\']',
-                        r'["\']https?://api\.itmo\.su[^"\']*plan[^"\']*\.pdf["\']',
-                        r'academic_plan["\']:\s*["\']([^"\']+\.pdf)["\']'
-                    ]
-                    
-                    for pattern in patterns:
-                        matches = re.findall(pattern, script.string, re.I)
-                        for match in matches:
-                            url = match.strip('\'"')
-                            if url.startswith('http'):
-                                logger.info("Found curriculum URL in JavaScript", url=url)
-                                return url
+            if html is not None:
+                script_sources = (match.group(1) for match in _SCRIPT_BODY_RE.finditer(html))
+            else:
+                script_sources = (script.string for script in soup.find_all('script') if script.string)
+            
+            for source in script_sources:
+                # Ищем URL паттерны для учебных планов
+                for pattern in _SCRIPT_CURRICULUM_URL_PATTERNS:
+                    matches = pattern.findall(source)
+                    for match in matches:
+                        url = match.strip('\'"')
+                        if url.startswith('http'):
+                            logger.info("Found curriculum URL in JavaScript", url=url)
+                            return url
         except Exception as e:
             logger.debug("Failed to parse JavaScript", error=str(e))
         
@@ -1031,12 +1104,15 @@ class ITMOParser:
         
         try:
             with BytesIO(content) as xlsx_file:
-                workbook = openpyxl.load_workbook(xlsx_file)
-                
-                for sheet_name in workbook.sheetnames:
-                    sheet = workbook[sheet_name]
-                    sheet_courses = self._extract_courses_from_excel_sheet_improved(sheet)
-                    courses.extend(sheet_courses)
+                # read_only + values_only: строки читаются потоково, без материализации всех ячеек
+                workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+                try:
+                    for sheet in workbook.worksheets:
+                        rows = sheet.iter_rows(values_only=True)
+                        sheet_courses = self._extract_courses_from_excel_sheet_improved(rows)
+                        courses.extend(sheet_courses)
+                finally:
+                    workbook.close()
         
         except Exception as e:
             logger.error("Failed to parse XLSX curriculum", error=str(e))
@@ -1176,58 +1252,76 @@ class ITMOParser:
         
         return None
     
-    def _extract_courses_from_excel_sheet_improved(self, sheet) -> List[Course]:
-        """Улучшенное извлечение курсов из Excel листа"""
-        courses = []
+    def _detect_excel_headers(self, rows: Iterator[tuple]) -> Tuple[Dict[str, int], List[tuple]]:
+        """Ищет заголовки колонок в первых строках листа.
         
-        # Ищем заголовки колонок более тщательно
+        Возвращает найденные колонки и строки, прочитанные после строки заголовков
+        (они уже извлечены из потока и должны быть обработаны как данные).
+        """
         headers = {}
         header_row = 0
+        scanned = []
         
-        for row_idx, row in enumerate(sheet.iter_rows(max_row=20)):
-            for col_idx, cell in enumerate(row):
-                if cell.value:
-                    value = str(cell.value).lower()
-                    
-                    if any(word in value for word in ['семестр', 'semester']):
-                        headers['semester'] = col_idx
-                    elif any(word in value for word in ['наименование', 'дисципли', 'модул', 'название', 'name']):
-                        headers['name'] = col_idx
-                    elif any(word in value for word in ['з.е', 'кредит', 'зачет', 'credit']):
-                        headers['credits'] = col_idx
-                    elif any(word in value for word in ['час', 'hour']):
-                        headers['hours'] = col_idx
+        for row_idx, row in enumerate(islice(rows, _EXCEL_HEADER_SCAN_ROWS)):
+            scanned.append(row)
+            for col_idx, value in enumerate(row):
+                if not value:
+                    continue
+                
+                value = str(value).lower()
+                for field, keywords in _EXCEL_HEADER_KEYWORDS:
+                    if any(word in value for word in keywords):
+                        headers[field] = col_idx
+                        break
             
             if len(headers) >= 3:  # Нашли основные колонки
                 header_row = row_idx
                 break
         
+        return headers, scanned[header_row + 1:]
+    
+    def _extract_courses_from_excel_sheet_improved(self, rows: Iterable[tuple]) -> List[Course]:
+        """Улучшенное извлечение курсов из строк Excel листа (кортежи значений ячеек)"""
+        courses = []
+        rows = iter(rows)
+        
+        headers, pending_rows = self._detect_excel_headers(rows)
+        
         if len(headers) < 2:
             logger.warning("Could not find proper headers in Excel sheet")
             return courses
         
+        name_col = headers.get('name')
+        credits_col = headers.get('credits')
+        hours_col = headers.get('hours')
+        semester_col = headers.get('semester')
+        
+        def cell(row: tuple, col: Optional[int]):
+            return row[col] if col is not None and col < len(row) else None
+        
         current_category = "Обязательные дисциплины"
         current_block = "Модули (дисциплины)"
         current_semester = 1
         
-        # Парсим данные
-        for row_idx, row in enumerate(sheet.iter_rows(min_row=header_row + 2)):
+        # Парсим данные: сначала уже прочитанные строки, затем остаток потока
+        for row_idx, row in enumerate(chain(pending_rows, rows)):
             try:
                 # Проверяем на служебные строки
-                first_cell = str(row[0].value or "").strip()
+                first_cell = str(row[0] or "").strip() if row else ""
                 
                 # Определяем категорию и блоки
-                if re.search(r'Обязательные\s+дисциплины', first_cell, re.I):
-                    current_category = "Обязательные дисциплины"
-                    continue
-                elif re.search(r'Пул\s+выборных\s+дисциплин', first_cell, re.I):
-                    current_category = "Пул выборных дисциплин"
-                    continue
-                elif re.search(r'Блок\s+\d+', first_cell, re.I):
-                    match = re.search(r'Блок\s+\d+\.?\s*(.+)', first_cell, re.I)
-                    if match:
-                        current_block = match.group(1).strip()
-                    continue
+                if first_cell:
+                    if _MANDATORY_CATEGORY_RE.search(first_cell):
+                        current_category = "Обязательные дисциплины"
+                        continue
+                    elif _ELECTIVE_CATEGORY_RE.search(first_cell):
+                        current_category = "Пул выборных дисциплин"
+                        continue
+                    elif _BLOCK_MARKER_RE.search(first_cell):
+                        match = _BLOCK_NAME_RE.search(first_cell)
+                        if match:
+                            current_block = match.group(1).strip()
+                        continue
                 
                 # Извлекаем данные курса
                 name = ""
@@ -1235,22 +1329,23 @@ class ITMOParser:
                 hours = 0
                 semester = current_semester
                 
-                if 'name' in headers and len(row) > headers['name'] and row[headers['name']].value:
-                    name = str(row[headers['name']].value).strip()
+                name_val = cell(row, name_col)
+                if name_val:
+                    name = str(name_val).strip()
                 
-                if 'credits' in headers and len(row) > headers['credits'] and row[headers['credits']].value:
-                    credits_val = str(row[headers['credits']].value)
-                    credits_match = re.search(r'\d+', credits_val)
+                credits_val = cell(row, credits_col)
+                if credits_val:
+                    credits_match = _DIGITS_RE.search(str(credits_val))
                     credits = int(credits_match.group()) if credits_match else 0
                 
-                if 'hours' in headers and len(row) > headers['hours'] and row[headers['hours']].value:
-                    hours_val = str(row[headers['hours']].value)
-                    hours_match = re.search(r'\d+', hours_val)
+                hours_val = cell(row, hours_col)
+                if hours_val:
+                    hours_match = _DIGITS_RE.search(str(hours_val))
                     hours = int(hours_match.group()) if hours_match else 0
                 
-                if 'semester' in headers and len(row) > headers['semester'] and row[headers['semester']].value:
-                    semester_val = str(row[headers['semester']].value)
-                    semester_match = re.search(r'\d+', semester_val)
+                semester_val = cell(row, semester_col)
+                if semester_val:
+                    semester_match = _DIGITS_RE.search(str(semester_val))
                     if semester_match:
                         semester = int(semester_match.group())
                         current_semester = semester
@@ -1279,4 +1374,4 @@ class ITMOParser:
                 logger.debug("Failed to parse excel row", row_number=row_idx, error=str(e))
                 continue
         
-        return courses 
\ No newline at end of file
+        return courses 
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+from typing import List, Dict, Callable, Awaitable, Optional
+from datetime import datetime
+from ..data.models import Program, Course, ProgramChange, CourseChange, ProgramsDiff
+from ..data.json_storage import storage
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.logger import logger
+
+ProgramsChangeHandler = Callable[[ProgramsDiff], Awaitable[None]]
+
+# Поля, которые сравниваются при обновлении (parsed_at меняется при каждом парсинге и не учитывается)
+PROGRAM_FIELDS = ("name", "url", "description", "total_credits", "duration_semesters")
+COURSE_FIELDS = ("credits", "hours", "is_elective", "block", "category", "prerequisites", "description")
+
+def snapshot_fingerprint(programs: List[Program]) -> tuple:
+    """Отпечаток содержимого снимка для кэшей, построенных по списку программ.
+    
+    Складывается из хэшей программ (Program.content_hashes): повторный парсинг тех же данных
+    и повторная загрузка версии дают тот же отпечаток. Для программ из бинарного снимка
+    хэши сохранены в нем, и курсы для отпечатка не декодируются.
+    """
+    return tuple((program.id, *program.content_hashes()) for program in programs)
+
+def courses_fingerprint(programs: List[Program]) -> tuple:
+    """Отпечаток для индексов по курсам: зависит только от названий программ и их курсов"""
+    return tuple((program.id, program.name, program.content_hashes()[0]) for program in programs)
+
+def snapshot_version(programs: List[Program]) -> str:
+    """Хэш содержимого снимка для результатов, сохраняемых на диск"""
+    payload = json.dumps(snapshot_fingerprint(programs), ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def _course_key(course: Course) -> str:
+    return f"{course.name.strip().lower()}|{course.semester}"
+
+def _index_courses(courses: List[Course]) -> Dict[str, Course]:
+    """Индексирует курсы по стабильному ключу; повторы получают порядковый суффикс"""
+    indexed = {}
+    for course in courses:
+        key = _course_key(course)
+        unique_key = key
+        occurrence = 1
+        while unique_key in indexed:
+            occurrence += 1
+            unique_key = f"{key}#{occurrence}"
+        indexed[unique_key] = course
+    return indexed
+
+def _diff_program(old: Program, new: Program) -> Optional[ProgramChange]:
+    change = ProgramChange(program_id=new.id, status="changed")
+    
+    change.changed_fields = [
+        field for field in PROGRAM_FIELDS
+        if getattr(old, field) != getattr(new, field)
+    ]
+    
+    old_details = old.details.model_dump() if old.details else {}
+    new_details = new.details.model_dump() if new.details else {}
+    change.changed_details = [
+        field for field in sorted(set(old_details) | set(new_details))
+        if old_details.get(field) != new_details.get(field)
+    ]
+    
+    old_courses = _index_courses(old.courses)
+    new_courses = _index_courses(new.courses)
+    
+    change.added_courses = [new_courses[key].name for key in new_courses if key not in old_courses]
+    change.removed_courses = [old_courses[key].name for key in old_courses if key not in new_courses]
+    
+    for key, new_course in new_courses.items():
+        old_course = old_courses.get(key)
+        if old_course is None:
+            continue
+        fields = [
+            field for field in COURSE_FIELDS
+            if getattr(old_course, field) != getattr(new_course, field)
+        ]
+        if fields:
+            change.changed_courses.append(CourseChange(key=key, name=new_course.name, fields=fields))
+    
+    has_changes = (
+        change.changed_fields or change.changed_details or change.added_courses
+        or change.removed_courses or change.changed_courses
+    )
+    return change if has_changes else None
+
+def diff_programs(old_programs: List[Program], new_programs: List[Program]) -> ProgramsDiff:
+    """Вычисляет структурную разницу между двумя наборами программ"""
+    old_by_id = {program.id: program for program in old_programs}
+    new_by_id = {program.id: program for program in new_programs}
+    
+    changes = []
+    for program_id, new_program in new_by_id.items():
+        old_program = old_by_id.get(program_id)
+        if old_program is None:
+            changes.append(ProgramChange(
+                program_id=program_id,
+                status="added",
+                added_courses=[course.name for course in new_program.courses]
+            ))
+            continue
+        
+        change = _diff_program(old_program, new_program)
+        if change:
+            changes.append(change)
+    
+    for program_id, old_program in old_by_id.items():
+        if program_id not in new_by_id:
+            changes.append(ProgramChange(
+                program_id=program_id,
+                status="removed",
+                removed_courses=[course.name for course in old_program.courses]
+            ))
+    
+    return ProgramsDiff(changes=changes, created_at=datetime.now())
+
+class ProgramChangesService:
+    """Применяет обновления программ и оповещает подписчиков только о реальных изменениях"""
+    
+    def __init__(self):
+        self._handlers: List[ProgramsChangeHandler] = []
+        # Версия снимка, о которой подписчики этого процесса уже знают
+        self._known_version: Optional[str] = None
+        self._watch_task: Optional[asyncio.Task] = None
+    
+    def subscribe(self, handler: ProgramsChangeHandler) -> None:
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+    
+    def unsubscribe(self, handler: ProgramsChangeHandler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+    
+    async def publish(self, diff: ProgramsDiff) -> None:
+        for handler in list(self._handlers):
+            try:
+                await handler(diff)
+            except Exception as e:
+                logger.error("Programs change handler failed", handler=getattr(handler, "__qualname__", str(handler)), error=str(e))
+    
+    async def apply_refresh(self, programs: List[Program]) -> ProgramsDiff:
+        """Сравнивает новые программы с сохраненными, сохраняет и публикует изменения"""
+        if storage.is_programs_pinned():
+            logger.info("Programs version pinned after rollback, refresh skipped", version=storage.get_current_programs_version())
+            return ProgramsDiff(changes=[], created_at=datetime.now())
+        
+        previous_programs = await storage.load_programs()
+        diff = diff_programs(previous_programs, programs)
+        
+        if not diff.has_changes:
+            logger.info("Programs unchanged, refresh skipped", count=len(programs))
+            return diff
+        
+        self._known_version = await storage.save_programs(programs)
+        await storage.append_programs_changelog(diff)
+        
+        logger.info(
+            "Programs changed",
+            programs=diff.affected_program_ids,
+            courses_changed=diff.courses_changed,
+            details_changed=diff.details_changed
+        )
+        await self.publish(diff)
+        return diff
+    
+    async def _switch_version(self, previous_version: Optional[str]) -> ProgramsDiff:
+        """Публикует разницу между предыдущей и текущей версией снимка"""
+        previous_programs = await storage.load_programs_version(previous_version) if previous_version else []
+        programs = await storage.load_programs()
+        self._known_version = storage.get_current_programs_version()
+        
+        diff = diff_programs(previous_programs, programs)
+        if diff.has_changes:
+            logger.info("Programs version switched", version=self._known_version, programs=diff.affected_program_ids)
+            await self.publish(diff)
+        return diff
+    
+    async def rollback(self, version: Optional[str] = None) -> Optional[ProgramsDiff]:
+        """Откатывает программы на сохраненную версию и публикует изменения"""
+        previous_version = storage.get_current_programs_version()
+        if not await storage.rollback_programs(version):
+            return None
+        
+        diff = await self._switch_version(previous_version)
+        if diff.has_changes:
+            await storage.append_programs_changelog(diff)
+        return diff
+    
+    async def check_current_version(self) -> Optional[ProgramsDiff]:
+        """Замечает смену версии другим процессом (откат через src.manage) и оповещает подписчиков"""
+        if storage.get_current_programs_version() == self._known_version:
+            return None
+        return await self._switch_version(self._known_version)
+    
+    async def _watch_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_current_version()
+            except Exception as e:
+                logger.error("Programs version check failed", error=str(e))
+    
+    def start_watch(self, interval: float) -> None:
+        if interval > 0 and self._watch_task is None:
+            self._known_version = storage.get_current_programs_version()
+            self._watch_task = asyncio.create_task(self._watch_loop(interval))
+    
+    async def stop_watch(self) -> None:
+        task, self._watch_task = self._watch_task, None
+        if task:
+            await cancel_and_wait(task)
+
+program_changes = ProgramChangesService()
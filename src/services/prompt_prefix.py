@@ -0,0 +1,55 @@
+from typing import List, Dict, Callable, Awaitable, Optional, Tuple
+from ..data.models import Program, ProgramsDiff
+from ..utils.logger import logger
+from .llm_service import llm_service
+from .program_changes import program_changes, snapshot_fingerprint
+
+PrefixBuilder = Callable[[List[Program]], str]
+PrefixWarmup = Callable[[str], Awaitable[bool]]
+
+class PromptPrefixService:
+    """Стабильные части промптов (каталог программ), собранные один раз на снимок данных.
+    
+    Одинаковый текст префикса позволяет Ollama переиспользовать его KV-кэш между запросами;
+    после обновления программ префиксы пересобираются. Прогревает их в модели
+    ModelWarmupService - и при запуске, и после обновления данных.
+    """
+
+    def __init__(self):
+        self._builders: Dict[str, Tuple[PrefixBuilder, Optional[PrefixWarmup], Optional[str]]] = {}
+        self._prefixes: Dict[str, Tuple[tuple, str]] = {}
+
+    def register(self, name: str, build: PrefixBuilder, warmup: Optional[PrefixWarmup] = None,
+                 purpose: Optional[str] = None) -> None:
+        """purpose - тип запроса к модели: префикс учитывается в размере ее контекста"""
+        self._builders[name] = (build, warmup, purpose)
+
+    def get(self, name: str, programs: List[Program]) -> str:
+        fingerprint = snapshot_fingerprint(programs)
+        cached = self._prefixes.get(name)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        build, _, purpose = self._builders[name]
+        prefix = build(programs)
+        self._prefixes[name] = (fingerprint, prefix)
+        if purpose:
+            llm_service.reserve_context(prefix, purpose)
+        logger.info("Prompt prefix built", name=name, length=len(prefix))
+        return prefix
+
+    async def warmup(self, programs: List[Program]) -> None:
+        """Собирает все префиксы и прогревает их в модели"""
+        # Сначала все префиксы: размер контекста модели должен вместить самый длинный
+        # до прогрева, иначе прогрев следующего префикса перезагрузит модель
+        prefixes = {name: self.get(name, programs) for name in self._builders}
+        for name, (_, warmup, _) in self._builders.items():
+            if warmup:
+                await warmup(prefixes[name])
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        # Префиксы старого снимка больше не понадобятся
+        self._prefixes.clear()
+
+prompt_prefixes = PromptPrefixService()
+program_changes.subscribe(prompt_prefixes.on_programs_changed)
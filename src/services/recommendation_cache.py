@@ -0,0 +1,103 @@
+"""Кэш персональных рекомендаций по содержимому профиля.
+
+Интересы и цели выбираются с фиксированных клавиатур, поэтому у многих пользователей
+профили совпадают. Ключ кэша - хэш нормализованных полей профиля и версии снимка программ,
+так что одинаковые профили получают одну рекомендацию, а обновление данных ее сбрасывает.
+Рекомендация начинает считаться в фоне сразу после сохранения профиля.
+"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..data.models import Program, ProgramsDiff, UserProfile
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.logger import logger
+from .program_changes import program_changes, snapshot_version
+
+RecommendationGenerator = Callable[[UserProfile, List[Program]], Awaitable[Optional[str]]]
+
+# Сколько разных профилей хранится одновременно
+MAX_CACHED_PROFILES = 512
+
+def profile_key(profile: UserProfile, programs: List[Program]) -> str:
+    """Канонический хэш профиля: регистр, пробелы и порядок выбора не влияют на ключ"""
+    canonical = {
+        "background": " ".join((profile.background or "").lower().split()),
+        "interests": sorted({interest.strip().lower() for interest in profile.interests}),
+        "goals": sorted({goal.strip().lower() for goal in profile.goals}),
+        "snapshot": snapshot_version(programs),
+    }
+    payload = json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class RecommendationCache:
+    def __init__(self, max_entries: int = MAX_CACHED_PROFILES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._generate: Optional[RecommendationGenerator] = None
+
+    def register(self, generate: RecommendationGenerator) -> None:
+        self._generate = generate
+
+    async def get(self, profile: UserProfile, programs: List[Program]) -> Optional[str]:
+        """Готовая рекомендация, ожидание уже идущего расчета или новый расчет"""
+        key = profile_key(profile, programs)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            logger.info("Recommendation cache hit", user_id=profile.user_id)
+            return self._entries[key]
+
+        task = self._start(key, profile, programs)
+        try:
+            # Отмена ожидающего обработчика не должна прерывать общий для одинаковых профилей расчет
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Расчет отменен обновлением данных, а не сам обработчик
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                return None
+            raise
+
+    def precompute(self, profile: UserProfile, programs: List[Program]) -> None:
+        """Начинает расчет в фоне, если рекомендации для такого профиля еще нет"""
+        if not programs:
+            return
+        key = profile_key(profile, programs)
+        if key not in self._entries:
+            self._start(key, profile, programs)
+
+    def _start(self, key: str, profile: UserProfile, programs: List[Program]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, profile, programs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget_inflight(key, done))
+        return task
+
+    def _forget_inflight(self, key: str, task: asyncio.Task) -> None:
+        # Отмененный расчет мог уже смениться новым под тем же ключом
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _compute(self, key: str, profile: UserProfile, programs: List[Program]) -> Optional[str]:
+        if self._generate is None:
+            return None
+        recommendation = await self._generate(profile, programs)
+        # Неудачный расчет не кэшируется: при следующем запросе LLM попробует снова
+        if recommendation:
+            self._entries[key] = recommendation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info("Recommendation cached", user_id=profile.user_id, cached_profiles=len(self._entries))
+        return recommendation
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        """Рекомендации по старому снимку больше не нужны"""
+        self._entries.clear()
+        for task in list(self._inflight.values()):
+            await cancel_and_wait(task)
+
+recommendation_cache = RecommendationCache()
+program_changes.subscribe(recommendation_cache.on_programs_changed)
@@ -1,13 +1,35 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+import asyncio
 import json
-from ..data.models import UserProfile, Program, Course, ProgramType
+from ..data.models import UserProfile, Program, Course, ProgramType, ProgramsDiff
 from .llm_service import llm_service
 from ..data.json_storage import storage
+from .program_changes import program_changes, snapshot_version
+from .course_scoring import course_scoring_service
+from .embedding_index import embedding_index_service, COURSE_DOCUMENT, SEMANTIC_MIN_SCORE
 from ..utils.logger import logger
+from ..utils.async_tasks import cancel_and_wait
+from ..utils.keyword_automaton import KeywordAutomaton
+
+# Категории профиля для правил без LLM ("слово*" - совпадение по основе)
+PROFILE_KEYWORDS = {
+    'tech_background': ['информатик*', 'программ*', 'it', 'техническ*'],
+    'ml': ['машинное обучение', 'данные', 'ml'],
+    'products': ['продукт*', 'стартап*', 'бизнес*'],
+    'career': ['карьер*', 'it']
+}
+
+profile_keywords = KeywordAutomaton(PROFILE_KEYWORDS)
+
+COMPARISON_ARTIFACT = "comparison"
 
 class RecommendationService:
     def __init__(self):
         self.programs_cache: List[Program] = []
+        # Сравнение зависит только от снимка программ: (версия снимка, текст)
+        self._comparison: Optional[Tuple[str, str]] = None
+        self._comparison_lock = asyncio.Lock()
+        self._comparison_task: Optional[asyncio.Task] = None
     
     async def get_program_recommendations(self, user_profile: UserProfile) -> Optional[str]:
         try:
@@ -40,25 +62,26 @@ class RecommendationService:
             if not target_program:
                 return []
             
-            elective_courses = [course for course in target_program.courses if course.is_elective]
-            
-            # Простая логика выбора на основе интересов пользователя
-            recommended_courses = []
-            user_interests = [interest.lower() for interest in user_profile.interests]
-            
-            for course in elective_courses:
-                course_name_lower = course.name.lower()
-                relevance_score = sum(
-                    1 for interest in user_interests
-                    if interest in course_name_lower
+            # Выборочные курсы по убыванию релевантности профилю
+            recommended_courses = [
+                scored.course for scored in course_scoring_service.rank(
+                    user_profile, programs, program_id=target_program.id, electives_only=True
                 )
-                
-                if relevance_score > 0:
-                    recommended_courses.append(course)
+            ]
+            
+            # Курсы, близкие к интересам по смыслу, но без общих слов с ними
+            semantic_results = await embedding_index_service.search(
+                ", ".join(user_profile.interests), programs, top_k=10, kinds=(COURSE_DOCUMENT,)
+            )
+            recommended_courses += [
+                document.course for document, score in semantic_results
+                if score >= SEMANTIC_MIN_SCORE and document.program.id == target_program.id
+                and document.course.is_elective and document.course not in recommended_courses
+            ]
             
             # Если нет совпадений, возвращаем первые несколько курсов
             if not recommended_courses:
-                recommended_courses = elective_courses[:3]
+                recommended_courses = [course for course in target_program.courses if course.is_elective][:3]
             
             return recommended_courses
         
@@ -67,11 +90,54 @@ class RecommendationService:
             return []
     
     async def compare_programs(self) -> Optional[str]:
+        """Сравнение программ, вычисленное один раз на снимок данных"""
         try:
             programs = await self._get_programs()
             if len(programs) < 2:
                 return "Недостаточно данных для сравнения программ."
             
+            version = snapshot_version(programs)
+            cached = await self._cached_comparison(version)
+            if cached:
+                return cached
+            
+            # Одновременные запросы (и фоновый расчет после обновления) ждут одну генерацию
+            async with self._comparison_lock:
+                cached = await self._cached_comparison(version)
+                if cached:
+                    return cached
+                
+                comparison = await self._generate_comparison(programs)
+                if not comparison:
+                    # Запасной вариант не сохраняется: при следующем запросе LLM попробует снова
+                    return self._generate_fallback_comparison(programs)
+                
+                self._comparison = (version, comparison)
+                await storage.save_snapshot_artifact(COMPARISON_ARTIFACT, version, {"text": comparison})
+                return comparison
+        
+        except Exception as e:
+            logger.error("Failed to compare programs", error=str(e))
+            return "Ошибка при сравнении программ."
+    
+    async def _cached_comparison(self, version: str) -> Optional[str]:
+        if self._comparison and self._comparison[0] == version:
+            return self._comparison[1]
+        
+        artifact = await storage.load_snapshot_artifact(COMPARISON_ARTIFACT, version)
+        if artifact and artifact.get("text"):
+            self._comparison = (version, artifact["text"])
+            return artifact["text"]
+        return None
+    
+    def precompute_comparison(self) -> asyncio.Task:
+        """Запускает расчет сравнения в фоне, чтобы пользователь получил готовый ответ"""
+        if self._comparison_task is None or self._comparison_task.done():
+            self._comparison_task = asyncio.create_task(self.compare_programs())
+        return self._comparison_task
+    
+    async def _generate_comparison(self, programs: List[Program]) -> Optional[str]:
+        try:
             comparison_data = self._format_programs_comparison(programs)
             
             prompt = f"""
@@ -88,12 +154,24 @@ class RecommendationService:
             Ответ:
             """
             
-            comparison = await llm_service.generate_response(prompt)
-            return comparison or self._generate_fallback_comparison(programs)
+            comparison = await llm_service.generate_response(prompt, purpose="comparison")
+            if comparison:
+                logger.info("Programs comparison generated", programs=[program.id for program in programs[:2]])
+            return comparison
         
         except Exception as e:
-            logger.error("Failed to compare programs", error=str(e))
-            return "Ошибка при сравнении программ."
+            logger.error("Failed to generate programs comparison", error=str(e))
+            return None
+    
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        """Сбрасывает кэш программ после обновления данных и заново считает сравнение"""
+        self.programs_cache = []
+        self._comparison = None
+        logger.info("Recommendation programs cache invalidated", programs=diff.affected_program_ids)
+        # Расчет по старому снимку больше не нужен
+        if self._comparison_task:
+            await cancel_and_wait(self._comparison_task)
+        self.precompute_comparison()
     
     async def _get_programs(self) -> List[Program]:
         if not self.programs_cache:
@@ -150,18 +228,13 @@ class RecommendationService:
         
         return comparison_text
     
-    def _get_personalized_courses(self, profile: UserProfile, program: Program) -> str:
+    def _get_personalized_courses(self, profile: UserProfile, program: Program, programs: List[Program]) -> str:
         """Генерирует персональные рекомендации курсов на основе интересов пользователя"""
-        user_interests = [interest.lower() for interest in profile.interests]
-        recommended_courses = []
-        
-        # Находим курсы, соответствующие интересам пользователя
-        for course in program.courses:
-            course_name_lower = course.name.lower()
-            for interest in user_interests:
-                if any(keyword in course_name_lower for keyword in interest.split()):
-                    recommended_courses.append(f"• **{course.name}** ({course.credits} кредитов)")
-                    break
+        # Находим курсы, соответствующие профилю пользователя, - самые релевантные первыми
+        recommended_courses = [
+            f"• **{scored.course.name}** ({scored.course.credits} кредитов) - {scored.explanation}"
+            for scored in course_scoring_service.rank(profile, programs, program_id=program.id, limit=5)
+        ]
         
         if not recommended_courses:
             # Если точных совпадений нет, рекомендуем выборочные курсы
@@ -175,7 +248,7 @@ class RecommendationService:
             return "Данные о программах недоступны."
         
         # Простая логика выбора программы
-        if any("продукт" in interest.lower() for interest in profile.interests):
+        if 'products' in profile_keywords.classify_many(profile.interests):
             recommended_program = next(
                 (p for p in programs if p.type == ProgramType.AI_PRODUCT), 
                 programs[0]
@@ -187,7 +260,7 @@ class RecommendationService:
             )
         
         # Получаем рекомендуемые курсы на основе интересов пользователя
-        recommended_courses = self._get_personalized_courses(profile, recommended_program)
+        recommended_courses = self._get_personalized_courses(profile, recommended_program, programs)
         
         return f"""
 > **Персональная рекомендация для тебя:**
@@ -221,4 +294,5 @@ class RecommendationService:
         Для детального анализа требуется дополнительная информация.
         """
 
-recommendation_service = RecommendationService() 
\ No newline at end of file
+recommendation_service = RecommendationService()
+program_changes.subscribe(recommendation_service.on_programs_changed)
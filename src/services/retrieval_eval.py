@@ -0,0 +1,103 @@
+"""Размеченный набор вопросов для оценки поиска контекста.
+
+Вопросы взяты из типичных обращений абитуриентов, метки - документы, которые должны
+попасть в контекст ответа: "course:<название курса>" или поле описания программы
+(cost_per_year, dormitory, ...). Полнота (recall@k) считается отдельно для лексического,
+смыслового и гибридного поиска по одному и тому же вызову, вместе с задержкой поиска.
+
+Запуск на текущих данных: python -m src.services.retrieval_eval [k]
+"""
+import asyncio
+import sys
+import time
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+from ..data.models import Program
+from ..utils.latency import LatencyTracker
+from .embedding_index import Document, COURSE_DOCUMENT
+from .hybrid_retrieval import HybridRetriever, hybrid_retriever
+
+COURSE_LABEL = "course:"
+
+class EvalCase(NamedTuple):
+    question: str
+    expected: Tuple[str, ...]
+
+class EvalReport(NamedTuple):
+    k: int
+    cases: int
+    # Средняя полнота в top-k: lexical, semantic, hybrid
+    recall: Dict[str, float]
+    latency_p50_ms: float
+    latency_p95_ms: float
+
+RETRIEVAL_EVAL_CASES: List[EvalCase] = [
+    EvalCase("Есть ли курс Глубокое обучение?", ("course:Глубокое обучение",)),
+    EvalCase("Чему учат на курсе по NLP?", ("course:Обработка естественного языка", "course:Технологии обработки естественного языка")),
+    EvalCase("Есть ли курсы по компьютерному зрению?", ("course:Технологии компьютерного зрения", "course:Компьютерное зрение (продвинутый уровень)")),
+    EvalCase("Где изучают большие языковые модели?", ("course:Введение в большие языковые модели (LLM)",)),
+    EvalCase("Есть ли дисциплина про рекомендательные системы?", ("course:Основы построения рекомендательных систем",)),
+    EvalCase("Изучают ли reinforcement learning?", ("course:Обучение с подкреплением",)),
+    EvalCase("Учат ли распознаванию речи?", ("course:Распознавание и генерация речи",)),
+    EvalCase("Будет ли MLOps?", ("course:Технологии и практики MLOps",)),
+    EvalCase("Как монетизировать AI-продукт, есть такой предмет?", ("course:Монетизация ИИ-продуктов",)),
+    EvalCase("Есть ли что-то про временные ряды?", ("course:Прикладной анализ временных рядов",)),
+    EvalCase("Сколько стоит обучение на контракте?", ("cost_per_year",)),
+    EvalCase("Есть ли общежитие для иногородних?", ("dormitory",)),
+    EvalCase("Есть ли военный учебный центр?", ("military_center",)),
+    EvalCase("Кто менеджер программы?", ("program_manager",)),
+    EvalCase("На каком языке идет обучение?", ("language",)),
+    EvalCase("Какая форма обучения?", ("form_of_study",)),
+    EvalCase("Сколько лет длится обучение?", ("duration",)),
+]
+
+def label_matches(document: Document, label: str) -> bool:
+    if label.startswith(COURSE_LABEL):
+        return document.kind == COURSE_DOCUMENT and document.course.name == label[len(COURSE_LABEL):]
+    # Ключ фрагмента описания: "<программа>/<поле>/<номер фрагмента>"
+    return document.kind != COURSE_DOCUMENT and document.key.split("/")[1] == label
+
+def recall_at_k(documents: Sequence[Document], expected: Sequence[str], k: int) -> float:
+    top = documents[:k]
+    found = sum(1 for label in expected if any(label_matches(document, label) for document in top))
+    return found / len(expected)
+
+async def evaluate(programs: List[Program], cases: Sequence[EvalCase] = RETRIEVAL_EVAL_CASES,
+                   k: int = 5, retriever: HybridRetriever = hybrid_retriever) -> EvalReport:
+    latencies = LatencyTracker(min_samples=1)
+    totals = {"lexical": 0.0, "semantic": 0.0, "hybrid": 0.0}
+    # Индекс строится до замеров: в задержку входит только сам поиск
+    retriever.lexical_index(programs)
+
+    for case in cases:
+        started = time.perf_counter()
+        retrieval = await retriever.retrieve(case.question, programs)
+        latencies.observe("retrieve", time.perf_counter() - started)
+
+        totals["lexical"] += recall_at_k([document for document, _ in retrieval.lexical], case.expected, k)
+        totals["semantic"] += recall_at_k([document for document, _ in retrieval.semantic], case.expected, k)
+        totals["hybrid"] += recall_at_k([retrieved.document for retrieved in retrieval.documents], case.expected, k)
+
+    cases_count = max(len(cases), 1)
+    return EvalReport(
+        k, len(cases),
+        {mode: total / cases_count for mode, total in totals.items()},
+        (latencies.percentile("retrieve", 50) or 0.0) * 1000,
+        (latencies.percentile("retrieve", 95) or 0.0) * 1000
+    )
+
+async def _main(k: int) -> None:
+    from ..data.json_storage import storage
+    from .embedding_index import embedding_index_service
+    from .llm_service import llm_service
+
+    programs = await storage.load_programs()
+    if await llm_service.check_connection():
+        await embedding_index_service.refresh(programs)
+    report = await evaluate(programs, k=k)
+    print(f"Вопросов: {report.cases}, k = {report.k}")
+    for mode, recall in report.recall.items():
+        print(f"recall@{report.k} {mode}: {recall:.2f}")
+    print(f"Задержка поиска: p50 {report.latency_p50_ms:.1f} мс, p95 {report.latency_p95_ms:.1f} мс")
+
+if __name__ == "__main__":
+    asyncio.run(_main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
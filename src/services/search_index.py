@@ -0,0 +1,348 @@
+import math
+import re
+from collections import Counter
+from typing import List, Dict, Optional, NamedTuple, Tuple
+from ..data.models import Program, Course, ProgramsDiff
+from ..utils.logger import logger
+from ..utils.text_normalization import normalize
+from .program_changes import program_changes, courses_fingerprint
+
+_PUNCTUATION_RE = re.compile(r'[,.?!]')
+MIN_TOKEN_LENGTH = 3
+# Длина префикса стема для частичных совпадений ("программирован" / "программн")
+PREFIX_LENGTH = 5
+# Базовая оценка совпадения названия курса целиком; такие совпадения считаются точными
+PHRASE_MATCH_SCORE = 10.0
+# Для поиска программы учитываются только слова длиннее трех букв
+PROGRAM_TOKEN_MIN_LENGTH = 4
+
+def clean_text(text: str) -> str:
+    return _PUNCTUATION_RE.sub('', text.lower())
+
+def tokenize(text: str) -> List[str]:
+    """Стемы значимых слов: "машинного обучения" и "машинное обучение" дают одни токены"""
+    return list(normalize(text, min_length=MIN_TOKEN_LENGTH))
+
+def prefix_key(token: str) -> Optional[str]:
+    return token[:PREFIX_LENGTH] if len(token) >= PREFIX_LENGTH else None
+
+# Нечеткий поиск: порог сходства по триграммам и допустимая доля правок на символ названия
+FUZZY_MIN_SIMILARITY = 0.45
+FUZZY_MAX_EDIT_RATIO = 0.25
+
+# Упрощенная транслитерация латиницы в кириллицу (сначала многобуквенные сочетания)
+_TRANSLIT = (
+    ('shch', 'щ'), ('sch', 'щ'), ('sh', 'ш'), ('ch', 'ч'), ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'),
+    ('yo', 'ё'), ('yu', 'ю'), ('ya', 'я'), ('iy', 'ий'), ('yy', 'ый'),
+    ('a', 'а'), ('b', 'б'), ('v', 'в'), ('g', 'г'), ('d', 'д'), ('e', 'е'), ('z', 'з'), ('i', 'и'),
+    ('j', 'й'), ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'), ('o', 'о'), ('p', 'п'), ('r', 'р'),
+    ('s', 'с'), ('t', 'т'), ('u', 'у'), ('f', 'ф'), ('h', 'х'), ('c', 'к'), ('y', 'ы'), ('w', 'в'),
+    ('x', 'кс'), ('q', 'к'),
+)
+_LATIN_WORD_RE = re.compile(r'[a-z]+')
+_TRANSLIT_RE = re.compile('|'.join(latin for latin, _ in _TRANSLIT))
+_TRANSLIT_MAP = dict(_TRANSLIT)
+
+def transliterate(text: str) -> str:
+    """Переводит латиницу в кириллицу: mashinnoe obuchenie -> машинное обучение"""
+    return _LATIN_WORD_RE.sub(lambda word: _TRANSLIT_RE.sub(lambda m: _TRANSLIT_MAP[m.group()], word.group()), text)
+
+def trigrams(text: str) -> frozenset:
+    """Триграммы слов, дополненных пробелами по краям (машина -> " ма", "маш", ..., "на ")"""
+    result = set()
+    for word in text.split():
+        padded = f" {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(result)
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Расстояние Левенштейна, если оно не больше max_distance, иначе None"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            )
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+_PARENTHESES_RE = re.compile(r'\([^)]*\)')
+
+class FuzzyNameIndex:
+    """Триграммный индекс названий для поиска с опечатками и транслитом"""
+
+    def __init__(self, names: List[str]):
+        # Каждое название индексируется целиком и без уточнений в скобках ("... (продвинутый уровень)")
+        self._names: List[str] = []
+        self._entry_ids: List[int] = []
+        for entry_idx, name in enumerate(names):
+            variants = {' '.join(clean_text(name).split()), ' '.join(clean_text(_PARENTHESES_RE.sub(' ', name)).split())}
+            for variant in variants:
+                if variant:
+                    self._names.append(variant)
+                    self._entry_ids.append(entry_idx)
+
+        self._trigrams = [trigrams(name) for name in self._names]
+        self._word_counts = [len(name.split()) for name in self._names]
+        self._postings: Dict[str, List[int]] = {}
+        for variant_idx, variant_trigrams in enumerate(self._trigrams):
+            for trigram in variant_trigrams:
+                self._postings.setdefault(trigram, []).append(variant_idx)
+
+    def _best_window(self, words: List[str], variant_idx: int) -> Tuple[float, str]:
+        """Находит фрагмент запроса, наиболее похожий на название"""
+        entry_trigrams = self._trigrams[variant_idx]
+        word_count = self._word_counts[variant_idx]
+        best = (0.0, "")
+        for size in range(max(1, word_count - 1), word_count + 2):
+            for start in range(0, max(1, len(words) - size + 1)):
+                window = ' '.join(words[start:start + size])
+                window_trigrams = trigrams(window)
+                union = len(entry_trigrams | window_trigrams)
+                similarity = len(entry_trigrams & window_trigrams) / union if union else 0.0
+                if similarity > best[0]:
+                    best = (similarity, window)
+        return best
+
+    def search(self, query: str, min_similarity: float = FUZZY_MIN_SIMILARITY) -> List[Tuple[float, int]]:
+        """Возвращает (сходство, номер названия) по убыванию сходства"""
+        results: Dict[int, float] = {}
+        cleaned = clean_text(query)
+        variants = {cleaned, transliterate(cleaned)}
+
+        for variant in variants:
+            words = variant.split()
+            query_trigrams = trigrams(variant)
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._postings.get(trigram, ()))
+
+            for variant_idx, count in shared.items():
+                # Отсекаем кандидатов, у которых запрос покрывает слишком малую часть триграмм
+                if count < min_similarity * len(self._trigrams[variant_idx]):
+                    continue
+
+                similarity, window = self._best_window(words, variant_idx)
+                if similarity < min_similarity:
+                    continue
+
+                name = self._names[variant_idx]
+                max_distance = max(1, int(len(name) * FUZZY_MAX_EDIT_RATIO))
+                if bounded_edit_distance(window, name, max_distance) is None:
+                    continue
+
+                entry_idx = self._entry_ids[variant_idx]
+                results[entry_idx] = max(similarity, results.get(entry_idx, 0.0))
+
+        return sorted(((score, idx) for idx, score in results.items()), key=lambda item: (-item[0], item[1]))
+
+# Параметры BM25: насыщение частоты термина и нормировка по длине документа
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+class BM25Index:
+    """Ранжирование текстов по BM25 на стемах (курсы, фрагменты описаний программ)"""
+
+    def __init__(self, texts: List[str]):
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_idx, text in enumerate(texts):
+            terms = Counter(normalize(text))
+            self._lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                self._postings.setdefault(term, []).append((doc_idx, count))
+
+        total = len(texts)
+        self._average_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[float, int]]:
+        """Возвращает (оценка, номер текста) по убыванию оценки"""
+        scores: Dict[int, float] = {}
+        for term in set(normalize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_idx, count in self._postings[term]:
+                length_norm = 1 - BM25_B + BM25_B * self._lengths[doc_idx] / self._average_length
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+
+        ranked = sorted(((score, idx) for idx, score in scores.items()), key=lambda item: (-item[0], item[1]))
+        return ranked[:top_k] if top_k is not None else ranked
+
+class CourseHit(NamedTuple):
+    program: Program
+    course: Course
+    score: float
+
+class _IndexedCourse(NamedTuple):
+    program: Program
+    course: Course
+    clean_name: str
+    tokens: frozenset
+    prefixes: frozenset
+
+# Разобранные курсы программы: хэш курсов и (название без пунктуации, токены, префиксы) по порядку курсов
+ProgramCourses = Tuple[str, List[Tuple[str, frozenset, frozenset]]]
+
+def analyze_courses(program: Program) -> List[Tuple[str, frozenset, frozenset]]:
+    """Стемминг названий курсов программы - основная часть стоимости построения индекса"""
+    analyzed = []
+    for course in program.courses:
+        tokens = frozenset(tokenize(course.name))
+        prefixes = frozenset(filter(None, (prefix_key(token) for token in tokens)))
+        analyzed.append((clean_text(course.name), tokens, prefixes))
+    return analyzed
+
+class CourseIndex:
+    """Инвертированный индекс токен -> курсы для поиска курсов по тексту вопроса"""
+
+    def __init__(self, programs: List[Program], analyzed: Optional[Dict[str, ProgramCourses]] = None):
+        """analyzed - разобранные курсы по id программы: программы с тем же хэшем курсов
+        повторно не разбираются, разобранные заново записываются туда же"""
+        self.programs = programs
+        self._entries: List[_IndexedCourse] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._prefix_postings: Dict[str, List[int]] = {}
+        self._program_postings: Dict[str, List[int]] = {}
+        self._fuzzy_courses: Optional[FuzzyNameIndex] = None
+        self._fuzzy_programs: Optional[FuzzyNameIndex] = None
+
+        for program_idx, program in enumerate(programs):
+            for token in set(normalize(program.name, min_length=PROGRAM_TOKEN_MIN_LENGTH)):
+                self._program_postings.setdefault(token, []).append(program_idx)
+
+            courses_hash = program.content_hashes()[0]
+            cached = analyzed.get(program.id) if analyzed is not None else None
+            if cached is None or cached[0] != courses_hash:
+                cached = (courses_hash, analyze_courses(program))
+                if analyzed is not None:
+                    analyzed[program.id] = cached
+
+            for course, (clean_name, tokens, prefixes) in zip(program.courses, cached[1]):
+                entry_idx = len(self._entries)
+                self._entries.append(_IndexedCourse(program, course, clean_name, tokens, prefixes))
+
+                for token in tokens:
+                    self._postings.setdefault(token, []).append(entry_idx)
+                for prefix in prefixes:
+                    self._prefix_postings.setdefault(prefix, []).append(entry_idx)
+
+        self._fuzzy_courses = FuzzyNameIndex([entry.course.name for entry in self._entries])
+        self._fuzzy_programs = FuzzyNameIndex([program.name for program in programs])
+
+    def rebind(self, programs: List[Program]) -> None:
+        """Подменяет программы и курсы на объекты нового снимка с теми же курсами.
+
+        Хэш курсов не учитывает их id, поэтому курсы тоже берутся из нового снимка.
+        """
+        self.programs = programs
+        new_courses = (
+            (program, course) for program in programs for course in program.courses
+        )
+        self._entries = [
+            entry._replace(program=program, course=course)
+            for entry, (program, course) in zip(self._entries, new_courses)
+        ]
+
+    def search_courses(self, question: str, fuzzy: bool = True) -> List[CourseHit]:
+        """Находит курсы, упомянутые в вопросе, по убыванию релевантности.
+        
+        Если точных совпадений нет, ищет названия с опечатками и в транслите.
+        """
+        question_clean = clean_text(question)
+        question_tokens = set(tokenize(question))
+        question_prefixes = set(filter(None, (prefix_key(token) for token in question_tokens)))
+
+        exact_matches = Counter()
+        for token in question_tokens:
+            exact_matches.update(self._postings.get(token, ()))
+
+        candidates = set(exact_matches)
+        for prefix in question_prefixes:
+            candidates.update(self._prefix_postings.get(prefix, ()))
+
+        hits: List[Tuple[float, int]] = []
+        for entry_idx in candidates:
+            entry = self._entries[entry_idx]
+            matches = exact_matches.get(entry_idx, 0)
+            # Префикс совпавшего слова - не отдельное свидетельство: после стемминга
+            # "обучение" и "обучения" уже совпали целиком
+            matched_prefixes = {prefix_key(token) for token in entry.tokens & question_tokens}
+            prefix_matches = len((entry.prefixes & question_prefixes) - matched_prefixes)
+
+            # Фраза целиком (название курса в вопросе или вопрос в названии)
+            if entry.clean_name and (entry.clean_name in question_clean or question_clean in entry.clean_name):
+                score = PHRASE_MATCH_SCORE + matches
+            # Несколько общих слов, либо одно слово плюс частичное совпадение по префиксу
+            elif len(entry.tokens) >= 2 and (matches >= 2 or (matches >= 1 and prefix_matches >= 1)):
+                score = matches + 0.5 * prefix_matches
+            else:
+                continue
+
+            hits.append((score, entry_idx))
+
+        if not hits and fuzzy:
+            hits = self._fuzzy_courses.search(question)
+
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return [CourseHit(self._entries[idx].program, self._entries[idx].course, score) for score, idx in hits]
+
+    def search_program(self, question: str) -> Optional[Program]:
+        """Находит программу, упомянутую в вопросе по названию или слову из названия"""
+        question_lower = question.lower()
+        matched = set()
+        for token in normalize(question, min_length=PROGRAM_TOKEN_MIN_LENGTH):
+            matched.update(self._program_postings.get(token, ()))
+
+        for program_idx, program in enumerate(self.programs):
+            if program_idx in matched or program.name.lower() in question_lower:
+                return program
+
+        fuzzy_hits = self._fuzzy_programs.search(question)
+        return self.programs[fuzzy_hits[0][1]] if fuzzy_hits else None
+
+class CourseIndexService:
+    """Хранит индекс для текущего снимка программ и перестраивает его только при изменениях курсов"""
+
+    def __init__(self):
+        self._index: Optional[CourseIndex] = None
+        self._fingerprint: Optional[tuple] = None
+        # Разобранные курсы по программам: при изменении одной программы остальные не разбираются заново
+        self._analyzed: Dict[str, ProgramCourses] = {}
+
+    def get_index(self, programs: List[Program]) -> CourseIndex:
+        fingerprint = courses_fingerprint(programs)
+        if self._index is None or fingerprint != self._fingerprint:
+            self._index = CourseIndex(programs, self._analyzed)
+            self._fingerprint = fingerprint
+            logger.info("Course index built", programs=len(programs), courses=len(self._index._entries))
+        elif any(old is not new for old, new in zip(self._index.programs, programs)):
+            # Курсы те же, но поменялись описания или детали: результаты поиска
+            # должны ссылаться на программы нового снимка
+            self._index.rebind(programs)
+        return self._index
+
+    async def on_programs_changed(self, diff: ProgramsDiff) -> None:
+        # Индекс строится по названиям программ и курсов, изменения описаний и деталей его не затрагивают
+        changed = [change for change in diff.changes if change.courses_changed or "name" in change.changed_fields]
+        if not changed:
+            return
+        for change in changed:
+            if change.courses_changed:
+                self._analyzed.pop(change.program_id, None)
+        self._index = None
+        self._fingerprint = None
+
+course_index_service = CourseIndexService()
+program_changes.subscribe(course_index_service.on_programs_changed)
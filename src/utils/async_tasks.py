@@ -0,0 +1,14 @@
+import asyncio
+
+async def cancel_and_wait(task: asyncio.Task) -> None:
+    """Отменяет задачу и дожидается ее завершения, чтобы освободить занятые ею ресурсы"""
+    if task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        # Отменили саму вызывающую задачу, пока она ждала: эту отмену нельзя терять
+        current = asyncio.current_task()
+        if current is not None and current.cancelling():
+            raise
@@ -0,0 +1,94 @@
+"""Автоматический выключатель для обращений к медленному внешнему сервису.
+
+Закрыт - запросы проходят, результаты копятся в скользящем окне. Если доля ошибок
+(включая слишком медленные ответы) в окне превышает порог, выключатель размыкается,
+и запросы отклоняются сразу, без ожидания таймаута. Через open_seconds пропускается
+пробный запрос: успех замыкает выключатель, ошибка снова размыкает его.
+"""
+import time
+from collections import deque
+from typing import Callable
+from .logger import logger
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float = 0.5, slow_call_seconds: float = 20.0,
+                 window_size: int = 20, min_calls: int = 3, open_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._clock = clock
+        # True - неудачный или слишком медленный вызов
+        self._window: deque = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """Запросы сейчас отклоняются (пробный запрос уже выполняется или время еще не вышло)"""
+        state = self.state
+        return state == OPEN or (state == HALF_OPEN and self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Можно ли выполнить запрос; в полуоткрытом состоянии пропускает один пробный"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._state = HALF_OPEN
+            self._probe_in_flight = True
+            logger.info("Circuit breaker probing", breaker=self.name)
+            return True
+        return False
+
+    def record_success(self, duration: float) -> None:
+        slow = duration >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self._probe_in_flight = False
+            if slow:
+                self._open("slow probe")
+            else:
+                self._close()
+            return
+        self._record(slow)
+
+    def record_failure(self, error: str = "") -> None:
+        if self._state == HALF_OPEN:
+            self._probe_in_flight = False
+            self._open(error)
+            return
+        self._record(True)
+
+    def record_cancelled(self) -> None:
+        """Вызов отменен до результата - освобождает слот пробного запроса"""
+        self._probe_in_flight = False
+
+    def _record(self, failed: bool) -> None:
+        if self._state != CLOSED:
+            return
+        self._window.append(failed)
+        if len(self._window) >= self.min_calls and sum(self._window) / len(self._window) >= self.failure_rate:
+            self._open(f"failure rate {sum(self._window)}/{len(self._window)}")
+
+    def _open(self, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        logger.warning("Circuit breaker opened", breaker=self.name, reason=reason, open_seconds=self.open_seconds)
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._window.clear()
+        logger.info("Circuit breaker closed", breaker=self.name)
@@ -1,11 +1,34 @@
-from decouple import config
+from decouple import config, Csv
 from pathlib import Path
 
 class Settings:
     TELEGRAM_TOKEN: str = config('TELEGRAM_TOKEN', default='')
     OLLAMA_BASE_URL: str = config('OLLAMA_BASE_URL', default='http://localhost:11434')
+    # Пул серверов: "url|вес" через запятую; если пусто - используется OLLAMA_BASE_URL
+    OLLAMA_BACKENDS: list = config('OLLAMA_BACKENDS', default='', cast=Csv())
+    OLLAMA_HEALTH_CHECK_INTERVAL: float = config('OLLAMA_HEALTH_CHECK_INTERVAL', default=15.0, cast=float)
+    # Процентиль длительности полного ответа, после которого запрос дублируется на другой сервер;
+    # 0 - без дублирования. Запросы идут без stream, поэтому время до первого токена не измеряется
+    OLLAMA_HEDGE_PERCENTILE: float = config('OLLAMA_HEDGE_PERCENTILE', default=0.0, cast=float)
     OLLAMA_MODEL: str = config('OLLAMA_MODEL', default='llama3:latest')
+    # Модели для типов запросов (qa, general, recommendations, comparison): "тип=модель" через запятую
+    OLLAMA_MODEL_ROUTES: list = config('OLLAMA_MODEL_ROUTES', default='', cast=Csv())
+    # Модель эмбеддингов для смыслового поиска по курсам и описаниям программ; пусто - поиск выключен
+    OLLAMA_EMBED_MODEL: str = config('OLLAMA_EMBED_MODEL', default='bge-m3')
+    OLLAMA_KEEP_ALIVE: str = config('OLLAMA_KEEP_ALIVE', default='30m')
+    # Периодический запрос, не дающий модели выгрузиться; часы - "начало-конец" по местному времени
+    OLLAMA_KEEP_WARM_INTERVAL: float = config('OLLAMA_KEEP_WARM_INTERVAL', default=600.0, cast=float)
+    OLLAMA_KEEP_WARM_HOURS: str = config('OLLAMA_KEEP_WARM_HOURS', default='8-23')
+    OLLAMA_MIN_CTX: int = config('OLLAMA_MIN_CTX', default=2048, cast=int)
+    OLLAMA_MAX_CTX: int = config('OLLAMA_MAX_CTX', default=32768, cast=int)
     DATA_DIR: Path = Path(config('DATA_DIR', default='data'))
     LOG_LEVEL: str = config('LOG_LEVEL', default='INFO')
+    PROGRAMS_SNAPSHOT_RETENTION: int = config('PROGRAMS_SNAPSHOT_RETENTION', default=5, cast=int)
+    # Как часто бот проверяет, не переключил ли версию программ откат из src.manage
+    PROGRAMS_VERSION_CHECK_INTERVAL: float = config('PROGRAMS_VERSION_CHECK_INTERVAL', default=30.0, cast=float)
+    # Состояния диалогов (FSM) хранятся в SQLite; неактивные дольше TTL удаляются
+    FSM_STORAGE_PATH: Path = Path(config('FSM_STORAGE_PATH', default=str(DATA_DIR / 'fsm.sqlite3')))
+    FSM_STATE_TTL_HOURS: float = config('FSM_STATE_TTL_HOURS', default=168.0, cast=float)
+    BLOCKED_KEYWORDS: list = config('BLOCKED_KEYWORDS', default='', cast=Csv())
     
 settings = Settings() 
\ No newline at end of file
@@ -0,0 +1,20 @@
+import time
+from typing import Callable
+
+class Deadline:
+    """Момент, к которому обработчик должен ответить пользователю; передается во все вызовы LLM"""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """Таймаут операции: не больше cap и не дольше оставшегося времени"""
+        return min(cap, self.remaining())
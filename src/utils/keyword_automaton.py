@@ -0,0 +1,95 @@
+"""Автомат Ахо-Корасик для классификации текста по наборам ключевых слов.
+
+Ключевые слова и текст приводятся к стемам (см. text_normalization), поэтому
+"погода" находит "погоду", а "роль" не находит "контроль". Слово с "*" на конце
+задает префикс основы: "программ*" находит "программирование".
+Текст проходится за один линейный проход независимо от числа ключевых слов.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+from .text_normalization import normalize, tokenize
+
+PREFIX_MARK = "*"
+
+class KeywordAutomaton:
+    """Многошаблонный поиск ключевых слов с возвратом всех найденных категорий"""
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        self.categories = tuple(keyword_sets)
+
+        for category, keywords in keyword_sets.items():
+            for keyword in keywords:
+                pattern = self._pattern(keyword)
+                if pattern:
+                    self._add(pattern, (category, keyword))
+
+        self._build_failure_links()
+
+    @staticmethod
+    def _pattern(keyword: str) -> str:
+        """Шаблон над нормализованным текстом, слова разделены и окружены пробелами"""
+        if keyword.endswith(PREFIX_MARK):
+            words = tokenize(keyword[:-len(PREFIX_MARK)])
+            if not words:
+                return ""
+            # Последнее слово - основа, остальные стеммируются как обычно
+            return " " + " ".join(list(normalize(" ".join(words[:-1]), keep_stop_words=True)) + words[-1:])
+
+        stems = normalize(keyword, keep_stop_words=True)
+        return f" {' '.join(stems)} " if stems else ""
+
+    @staticmethod
+    def _prepare_text(text: str) -> str:
+        return f" {' '.join(normalize(text, keep_stop_words=True))} "
+
+    def _add(self, pattern: str, match: Tuple[str, str]) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(match)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Совпадения суффиксов наследуются, чтобы не ходить по ссылкам во время поиска
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """Все найденные (категория, ключевое слово) в порядке появления в тексте"""
+        found = []
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for char in self._prepare_text(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.extend(output[state])
+        return found
+
+    def classify(self, text: str) -> Set[str]:
+        """Категории, ключевые слова которых встречаются в тексте"""
+        return {category for category, _ in self.find(text)}
+
+    def classify_many(self, texts: Iterable[str]) -> Set[str]:
+        categories = set()
+        for text in texts:
+            categories |= self.classify(text)
+        return categories
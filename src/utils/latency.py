@@ -0,0 +1,22 @@
+import math
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+class LatencyTracker:
+    """Скользящие окна длительностей запросов по типу запроса для оценки процентилей"""
+
+    def __init__(self, window_size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._windows: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window_size))
+
+    def observe(self, key: str, seconds: float) -> None:
+        self._windows[key].append(seconds)
+
+    def percentile(self, key: str, p: float) -> Optional[float]:
+        """p-й процентиль (по ближайшему рангу) или None, пока замеров мало"""
+        window = self._windows.get(key)
+        if not window or len(window) < self.min_samples:
+            return None
+        ordered = sorted(window)
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
@@ -0,0 +1,266 @@
+"""Нормализация текста для сопоставления вопросов, интересов и названий курсов.
+
+Токенизация, стоп-слова и стемминг в стиле Snowball (русский и английский).
+Стемы кэшируются (LRU), поэтому повторяющиеся слова и названия курсов не пересчитываются.
+"""
+import re
+from functools import lru_cache
+from typing import List, Tuple, FrozenSet
+
+STEM_CACHE_SIZE = 20000
+TEXT_CACHE_SIZE = 4096
+
+_WORD_RE = re.compile(r'[0-9a-zа-я]+')
+_CYRILLIC_RE = re.compile(r'[а-я]')
+_LATIN_RE = re.compile(r'^[a-z]+$')
+
+STOP_WORDS = frozenset("""
+а без более бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до его ее ей ему если есть еще же за здесь и из или им их к как ко когда кто ли либо мне может мы на над надо наш не него нее нет ни них но ну о об однако он она они оно от очень по под при про с со так также такой там те тем то того тоже той только том ты у уже хотя чего чей чем что чтобы чье чья эта эти это я
+a an and are as at be but by for from has have how i in is it its of on or that the this to was what when where which who why will with you your
+""".split())
+
+# --- Русский стеммер (Snowball) ---
+
+_RU_VOWELS = "аеиоуыэюя"
+
+_RU_PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")
+_RU_PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+_RU_ADJECTIVE = (
+    "ими", "ыми", "его", "ого", "ему", "ому",
+    "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею"
+)
+_RU_PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")
+_RU_PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+_RU_REFLEXIVE = ("ся", "сь")
+_RU_VERB_1 = ("ете", "йте", "ешь", "нно", "ла", "на", "ли", "ем", "ло", "но", "ет", "ют", "ны", "ть", "й", "л", "н")
+_RU_VERB_2 = (
+    "ейте", "уйте", "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено", "ует", "уют",
+    "ены", "ить", "ыть", "ишь", "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую", "ю"
+)
+_RU_NOUN = (
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях",
+    "ев", "ов", "ие", "ье", "еи", "ии", "ей", "ой", "ий", "ям", "ем", "ам", "ом", "ах", "ях", "ию", "ью", "ия", "ья",
+    "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я"
+)
+_RU_SUPERLATIVE = ("ейше", "ейш")
+_RU_DERIVATIONAL = ("ость", "ост")
+
+def _by_length(suffixes: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(sorted(suffixes, key=len, reverse=True))
+
+def _ru_regions(word: str) -> Tuple[int, int]:
+    """Возвращает начало RV и R2"""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in _RU_VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in _RU_VOWELS and word[i - 1] in _RU_VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in _RU_VOWELS and word[i - 1] in _RU_VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+def _ru_remove(word: str, rv: int, suffixes: Tuple[str, ...], preceded_by: str = "") -> Tuple[str, bool]:
+    """Удаляет самое длинное окончание из RV (при необходимости - только после а/я)"""
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= rv:
+            if preceded_by:
+                position = len(word) - len(suffix) - 1
+                if position < rv or word[position] not in preceded_by:
+                    continue
+            return word[:-len(suffix)], True
+    return word, False
+
+def _ru_remove_grouped(word: str, rv: int, group_1: Tuple[str, ...], group_2: Tuple[str, ...]) -> Tuple[str, bool]:
+    """Окончания первой группы удаляются только после а/я, второй - всегда; выигрывает самое длинное"""
+    candidates = [(suffix, "ая") for suffix in group_1] + [(suffix, "") for suffix in group_2]
+    for suffix, preceded_by in sorted(candidates, key=lambda item: len(item[0]), reverse=True):
+        stripped, removed = _ru_remove(word, rv, (suffix,), preceded_by)
+        if removed:
+            return stripped, True
+    return word, False
+
+def _ru_remove_adjectival(word: str, rv: int) -> Tuple[str, bool]:
+    word, removed = _ru_remove(word, rv, _by_length(_RU_ADJECTIVE))
+    if removed:
+        word, _ = _ru_remove_grouped(word, rv, _RU_PARTICIPLE_1, _RU_PARTICIPLE_2)
+    return word, removed
+
+def stem_russian(word: str) -> str:
+    rv, r2 = _ru_regions(word)
+
+    # Шаг 1: деепричастие, иначе возвратная частица + прилагательное/глагол/существительное
+    word, removed = _ru_remove_grouped(word, rv, _RU_PERFECTIVE_GERUND_1, _RU_PERFECTIVE_GERUND_2)
+    if not removed:
+        word, _ = _ru_remove(word, rv, _RU_REFLEXIVE)
+        word, removed = _ru_remove_adjectival(word, rv)
+        if not removed:
+            word, removed = _ru_remove_grouped(word, rv, _RU_VERB_1, _RU_VERB_2)
+        if not removed:
+            word, _ = _ru_remove(word, rv, _by_length(_RU_NOUN))
+
+    # Шаг 2
+    word, _ = _ru_remove(word, rv, ("и",))
+
+    # Шаг 3: словообразовательные окончания в R2
+    word, _ = _ru_remove(word, r2, _RU_DERIVATIONAL)
+
+    # Шаг 4
+    word, removed = _ru_remove(word, rv, _RU_SUPERLATIVE)
+    if word.endswith("нн") and len(word) - 1 >= rv:
+        word = word[:-1]
+    elif not removed:
+        word, _ = _ru_remove(word, rv, ("ь",))
+    return word
+
+# --- Английский стеммер (Snowball/Porter2, без списка исключений) ---
+
+_EN_VOWELS = "aeiouy"
+_EN_DOUBLES = ("bb", "dd", "ff", "gg", "mm", "nn", "pp", "rr", "tt")
+_EN_LI_ENDINGS = "cdeghkmnrt"
+_EN_STEP_2 = (
+    ("ization", "ize"), ("ational", "ate"), ("fulness", "ful"), ("ousness", "ous"), ("iveness", "ive"),
+    ("tional", "tion"), ("biliti", "ble"), ("lessli", "less"), ("entli", "ent"), ("ation", "ate"),
+    ("alism", "al"), ("aliti", "al"), ("ousli", "ous"), ("iviti", "ive"), ("fulli", "ful"),
+    ("enci", "ence"), ("anci", "ance"), ("abli", "able"), ("izer", "ize"), ("ator", "ate"),
+    ("alli", "al"), ("bli", "ble"), ("ogi", "og"), ("li", "")
+)
+_EN_STEP_3 = (
+    ("ational", "ate"), ("tional", "tion"), ("alize", "al"), ("icate", "ic"), ("iciti", "ic"),
+    ("ative", ""), ("ical", "ic"), ("ness", ""), ("ful", "")
+)
+_EN_STEP_4 = (
+    "ement", "ance", "ence", "able", "ible", "ment", "ant", "ent", "ism", "ate", "iti", "ous",
+    "ive", "ize", "ion", "al", "er", "ic"
+)
+
+def _en_region(word: str, start: int) -> int:
+    for i in range(start + 1, len(word)):
+        if word[i] not in _EN_VOWELS and word[i - 1] in _EN_VOWELS:
+            return i + 1
+    return len(word)
+
+def _en_short_syllable(word: str) -> bool:
+    if len(word) == 2:
+        return word[0] in _EN_VOWELS and word[1] not in _EN_VOWELS
+    return (
+        len(word) > 2
+        and word[-3] not in _EN_VOWELS
+        and word[-2] in _EN_VOWELS
+        and word[-1] not in _EN_VOWELS + "wxY"
+    )
+
+def stem_english(word: str) -> str:
+    if len(word) <= 2:
+        return word
+
+    if word[0] == "y":
+        word = "Y" + word[1:]
+    word = re.sub(r'(?<=[aeiouy])y', "Y", word)
+
+    r1 = _en_region(word, 0)
+    r2 = _en_region(word, r1)
+
+    # Шаг 1a
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith(("ied", "ies")):
+        word = word[:-2] if len(word) > 4 else word[:-1]
+    elif word.endswith("s") and not word.endswith(("us", "ss")):
+        if any(char in _EN_VOWELS for char in word[:-2]):
+            word = word[:-1]
+
+    # Шаг 1b
+    if word.endswith(("eedly", "eed")):
+        suffix = "eedly" if word.endswith("eedly") else "eed"
+        if len(word) - len(suffix) >= r1:
+            word = word[:-len(suffix)] + "ee"
+    else:
+        for suffix in ("ingly", "edly", "ing", "ed"):
+            if word.endswith(suffix):
+                base = word[:-len(suffix)]
+                if any(char in _EN_VOWELS for char in base):
+                    word = base
+                    if word.endswith(("at", "bl", "iz")):
+                        word += "e"
+                    elif word.endswith(_EN_DOUBLES):
+                        word = word[:-1]
+                    elif r1 >= len(word) and _en_short_syllable(word):
+                        word += "e"
+                break
+
+    # Шаг 1c
+    if len(word) > 2 and word[-1] in "yY" and word[-2] not in _EN_VOWELS:
+        word = word[:-1] + "i"
+
+    # Шаги 2-3: замена суффиксов в R1
+    for table in (_EN_STEP_2, _EN_STEP_3):
+        for suffix, replacement in table:
+            if word.endswith(suffix):
+                if len(word) - len(suffix) >= r1:
+                    if suffix == "li" and (len(word) < 3 or word[-3] not in _EN_LI_ENDINGS):
+                        break
+                    if suffix == "ogi" and (len(word) < 4 or word[-4] != "l"):
+                        break
+                    word = word[:-len(suffix)] + replacement
+                break
+    if word.endswith("ative") and len(word) - 5 >= r2:
+        word = word[:-5]
+
+    # Шаг 4: удаление суффиксов в R2
+    for suffix in _EN_STEP_4:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r2 and (suffix != "ion" or word[-4:-3] in ("s", "t")):
+                word = word[:-len(suffix)]
+            break
+
+    # Шаг 5
+    if word.endswith("e"):
+        if len(word) - 1 >= r2 or (len(word) - 1 >= r1 and not _en_short_syllable(word[:-1])):
+            word = word[:-1]
+    elif word.endswith("ll") and len(word) - 1 >= r2:
+        word = word[:-1]
+
+    return word.replace("Y", "y")
+
+# --- Общий интерфейс ---
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(token: str) -> str:
+    """Стем одного токена (токен уже в нижнем регистре)"""
+    if _CYRILLIC_RE.search(token):
+        return stem_russian(token)
+    if _LATIN_RE.match(token):
+        return stem_english(token)
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста в нижнем регистре, ё заменяется на е"""
+    return _WORD_RE.findall(text.lower().replace("ё", "е"))
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def normalize(text: str, keep_stop_words: bool = False, min_length: int = 1) -> Tuple[str, ...]:
+    """Последовательность стемов текста (по умолчанию без стоп-слов)"""
+    return tuple(
+        stem(token) for token in tokenize(text)
+        if len(token) >= min_length and (keep_stop_words or token not in STOP_WORDS)
+    )
+
+def stem_set(text: str) -> FrozenSet[str]:
+    """Множество стемов текста без стоп-слов"""
+    return frozenset(normalize(text))
+
+def contains_phrase(text: str, phrase: str) -> bool:
+    """Проверяет, что нормализованная фраза входит в текст целыми словами"""
+    phrase_stems = normalize(phrase, keep_stop_words=True)
+    if not phrase_stems:
+        return False
+    text_stems = normalize(text, keep_stop_words=True)
+    size = len(phrase_stems)
+    return any(text_stems[i:i + size] == phrase_stems for i in range(len(text_stems) - size + 1))
@@ -0,0 +1,76 @@
+"""Оценка числа токенов промпта и подбор num_ctx / num_predict под конкретный запрос.
+
+Число токенов оценивается по числу символов отдельно для кириллицы и остального текста.
+Коэффициент уточняется по фактическому prompt_eval_count, который возвращает Ollama.
+plan_budget дает размер контекста, необходимый промпту (степень двойки). Сам num_ctx
+запроса закрепляется за моделью в llm_service: смена размера перезагружает модель,
+поэтому под конкретный запрос подстраивается только num_predict.
+"""
+import re
+from typing import NamedTuple, Dict
+
+# Символов на токен для токенизатора семейства llama3 (оценка с запасом)
+CHARS_PER_TOKEN_CYRILLIC = 3.0
+CHARS_PER_TOKEN_OTHER = 3.8
+# Служебные токены шаблона чата и запас под сообщение пользователя
+TEMPLATE_OVERHEAD_TOKENS = 64
+USER_MESSAGE_RESERVE_TOKENS = 256
+
+# Бюджет ответа (num_predict) для каждого места вызова
+ANSWER_BUDGETS: Dict[str, int] = {
+    'qa': 512,
+    'general': 384,
+    'recommendations': 1024,
+    'comparison': 768,
+    'default': 1024,
+}
+
+_CYRILLIC_RE = re.compile(r'[а-яА-ЯёЁ]')
+
+class TokenBudget(NamedTuple):
+    num_ctx: int
+    num_predict: int
+    prompt_tokens: int
+
+class TokenEstimator:
+    """Оценщик числа токенов с калибровкой по ответам модели"""
+
+    def __init__(self, smoothing: float = 0.2):
+        self.scale = 1.0
+        self.smoothing = smoothing
+
+    def _raw_estimate(self, text: str) -> float:
+        cyrillic = len(_CYRILLIC_RE.findall(text))
+        return cyrillic / CHARS_PER_TOKEN_CYRILLIC + (len(text) - cyrillic) / CHARS_PER_TOKEN_OTHER
+
+    def estimate(self, text: str) -> int:
+        return int(self._raw_estimate(text) * self.scale) + 1
+
+    def observe(self, text: str, actual_tokens: int) -> None:
+        """Уточняет коэффициент по фактическому числу токенов полностью вычисленного промпта"""
+        raw = self._raw_estimate(text)
+        if raw < 100 or actual_tokens <= 0:
+            return
+        ratio = actual_tokens / raw
+        # Сильное расхождение означает, что часть промпта взята из кэша модели - такие замеры пропускаем
+        if not 0.5 <= ratio <= 2.0:
+            return
+        self.scale += self.smoothing * (ratio - self.scale)
+
+def context_size(required_tokens: int, min_ctx: int, max_ctx: int) -> int:
+    """Ближайшая сверху степень двойки в пределах [min_ctx, max_ctx]"""
+    size = min_ctx
+    while size < required_tokens and size < max_ctx:
+        size *= 2
+    return min(size, max_ctx)
+
+def plan_budget(estimator: TokenEstimator, prompt: str, purpose: str, min_ctx: int, max_ctx: int,
+                reserve_tokens: int = 0) -> TokenBudget:
+    prompt_tokens = estimator.estimate(prompt) + TEMPLATE_OVERHEAD_TOKENS + reserve_tokens
+    num_predict = ANSWER_BUDGETS.get(purpose, ANSWER_BUDGETS['default'])
+    num_ctx = context_size(prompt_tokens + num_predict, min_ctx, max_ctx)
+    # Если промпт не помещается целиком, оставляем ответу хотя бы четверть бюджета
+    num_predict = max(min(num_predict, num_ctx - prompt_tokens), num_predict // 4)
+    return TokenBudget(num_ctx, num_predict, prompt_tokens)
+
+token_estimator = TokenEstimator()
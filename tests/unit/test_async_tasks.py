@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from src.utils.async_tasks import cancel_and_wait
+
+async def _slow_cleanup(cancelled: asyncio.Event):
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        cancelled.set()
+        # Освобождение ресурсов после отмены занимает время
+        await asyncio.sleep(0.05)
+        raise
+
+@pytest.mark.asyncio
+async def test_cancel_and_wait_waits_for_target():
+    cancelled = asyncio.Event()
+    task = asyncio.create_task(_slow_cleanup(cancelled))
+    await asyncio.sleep(0)
+    
+    await cancel_and_wait(task)
+    
+    assert task.cancelled() and cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_cancel_and_wait_keeps_caller_cancellation():
+    target_cancelled = asyncio.Event()
+    target = asyncio.create_task(_slow_cleanup(target_cancelled))
+    continued = False
+    
+    async def caller():
+        nonlocal continued
+        await cancel_and_wait(target)
+        continued = True
+    
+    await asyncio.sleep(0)
+    caller_task = asyncio.create_task(caller())
+    await target_cancelled.wait()
+    caller_task.cancel()
+    
+    with pytest.raises(asyncio.CancelledError):
+        await caller_task
+    assert not continued
@@ -0,0 +1,133 @@
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+from datetime import datetime
+from src.data.binary_snapshot import encode_programs, ProgramsSnapshotReader, SnapshotFormatError
+from src.data.json_storage import JSONStorage
+from src.data.models import Program, Course, ProgramDetails, ProgramType
+from src.services.program_changes import snapshot_fingerprint, snapshot_version
+
+@pytest.fixture
+def temp_dir():
+    path = Path(tempfile.mkdtemp())
+    yield path
+    shutil.rmtree(path)
+
+@pytest.fixture
+def programs():
+    return [
+        Program(
+            id="ai",
+            name="Искусственный интеллект",
+            type=ProgramType.AI,
+            url="https://example.com/ai",
+            courses=[
+                Course(id="course_0", name="Машинное обучение", credits=6, hours=216, semester=1,
+                       is_elective=False, block="Модули (дисциплины)", prerequisites=["Математика"]),
+                Course(id="course_1", name="Компьютерное зрение", credits=4, semester=2,
+                       is_elective=True, description="Обработка изображений"),
+            ],
+            total_credits=10,
+            duration_semesters=4,
+            details=ProgramDetails(cost_per_year="599 000 ₽", language="русский"),
+            parsed_at=datetime(2025, 7, 1, 12, 0)
+        ),
+        Program(
+            id="ai_product",
+            name="AI Product",
+            type=ProgramType.AI_PRODUCT,
+            url="https://example.com/ai_product",
+            courses=[],
+            total_credits=0,
+            duration_semesters=4,
+            parsed_at=datetime(2025, 7, 1, 12, 0)
+        ),
+    ]
+
+def test_binary_snapshot_round_trip(temp_dir, programs):
+    path = temp_dir / "programs.bin"
+    path.write_bytes(encode_programs(programs))
+    
+    loaded = ProgramsSnapshotReader(path).programs()
+    
+    assert [p.model_dump() for p in loaded] == [p.model_dump() for p in programs]
+
+def test_binary_snapshot_decodes_courses_lazily(temp_dir, programs):
+    path = temp_dir / "programs.bin"
+    path.write_bytes(encode_programs(programs))
+    
+    program = ProgramsSnapshotReader(path).programs()[0]
+    
+    assert "courses" not in program.__dict__
+    assert program.details.cost_per_year == "599 000 ₽"
+    assert [c.name for c in program.courses] == ["Машинное обучение", "Компьютерное зрение"]
+    assert program.courses[0].prerequisites == ["Математика"]
+
+def test_binary_snapshot_stores_content_hashes(temp_dir, programs):
+    path = temp_dir / "programs.bin"
+    path.write_bytes(encode_programs(programs))
+    
+    loaded = ProgramsSnapshotReader(path).programs()
+    
+    assert snapshot_fingerprint(loaded) == snapshot_fingerprint(programs)
+    assert all("courses" not in program.__dict__ for program in loaded)
+
+def test_binary_snapshot_rejects_foreign_file(temp_dir):
+    path = temp_dir / "programs.bin"
+    path.write_bytes(b"not a snapshot at all, definitely")
+    
+    with pytest.raises(SnapshotFormatError):
+        ProgramsSnapshotReader(path)
+
+@pytest.mark.asyncio
+async def test_storage_prefers_binary_snapshot(temp_dir, programs):
+    storage = JSONStorage(data_dir=temp_dir)
+    version = await storage.save_programs(programs)
+    
+    assert storage._programs_binary_file(version).exists()
+    loaded = await storage.load_programs()
+    
+    assert [p.id for p in loaded] == ["ai", "ai_product"]
+    assert len(loaded[0].courses) == 2
+    
+    # Поврежденный бинарный снимок не мешает чтению JSON-версии
+    storage._programs_snapshot = None
+    storage._programs_binary_file(version).write_bytes(b"broken")
+    assert [p.id for p in await storage.load_programs()] == ["ai", "ai_product"]
+
+def test_closed_reader_keeps_issued_programs_readable(temp_dir, programs):
+    path = temp_dir / "programs.bin"
+    path.write_bytes(encode_programs(programs))
+    
+    with ProgramsSnapshotReader(path) as reader:
+        loaded = reader.programs()
+    
+    assert isinstance(reader._buffer, bytes)
+    assert [c.name for c in loaded[0].courses] == ["Машинное обучение", "Компьютерное зрение"]
+
+@pytest.mark.asyncio
+async def test_storage_closes_previous_reader_on_version_switch(temp_dir, programs):
+    storage = JSONStorage(data_dir=temp_dir)
+    first_version = await storage.save_programs(programs)
+    old = await storage.load_programs()
+    first_reader = storage._programs_reader
+    
+    await storage.save_programs(programs[:1])
+    await storage.load_programs()
+    
+    assert storage._programs_reader is not first_reader
+    assert isinstance(first_reader._buffer, bytes)
+    # Программы старой версии, которые еще держат обработчики, по-прежнему читаются
+    assert len(old[0].courses) == 2
+    assert first_version in storage.list_programs_versions()
+
+@pytest.mark.asyncio
+async def test_snapshot_version_does_not_decode_courses(temp_dir, programs):
+    storage = JSONStorage(data_dir=temp_dir)
+    await storage.save_programs(programs)
+    
+    loaded = await storage.load_programs()
+    
+    assert snapshot_version(loaded) == snapshot_version(programs)
+    assert all("courses" not in program.__dict__ for program in loaded)
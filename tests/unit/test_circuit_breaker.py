@@ -0,0 +1,65 @@
+from src.utils.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def _breaker(clock, **kwargs):
+    return CircuitBreaker("test", open_seconds=30.0, clock=clock, **kwargs)
+
+def test_opens_on_failure_rate_and_fails_fast():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure("timeout")
+    
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    assert not breaker.allow()
+
+def test_slow_calls_count_as_failures():
+    clock = FakeClock()
+    breaker = _breaker(clock, slow_call_seconds=5.0)
+    
+    breaker.record_success(1.0)
+    breaker.record_success(6.0)
+    assert breaker.state == CLOSED
+    breaker.record_success(7.0)
+    
+    assert breaker.state == OPEN
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    
+    clock.now = 31.0
+    assert breaker.state == HALF_OPEN and not breaker.is_open
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.is_open
+    
+    breaker.record_success(1.0)
+    assert breaker.state == CLOSED and breaker.allow()
+
+def test_failed_probe_reopens_and_cancelled_probe_frees_slot():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    
+    clock.now = 31.0
+    assert breaker.allow()
+    breaker.record_cancelled()
+    assert breaker.allow()
+    breaker.record_failure("timeout")
+    
+    assert breaker.state == OPEN
+    clock.now = 45.0
+    assert not breaker.allow()
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime
+from src.data.models import UserProfile
+from src.services.parser_service import ITMOParser
+from src.services.course_scoring import CourseScoringEngine, CourseScoringService, np
+
+def _profile(interests, goals=(), background=None):
+    return UserProfile(
+        user_id="1", background=background, interests=list(interests), goals=list(goals),
+        created_at=datetime.now(), updated_at=datetime.now()
+    )
+
+@pytest.fixture
+def programs():
+    return ITMOParser()._get_mock_programs()
+
+def test_rank_orders_courses_by_relevance(programs):
+    ranked = CourseScoringEngine(programs).rank(_profile(["Глубокое обучение"]))
+    
+    assert ranked[0].course.name == "Глубокое обучение"
+    # "обучение" совпадает частично, поэтому курс ниже точного совпадения
+    assert "Основы машинного обучения" in [scored.course.name for scored in ranked[1:]]
+    assert ranked[0].score > ranked[1].score
+    assert ranked[0].matched == ("Глубокое обучение",)
+
+def test_rank_filters_by_program_and_electives(programs):
+    engine = CourseScoringEngine(programs)
+    profile = _profile(["Компьютерное зрение", "ИИ"])
+    
+    ranked = engine.rank(profile, program_id="ai", electives_only=True)
+    
+    assert ranked[0].course.name == "Компьютерное зрение"
+    assert all(scored.program.id == "ai" and scored.course.is_elective for scored in ranked)
+    assert engine.rank(profile, program_id="missing") == []
+
+def test_interests_outweigh_goals(programs):
+    ranked = CourseScoringEngine(programs).rank(_profile(["Компьютерное зрение"], goals=["Стартап"]))
+    
+    assert [scored.course.name for scored in ranked] == ["Компьютерное зрение", "Стартап в области ИИ"]
+    assert "Стартап" in ranked[1].explanation
+
+def test_rank_without_matches_returns_nothing(programs):
+    engine = CourseScoringEngine(programs)
+    
+    assert engine.rank(_profile(["Кулинария"])) == []
+    assert engine.rank(_profile([])) == []
+
+def test_matrix_path_is_default(programs):
+    engine = CourseScoringEngine(programs)
+    
+    assert engine.use_numpy
+    assert isinstance(engine._matrix, np.ndarray) and engine._matrix.dtype == np.float32
+    assert engine._matrix.shape == engine.size
+
+def test_numpy_and_python_scores_match(programs):
+    profile = _profile(["Машинное обучение", "NLP"], goals=["Карьера в IT"], background="Бакалавр информатики")
+    
+    vectorized = CourseScoringEngine(programs, use_numpy=True).rank(profile)
+    sparse = CourseScoringEngine(programs, use_numpy=False).rank(profile)
+    
+    assert [scored.course.id for scored in vectorized] == [scored.course.id for scored in sparse]
+    assert [scored.score for scored in vectorized] == pytest.approx([scored.score for scored in sparse], rel=1e-5)
+
+def test_service_rebuilds_matrix_only_when_courses_change(programs):
+    service = CourseScoringService()
+    engine = service.get_engine(programs)
+    
+    assert service.get_engine(programs) is engine
+    # Повторный парсинг тех же данных: другой parsed_at и другие объекты
+    assert service.get_engine(ITMOParser()._get_mock_programs()) is engine
+    
+    described = ITMOParser()._get_mock_programs()
+    described[0] = described[0].model_copy(update={"description": "Новое описание"})
+    assert service.get_engine(described) is engine
+    assert engine.programs[0] is described[0]
+    
+    renamed = ITMOParser()._get_mock_programs()
+    renamed[0].courses[0] = renamed[0].courses[0].model_copy(update={"name": "Новый курс"})
+    assert service.get_engine(renamed) is not engine
@@ -0,0 +1,21 @@
+from src.utils.deadline import Deadline
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+    
+    def __call__(self):
+        return self.now
+
+def test_remaining_and_timeout_shrink_with_time():
+    clock = FakeClock()
+    deadline = Deadline(30.0, clock=clock)
+    
+    assert deadline.timeout(20.0) == 20.0
+    clock.now += 25.0
+    assert deadline.remaining() == 5.0
+    assert deadline.timeout(20.0) == 5.0
+    assert not deadline.expired
+    
+    clock.now += 10.0
+    assert deadline.remaining() == 0.0 and deadline.expired
@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.data.json_storage import JSONStorage
+from src.services.parser_service import ITMOParser
+from src.services.program_changes import diff_programs
+from src.services.embedding_index import (
+    EmbeddingIndexService, snapshot_documents, chunk_text, COURSE_DOCUMENT, DETAILS_DOCUMENT, np
+)
+
+def _fake_embedding(text):
+    """Тема текста: язык, зрение и общая компонента"""
+    text = text.lower()
+    return [float("языка" in text or "nlp" in text), float("зрение" in text), 0.1]
+
+async def _fake_embed(texts, timeout=None):
+    return [_fake_embedding(text) for text in texts]
+
+@pytest.fixture
+def programs():
+    return ITMOParser()._get_mock_programs()
+
+def test_chunk_text_respects_sentence_boundaries():
+    text = "Первое предложение. Второе предложение! Третье?"
+    
+    assert chunk_text(text, max_chars=40) == ["Первое предложение. Второе предложение!", "Третье?"]
+    assert chunk_text(text) == [text]
+
+def test_snapshot_documents_cover_courses_and_details(programs):
+    documents = snapshot_documents(programs)
+    
+    courses = [document for document in documents if document.kind == COURSE_DOCUMENT]
+    details = [document for document in documents if document.kind == DETAILS_DOCUMENT]
+    assert len(courses) == sum(len(program.courses) for program in programs)
+    assert any(document.key == "ai/cost_per_year/0" for document in details)
+    assert [document.key for document in snapshot_documents(programs)] == [document.key for document in documents]
+
+@pytest.mark.asyncio
+async def test_search_finds_course_by_meaning(programs, tmp_path):
+    service = EmbeddingIndexService()
+    with patch('src.services.embedding_index.storage', JSONStorage(tmp_path)), \
+         patch('src.services.embedding_index.llm_service.embed', AsyncMock(side_effect=_fake_embed)):
+        await service.refresh(programs)
+        results = await service.search("NLP", programs, top_k=1, kinds=(COURSE_DOCUMENT,))
+    
+    assert results[0][0].course.name == "Обработка естественного языка"
+    assert results[0][1] == pytest.approx(1.0)
+
+@pytest.mark.asyncio
+async def test_index_is_reused_after_restart(programs, tmp_path):
+    storage = JSONStorage(tmp_path)
+    embed = AsyncMock(side_effect=_fake_embed)
+    with patch('src.services.embedding_index.storage', storage), \
+         patch('src.services.embedding_index.llm_service.embed', embed):
+        await EmbeddingIndexService().refresh(programs)
+        built_calls = embed.await_count
+        
+        restarted = EmbeddingIndexService()
+        index = await restarted.refresh(programs)
+    
+    # Матрица открыта с диска через memory-map, Ollama повторно не вызывалась
+    assert embed.await_count == built_calls
+    assert isinstance(index.matrix, np.memmap)
+    assert index.matrix.dtype == np.float32 and index.matrix.shape == (len(index.documents), 3)
+    assert np.linalg.norm(index.matrix, axis=1) == pytest.approx(1.0, rel=1e-5)
+    assert restarted.ready_for(programs) is index
+
+@pytest.mark.asyncio
+async def test_programs_change_embeds_only_changed_documents(programs, tmp_path):
+    service = EmbeddingIndexService()
+    embed = AsyncMock(side_effect=_fake_embed)
+    changed = ITMOParser()._get_mock_programs()
+    changed[0] = changed[0].model_copy(update={"description": "Новое описание программы."})
+    
+    with patch('src.services.embedding_index.storage', JSONStorage(tmp_path)), \
+         patch('src.services.embedding_index.llm_service.embed', embed):
+        await service.refresh(programs)
+        embed.reset_mock()
+        with patch.object(service, 'start_precompute'):
+            await service.on_programs_changed(diff_programs(programs, changed))
+        index = await service.refresh(changed)
+    
+    embedded = [text for call in embed.await_args_list for text in call.args[0]]
+    assert embedded == [f"{changed[0].name}. Описание: Новое описание программы."]
+    assert len(index.documents) == len(snapshot_documents(changed))
+    assert np.linalg.norm(index.matrix, axis=1) == pytest.approx(1.0, rel=1e-5)
+
+def test_enabled_with_numpy_and_embed_model():
+    with patch('src.services.embedding_index.llm_service.embed_model', "bge-m3"):
+        assert EmbeddingIndexService().enabled
+    with patch('src.services.embedding_index.llm_service.embed_model', ""):
+        assert not EmbeddingIndexService().enabled
+
+@pytest.mark.asyncio
+async def test_search_without_index_returns_nothing(programs):
+    embed = AsyncMock(side_effect=_fake_embed)
+    with patch('src.services.embedding_index.llm_service.embed', embed):
+        assert await EmbeddingIndexService().search("NLP", programs) == []
+    
+    embed.assert_not_awaited()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from src.bot.states.user_states import UserStates
+from src.data.fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.mark.asyncio
+async def test_state_and_data_survive_restart(tmp_path):
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3")
+    context = FSMContext(storage, KEY)
+    await context.set_state(UserStates.COLLECTING_INTERESTS)
+    await context.update_data(background="Бакалавр", interests=["NLP"])
+    await storage.close()
+    
+    restarted = FSMContext(SQLiteStorage(tmp_path / "fsm.sqlite3"), KEY)
+    
+    assert await restarted.get_state() == UserStates.COLLECTING_INTERESTS.state
+    assert await restarted.get_data() == {"background": "Бакалавр", "interests": ["NLP"]}
+
+@pytest.mark.asyncio
+async def test_clear_removes_record(tmp_path):
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3")
+    context = FSMContext(storage, KEY)
+    await context.set_state(UserStates.COLLECTING_INTERESTS)
+    await context.update_data(interests=["NLP"])
+    
+    await context.clear()
+    
+    assert await context.get_state() is None
+    assert storage._connection.execute("SELECT COUNT(*) FROM fsm_states").fetchone()[0] == 0
+
+@pytest.mark.asyncio
+async def test_stale_sessions_are_evicted(tmp_path):
+    clock = FakeClock()
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3", ttl_seconds=100, clock=clock)
+    await storage.set_state(KEY, UserStates.COLLECTING_INTERESTS)
+    
+    clock.now += 50
+    assert await storage.get_state(KEY) == UserStates.COLLECTING_INTERESTS.state
+    
+    clock.now += 100
+    assert await storage.get_state(KEY) is None
+    assert await storage.evict_stale() == 1
+    assert not storage._cache
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_and_reads_fall_back_to_disk(tmp_path):
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3", max_cached=2)
+    keys = [StorageKey(bot_id=1, chat_id=user_id, user_id=user_id) for user_id in range(5)]
+    for key in keys:
+        await storage.set_data(key, {"user": key.user_id})
+    
+    assert len(storage._cache) == 2
+    assert await storage.get_data(keys[0]) == {"user": 0}
+
+@pytest.mark.asyncio
+async def test_get_data_returns_copy(tmp_path):
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3")
+    await storage.set_data(KEY, {"interests": ["NLP"]})
+    
+    data = await storage.get_data(KEY)
+    data["interests"].append("CV")
+    
+    assert await storage.get_data(KEY) == {"interests": ["NLP"]}
+
+@pytest.mark.asyncio
+async def test_database_calls_run_off_event_loop(tmp_path):
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3", max_cached=0)
+    
+    with patch('src.data.fsm_storage.asyncio.to_thread', wraps=asyncio.to_thread) as to_thread:
+        await storage.set_data(KEY, {"interests": ["NLP"]})
+        assert await storage.get_data(KEY) == {"interests": ["NLP"]}
+    
+    # Первая запись заодно удаляет устаревшие записи
+    assert [call.args[0].__name__ for call in to_thread.call_args_list] == ["_select", "_write", "_delete_stale", "_select"]
+
+@pytest.mark.asyncio
+async def test_unserializable_data_is_rejected(tmp_path):
+    storage = SQLiteStorage(tmp_path / "fsm.sqlite3")
+    await storage.set_data(KEY, {"interests": ["NLP"]})
+    
+    with pytest.raises(TypeError):
+        await storage.set_data(KEY, {"profile": object()})
+    
+    # Ни база, ни кэш не получили строковое представление объекта
+    assert await storage.get_data(KEY) == {"interests": ["NLP"]}
+    assert json.loads(storage._connection.execute("SELECT data FROM fsm_states").fetchone()[0]) == {"interests": ["NLP"]}
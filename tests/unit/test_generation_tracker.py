@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from src.services.generation_tracker import GenerationTracker
+
+async def _forever(cancelled: asyncio.Event):
+    try:
+        await asyncio.sleep(60)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+@pytest.mark.asyncio
+async def test_new_generation_cancels_previous():
+    tracker = GenerationTracker()
+    cancelled = asyncio.Event()
+    
+    first = await tracker.start("1", _forever(cancelled))
+    await asyncio.sleep(0)
+    second = await tracker.start("1", asyncio.sleep(0, result="ok"))
+    
+    assert first.cancelled() and cancelled.is_set()
+    assert await second == "ok"
+
+@pytest.mark.asyncio
+async def test_cancel_is_per_user():
+    tracker = GenerationTracker()
+    cancelled = asyncio.Event()
+    other = await tracker.start("2", asyncio.sleep(0.01, result="ok"))
+    await tracker.start("1", _forever(cancelled))
+    await asyncio.sleep(0)
+    
+    assert await tracker.cancel("1") is True
+    assert cancelled.is_set()
+    assert await other == "ok"
+
+@pytest.mark.asyncio
+async def test_finished_generation_is_forgotten():
+    tracker = GenerationTracker()
+    
+    task = await tracker.start("1", asyncio.sleep(0))
+    await task
+    
+    assert tracker.get("1") is None
+    assert await tracker.cancel("1") is False
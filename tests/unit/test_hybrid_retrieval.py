@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from src.data.json_storage import JSONStorage
+from src.data.models import Program
+from src.services.parser_service import ITMOParser
+from src.services.search_index import BM25Index
+from src.services.embedding_index import EmbeddingIndexService
+from src.services.hybrid_retrieval import HybridRetriever, reciprocal_rank_fusion, build_context
+from src.services.retrieval_eval import RETRIEVAL_EVAL_CASES, evaluate, recall_at_k
+
+@pytest.fixture
+def programs():
+    return ITMOParser()._get_mock_programs()
+
+def test_rrf_prefers_documents_found_by_both_indexes():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+    
+    assert [key for key, _ in fused] == ["c", "a", "b", "d"]
+
+def test_bm25_ranks_exact_course_name_first():
+    index = BM25Index(["Глубокое обучение", "Основы машинного обучения", "Компьютерное зрение"])
+    
+    assert [idx for _, idx in index.search("курс глубокого обучения")] == [0, 1]
+
+@pytest.mark.asyncio
+async def test_retrieve_fuses_lexical_and_semantic_results(programs):
+    retriever = HybridRetriever()
+    nlp_course = retriever.lexical_index(programs).documents[3]
+    assert nlp_course.course.name == "Обработка естественного языка"
+    
+    with patch('src.services.hybrid_retrieval.embedding_index_service.search', AsyncMock(return_value=[(nlp_course, 0.8)])):
+        retrieval = await retriever.retrieve("Глубокое обучение или NLP?", programs)
+    
+    names = [retrieved.document.course.name for retrieved in retrieval.documents if retrieved.document.course]
+    assert names[0] == "Глубокое обучение"
+    assert "Обработка естественного языка" in names
+    assert retrieval.documents[0].semantic_rank is None
+
+@pytest.mark.asyncio
+async def test_slow_query_embedding_leaves_lexical_results(programs, tmp_path):
+    async def embed_documents_only(texts, timeout=None):
+        # Эмбеддинг вопроса не успел: llm_service.embed возвращает None по таймауту
+        return None if len(texts) == 1 else [[1.0, 0.0] for _ in texts]
+    
+    embedding_index = EmbeddingIndexService()
+    embed = AsyncMock(side_effect=embed_documents_only)
+    with patch('src.services.embedding_index.storage', JSONStorage(tmp_path)), \
+         patch('src.services.embedding_index.llm_service.embed_model', "bge-m3"), \
+         patch('src.services.embedding_index.llm_service.embed', embed), \
+         patch('src.services.hybrid_retrieval.embedding_index_service', embedding_index):
+        await embedding_index.refresh(programs)
+        embed.reset_mock()
+        
+        retrieval = await HybridRetriever().retrieve("Глубокое обучение", programs, embed_timeout=0.5)
+        expired = await HybridRetriever().retrieve("Глубокое обучение", programs, embed_timeout=0.0)
+    
+    # Вопрос ждал эмбеддинг не дольше embed_timeout, при исчерпанном времени не ждал вовсе
+    embed.assert_awaited_once()
+    assert embed.await_args.kwargs["timeout"] == 0.5
+    assert retrieval.semantic == [] and expired.semantic == []
+    assert retrieval.documents[0].document.course.name == "Глубокое обучение"
+
+@pytest.mark.asyncio
+async def test_lexical_search_runs_off_loop_during_query_embedding(programs):
+    retriever = HybridRetriever()
+    embedding_started = threading.Event()
+    search_lexical = retriever._search_lexical
+    
+    def lexical_in_thread(query, items):
+        assert threading.current_thread() is not threading.main_thread()
+        # Запрос эмбеддинга уже отправлен, пока BM25 еще считается
+        assert embedding_started.wait(timeout=2)
+        return search_lexical(query, items)
+    
+    async def semantic_search(*args, **kwargs):
+        embedding_started.set()
+        return []
+    
+    with patch.object(retriever, '_search_lexical', lexical_in_thread), \
+         patch('src.services.hybrid_retrieval.embedding_index_service.search', semantic_search):
+        retrieval = await retriever.retrieve("Глубокое обучение", programs)
+    
+    assert retrieval.documents[0].document.course.name == "Глубокое обучение"
+
+@pytest.mark.asyncio
+async def test_context_fits_token_budget(programs):
+    retrieval = await HybridRetriever().retrieve("Сколько стоит обучение и есть ли общежитие?", programs)
+    
+    context = build_context(retrieval.documents, max_tokens=40)
+    
+    assert context.startswith("- ")
+    assert len(context.split("\n")) < len(retrieval.documents)
+    assert build_context(retrieval.documents, max_tokens=0) == ""
+
+@pytest.mark.asyncio
+async def test_evaluation_on_real_programs_reports_recall_and_latency():
+    with open(Path("data/static/programs.json"), encoding="utf-8") as f:
+        programs = [Program.model_validate(item) for item in json.load(f)]
+    
+    report = await evaluate(programs, k=5, retriever=HybridRetriever())
+    
+    assert report.cases == len(RETRIEVAL_EVAL_CASES)
+    # Без индекса эмбеддингов гибридный поиск совпадает с лексическим
+    assert report.recall["hybrid"] == report.recall["lexical"] >= 0.7
+    assert report.recall["semantic"] == 0.0
+    assert 0 < report.latency_p50_ms <= report.latency_p95_ms
+
+def test_recall_at_k_counts_detail_fields(programs):
+    documents = HybridRetriever().lexical_index(programs).documents
+    details = [document for document in documents if document.key.endswith("/cost_per_year/0")]
+    
+    assert recall_at_k(details, ("cost_per_year", "course:Глубокое обучение"), 5) == 0.5
@@ -0,0 +1,79 @@
+import pytest
+from src.services.parser_service import ITMOParser
+from src.services.intent_router import IntentRouter, NaiveBayesIntentModel, OPEN_INTENT, COURSE_INTENT
+from src.services.intent_examples import INTENT_EXAMPLES
+from src.bot.handlers.qa import _try_local_answer
+from src.data.models import ProgramDetails
+
+@pytest.fixture
+def programs():
+    programs = ITMOParser()._get_mock_programs()
+    programs[0].details = ProgramDetails(cost_per_year="599 000 ₽", dormitory="да", program_manager="Иван Иванов")
+    programs[1].details = ProgramDetails(cost_per_year="450 000 ₽", dormitory="да")
+    return programs
+
+def test_rules_return_all_field_intents_in_order():
+    match = IntentRouter().classify("Есть ли общежитие и сколько стоит обучение?")
+    
+    assert match.intents == ('dormitory', 'cost_per_year')
+    assert match.source == 'rules'
+
+def test_open_question_goes_to_llm():
+    assert IntentRouter().classify("Что такое машинное обучение?").intents == (OPEN_INTENT,)
+
+def test_course_question_intent():
+    assert IntentRouter().classify("Какие курсы есть по NLP?").intents == (COURSE_INTENT,)
+
+def test_model_classifies_paraphrase():
+    model = NaiveBayesIntentModel(INTENT_EXAMPLES)
+    
+    intent, confidence = model.predict("Во сколько обойдется учеба?")
+    
+    assert intent == 'cost_per_year'
+    assert 0 < confidence <= 1
+
+def test_model_unknown_words_are_open():
+    assert NaiveBayesIntentModel(INTENT_EXAMPLES).predict("qwerty zxcvb") == (OPEN_INTENT, 0.0)
+
+def test_answer_fields_for_all_programs(programs):
+    answer = _try_local_answer("Сколько стоит обучение?", programs)
+    
+    assert "599 000 ₽" in answer
+    assert "450 000 ₽" in answer
+
+def test_answer_fields_for_named_program(programs):
+    answer = _try_local_answer("Сколько стоит обучение на программе Искусственный интеллект?", programs)
+    
+    assert "599 000 ₽" in answer
+    assert "450 000 ₽" not in answer
+
+def test_missing_field_falls_back_to_llm(programs):
+    assert _try_local_answer("Какой язык обучения?", programs) is None
+
+def test_course_question_answered_from_index(programs):
+    answer = _try_local_answer("Есть ли курс Глубокое обучение?", programs)
+    
+    assert "**Глубокое обучение**" in answer
+
+@pytest.mark.parametrize("question", [
+    "Чем отличается контрактное обучение от бюджетного?",
+    "Какая цена ошибки при поступлении?",
+    "Расскажи про военную историю ИТМО",
+    "Какие контакты приемной комиссии?",
+])
+def test_single_word_cues_do_not_answer_locally(question, programs):
+    assert IntentRouter().classify(question).intents == (OPEN_INTENT,)
+    assert _try_local_answer(question, programs) is None
+
+@pytest.mark.parametrize("question, intent", [
+    ("Какая стоимость?", 'cost_per_year'),
+    ("Обучение платное?", 'cost_per_year'),
+    ("Есть ли отсрочка от армии?", 'military_center'),
+    ("Контакты менеджера", 'program_manager'),
+    ("Можно ли учиться заочно?", 'form_of_study'),
+])
+def test_question_forms_answered_by_rules(question, intent):
+    match = IntentRouter().classify(question)
+    
+    assert match.intents == (intent,)
+    assert match.source == 'rules'
@@ -1,5 +1,6 @@
 import pytest
 import asyncio
+import json
 import tempfile
 import shutil
 from pathlib import Path
@@ -76,4 +77,87 @@ async def test_load_nonexistent_user_profile(temp_storage):
 async def test_load_programs_empty_file(temp_storage):
     """Test loading programs when file doesn't exist"""
     programs = await temp_storage.load_programs()
-    assert programs == [] 
\ No newline at end of file
+    assert programs == []
+
+
+def make_programs(name: str):
+    return [Program(
+        id="ai",
+        name=name,
+        type=ProgramType.AI,
+        url="https://example.com/ai",
+        courses=[],
+        total_credits=0,
+        duration_semesters=4,
+        parsed_at=datetime.now()
+    )]
+
+@pytest.mark.asyncio
+async def test_save_programs_creates_versioned_snapshot(temp_storage):
+    """Test that each save writes a new version and moves the pointer"""
+    first = await temp_storage.save_programs(make_programs("v1"))
+    second = await temp_storage.save_programs(make_programs("v2"))
+    
+    assert temp_storage.list_programs_versions() == [first, second]
+    assert temp_storage.get_current_programs_version() == second
+    assert (await temp_storage.load_programs())[0].name == "v2"
+    assert not list(temp_storage.static_dir.rglob("*.tmp"))
+
+@pytest.mark.asyncio
+async def test_rollback_programs(temp_storage):
+    """Test rollback to previous and explicit versions"""
+    first = await temp_storage.save_programs(make_programs("v1"))
+    await temp_storage.save_programs(make_programs("v2"))
+    
+    assert await temp_storage.rollback_programs() == first
+    assert (await temp_storage.load_programs())[0].name == "v1"
+    assert await temp_storage.rollback_programs() is None
+    assert await temp_storage.rollback_programs("unknown") is None
+
+@pytest.mark.asyncio
+async def test_rollback_pins_version_until_unpinned(temp_storage):
+    """Test that rollback pins the version and a new save clears the pin"""
+    first = await temp_storage.save_programs(make_programs("v1"))
+    await temp_storage.save_programs(make_programs("v2"))
+    assert not temp_storage.is_programs_pinned()
+    
+    await temp_storage.rollback_programs(first)
+    assert temp_storage.is_programs_pinned()
+    
+    assert await temp_storage.unpin_programs()
+    assert not temp_storage.is_programs_pinned()
+    assert temp_storage.get_current_programs_version() == first
+    assert not await temp_storage.unpin_programs()
+
+@pytest.mark.asyncio
+async def test_legacy_programs_file_migrated(temp_storage):
+    """Test that programs.json without versions becomes the current version on first load"""
+    programs_data = [program.model_dump() for program in make_programs("legacy")]
+    legacy_file = temp_storage.static_dir / "programs.json"
+    legacy_file.write_text(json.dumps(programs_data, default=str), encoding='utf-8')
+    
+    programs = await temp_storage.load_programs()
+    
+    assert programs[0].name == "legacy"
+    assert temp_storage.list_programs_versions() == [temp_storage.get_current_programs_version()]
+    assert (await temp_storage.load_programs())[0].name == "legacy"
+
+@pytest.mark.asyncio
+async def test_concurrent_atomic_writes_use_separate_temp_files(temp_storage):
+    """Test that parallel writes of one file in one process do not share a temp file"""
+    file_path = temp_storage.static_dir / "concurrent.json"
+    contents = [json.dumps({"writer": idx, "payload": "x" * 100000}) for idx in range(8)]
+    
+    await asyncio.gather(*(asyncio.to_thread(temp_storage._write_atomic, file_path, content) for content in contents))
+    
+    assert file_path.read_text(encoding='utf-8') in contents
+    assert not list(temp_storage.static_dir.glob("*.tmp"))
+
+@pytest.mark.asyncio
+async def test_programs_versions_retention(temp_storage):
+    """Test that only current and N previous versions are kept"""
+    temp_storage.programs_retention = 2
+    
+    versions = [await temp_storage.save_programs(make_programs(f"v{i}")) for i in range(5)]
+    
+    assert temp_storage.list_programs_versions() == versions[-3:]
@@ -0,0 +1,20 @@
+from src.utils.latency import LatencyTracker
+
+def test_percentile_needs_min_samples():
+    tracker = LatencyTracker(min_samples=3)
+    tracker.observe("qa", 1.0)
+    tracker.observe("qa", 2.0)
+    
+    assert tracker.percentile("qa", 95) is None
+    assert tracker.percentile("general", 95) is None
+
+def test_percentile_nearest_rank_per_key():
+    tracker = LatencyTracker(window_size=10, min_samples=1)
+    for seconds in range(1, 21):
+        tracker.observe("qa", float(seconds))
+    tracker.observe("general", 50.0)
+    
+    # В окне остались последние 10 замеров: 11..20
+    assert tracker.percentile("qa", 50) == 15.0
+    assert tracker.percentile("qa", 95) == 20.0
+    assert tracker.percentile("general", 95) == 50.0
@@ -36,6 +36,72 @@ class TestOllamaService:
             
             assert result is None
     
+    @pytest.mark.asyncio
+    async def test_generate_response_cancel_closes_client(self, llm_service):
+        import asyncio
+        
+        async def slow_post(*args, **kwargs):
+            await asyncio.sleep(60)
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            mock_client.return_value.__aenter__.return_value.post.side_effect = slow_post
+            mock_client.return_value.__aexit__ = AsyncMock(return_value=False)
+            
+            task = asyncio.create_task(llm_service.generate_response("Тестовый вопрос"))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # Клиент закрыт, значит соединение с Ollama разорвано
+            mock_client.return_value.__aexit__.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_answer_question_sends_catalog_as_stable_system_message(self, llm_service):
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            mock_response = MagicMock()
+            mock_response.json.return_value = {"message": {"role": "assistant", "content": "Ответ"}}
+            post = AsyncMock(return_value=mock_response)
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            assert await llm_service.answer_question("Первый вопрос", "КАТАЛОГ") == "Ответ"
+            await llm_service.answer_question("Второй вопрос", "КАТАЛОГ", retrieved="- Курс «Глубокое обучение»")
+            
+            first, second = (call.kwargs["json"] for call in post.call_args_list)
+            assert post.call_args_list[0].args[0].endswith("/api/chat")
+            assert first["messages"][0] == second["messages"][0]
+            assert "КАТАЛОГ" in first["messages"][0]["content"]
+            assert "Первый вопрос" in first["messages"][1]["content"]
+            # Найденные сведения меняют только сообщение пользователя
+            assert "Курс «Глубокое обучение»" in second["messages"][1]["content"]
+            assert first["keep_alive"] == llm_service.keep_alive
+            assert first["options"] == second["options"]
+    
+    @pytest.mark.asyncio
+    async def test_prime_prefix_runs_once_per_prefix(self, llm_service):
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post = AsyncMock(return_value=MagicMock())
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            assert await llm_service.prime_prefix("Префикс")
+            assert await llm_service.prime_prefix("Префикс")
+            
+            post.assert_awaited_once()
+            assert post.call_args.kwargs["json"]["options"]["num_predict"] == 1
+    
+    def test_chat_budget_matches_primed_prefix(self, llm_service):
+        system = "Каталог программ и курсов. " * 600
+        
+        primed = llm_service._chat_budget(system, "", "qa")
+        asked = llm_service._chat_budget(system, "Сколько кредитов у курса глубокого обучения?", "qa")
+        
+        assert primed.num_ctx == asked.num_ctx
+        assert asked.num_ctx < 32768
+        assert asked.num_predict == 512
+    
     @pytest.mark.asyncio
     async def test_check_connection_success(self, llm_service):
         mock_response_data = {
@@ -91,4 +157,237 @@ class TestOllamaService:
             
             result = await llm_service.check_connection()
             
-            assert result == False 
\ No newline at end of file
+            assert result == False     
+    @pytest.mark.asyncio
+    async def test_refused_connection_fails_over_to_next_backend(self, llm_service):
+        import httpx
+        from src.services.ollama_pool import OllamaPool
+        
+        llm_service.pool = OllamaPool([("http://a", 1.0), ("http://b", 1.0)])
+        good = MagicMock()
+        good.json.return_value = {"response": "Ответ"}
+        
+        async def post(url, json):
+            if url.startswith("http://a"):
+                raise httpx.ConnectError("refused")
+            return good
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post_mock = AsyncMock(side_effect=post)
+            mock_client.return_value.__aenter__.return_value.post = post_mock
+            results = [await llm_service.generate_response("Вопрос") for _ in range(3)]
+        
+        assert results == ["Ответ"] * 3
+        # После первого ответа модель загружена на "b", и запросы идут туда
+        assert [call.args[0] for call in post_mock.call_args_list] == ["http://a/api/generate"] + ["http://b/api/generate"] * 3
+        assert not llm_service.breaker.is_open
+    
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast_without_request(self, llm_service):
+        import httpx
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post = AsyncMock(side_effect=httpx.TimeoutException("Timeout"))
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            for _ in range(llm_service.breaker.min_calls):
+                assert await llm_service.generate_response("Вопрос") is None
+            calls = post.await_count
+            
+            assert llm_service.breaker.is_open
+            assert await llm_service.generate_response("Вопрос") is None
+            assert post.await_count == calls
+    
+    @pytest.mark.asyncio
+    async def test_deadline_capped_timeouts_open_circuit(self, llm_service):
+        import httpx
+        from src.utils.deadline import Deadline
+        
+        now = [0.0]
+        
+        async def post(url, json):
+            # Ollama не ответила за все отведенное время, дедлайн истек вместе с таймаутом
+            now[0] += 29.5
+            raise httpx.ReadTimeout("Timeout")
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            mock_client.return_value.__aenter__.return_value.post = AsyncMock(side_effect=post)
+            
+            for _ in range(llm_service.breaker.min_calls):
+                assert await llm_service.generate_response("Вопрос", purpose="qa", deadline=Deadline(29.5, clock=lambda: now[0])) is None
+        
+        assert llm_service.breaker.is_open
+    
+    @pytest.mark.asyncio
+    async def test_timeout_of_nearly_expired_deadline_is_not_a_failure(self, llm_service):
+        import httpx
+        from src.utils.deadline import Deadline
+        
+        now = [0.0]
+        
+        async def post(url, json):
+            now[0] += 5.0
+            raise httpx.ReadTimeout("Timeout")
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            mock_client.return_value.__aenter__.return_value.post = AsyncMock(side_effect=post)
+            
+            for _ in range(llm_service.breaker.min_calls):
+                assert await llm_service.generate_response("Вопрос", purpose="qa", deadline=Deadline(5.0, clock=lambda: now[0])) is None
+        
+        assert not llm_service.breaker.is_open
+    
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_timeout_and_answer_length(self, llm_service):
+        from src.utils.deadline import Deadline
+        
+        llm_service._decode_rates[llm_service.model] = 10.0
+        response = MagicMock()
+        response.json.return_value = {"response": "Ответ"}
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post = AsyncMock(return_value=response)
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            assert await llm_service.generate_response("Вопрос", purpose="qa", deadline=Deadline(10.0)) == "Ответ"
+            assert await llm_service.generate_response("Вопрос", purpose="qa", deadline=Deadline(0.5)) is None
+        
+        post.assert_awaited_once()
+        assert mock_client.call_args.kwargs["timeout"] <= 10.0
+        # За ~8 секунд при 10 токенах в секунду помещается не больше 80 токенов
+        assert post.call_args.kwargs["json"]["options"]["num_predict"] <= 80
+    
+    @pytest.mark.asyncio
+    async def test_slow_request_is_hedged_to_second_backend(self, llm_service):
+        import asyncio
+        from src.services.ollama_pool import OllamaPool
+        
+        llm_service.pool = OllamaPool([("http://a", 1.0), ("http://b", 1.0)])
+        for _ in range(llm_service.latencies.min_samples):
+            llm_service.latencies.observe(f"qa/{llm_service.model}", 0.01)
+        primary_cancelled = asyncio.Event()
+        
+        async def post(url, json):
+            if url.startswith("http://a"):
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    primary_cancelled.set()
+                    raise
+            response = MagicMock()
+            response.json.return_value = {"response": f"Ответ {url[7]}"}
+            return response
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch('src.services.llm_service.settings.OLLAMA_HEDGE_PERCENTILE', 95.0), \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            mock_client.return_value.__aenter__.return_value.post = AsyncMock(side_effect=post)
+            
+            assert await llm_service.generate_response("Вопрос", purpose="qa") == "Ответ b"
+        
+        assert primary_cancelled.is_set()
+        assert all(backend.in_flight == 0 for backend in llm_service.pool.backends)
+    
+    @pytest.mark.asyncio
+    async def test_load_model_keeps_context_size_of_last_request(self, llm_service):
+        response = MagicMock()
+        response.json.return_value = {"response": "Ответ"}
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post = AsyncMock(return_value=response)
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            await llm_service.chat("Каталог " * 3000, "Вопрос", purpose="qa")
+            assert await llm_service.load_model()
+        
+        asked, loaded = (call.kwargs["json"] for call in post.call_args_list)
+        assert "prompt" not in loaded and loaded["keep_alive"] == llm_service.keep_alive
+        assert loaded["options"]["num_ctx"] == asked["options"]["num_ctx"]
+    
+    @pytest.mark.asyncio
+    async def test_context_size_is_pinned_per_model_across_purposes(self, llm_service):
+        response = MagicMock()
+        response.json.return_value = {"response": "Ответ", "message": {"content": "Ответ"}}
+        qa_prefix = "Каталог программ. " * 1500
+        recommendations_prefix = "Каталог программ и курсов. " * 3000
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post = AsyncMock(return_value=response)
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            pinned = llm_service.reserve_context(recommendations_prefix, "recommendations")
+            assert llm_service.reserve_context(qa_prefix, "qa") == pinned
+            assert llm_service._chat_budget(qa_prefix, "", "qa").num_ctx < pinned
+            
+            await llm_service.chat(qa_prefix, "Вопрос", purpose="qa")
+            await llm_service.generate_response("Короткий вопрос", purpose="general")
+            await llm_service.chat(recommendations_prefix, "Профиль", purpose="recommendations")
+        
+        sizes = [call.kwargs["json"]["options"]["num_ctx"] for call in post.call_args_list]
+        predicts = [call.kwargs["json"]["options"]["num_predict"] for call in post.call_args_list]
+        assert sizes == [pinned] * 3
+        assert predicts == [512, 384, 1024]
+    
+    @pytest.mark.asyncio
+    async def test_small_model_answer_escalates_when_unsure(self, llm_service):
+        from src.services.model_routing import ModelRouter
+        
+        llm_service.router = ModelRouter({"qa": "tiny:1b", "general": "tiny:1b"})
+        llm_service.pool.backends[0].models = {llm_service.model, "tiny:1b"}
+        answers = {
+            "Вопрос 1": {"tiny:1b": "Стоимость обучения - 599 000 рублей в год."},
+            "Вопрос 2": {"tiny:1b": "Не знаю.", llm_service.model: "Подробный ответ основной модели на вопрос."},
+        }
+        
+        async def post(url, json):
+            response = MagicMock()
+            question = json["messages"][1]["content"].split("\n")[0].replace("Вопрос: ", "")
+            response.json.return_value = {"message": {"content": answers[question][json["model"]]}}
+            return response
+        
+        with patch('httpx.AsyncClient') as mock_client, \
+             patch.object(llm_service, '_ensure_model_available', AsyncMock(return_value=True)):
+            post_mock = AsyncMock(side_effect=post)
+            mock_client.return_value.__aenter__.return_value.post = post_mock
+            
+            assert await llm_service.answer_question("Вопрос 1", "КАТАЛОГ") == answers["Вопрос 1"]["tiny:1b"]
+            assert await llm_service.answer_question("Вопрос 2", "КАТАЛОГ") == answers["Вопрос 2"][llm_service.model]
+        
+        models = [call.kwargs["json"]["model"] for call in post_mock.call_args_list]
+        assert models == ["tiny:1b", "tiny:1b", llm_service.model]
+    
+    def test_routed_model_missing_on_backends_uses_main_model(self, llm_service):
+        from src.services.model_routing import ModelRouter
+        
+        llm_service.router = ModelRouter({"qa": "tiny:1b"})
+        llm_service.pool.backends[0].models = {llm_service.model}
+        
+        assert llm_service.model_for("qa") == llm_service.model
+        assert llm_service.routed_models() == [llm_service.model]
+    
+    @pytest.mark.asyncio
+    async def test_embed_batches_texts_on_backend_with_embedding_model(self, llm_service):
+        response = MagicMock()
+        response.json.return_value = {"embeddings": [[0.1, 0.2], [0.3, 0.4]]}
+        llm_service.embed_model = "bge-m3"
+        
+        with patch('httpx.AsyncClient') as mock_client:
+            post = AsyncMock(return_value=response)
+            mock_client.return_value.__aenter__.return_value.post = post
+            
+            llm_service.pool.backends[0].models = {llm_service.model}
+            assert await llm_service.embed(["Курс", "Вопрос"]) is None
+            
+            llm_service.pool.backends[0].models = {llm_service.model, "bge-m3:latest"}
+            assert await llm_service.embed(["Курс", "Вопрос"]) == [[0.1, 0.2], [0.3, 0.4]]
+        
+        post.assert_awaited_once()
+        assert post.call_args.kwargs["json"]["input"] == ["Курс", "Вопрос"]
+        assert post.call_args.args[0].endswith("/api/embed")
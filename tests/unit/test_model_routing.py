@@ -0,0 +1,21 @@
+from src.services.model_routing import ModelRouter, parse_model_routes
+
+def test_parse_model_routes_keeps_model_tags():
+    routes = parse_model_routes(["qa=llama3.2:1b", " general = phi3:mini ", "broken", ""])
+    
+    assert routes == {"qa": "llama3.2:1b", "general": "phi3:mini"}
+
+def test_model_for_falls_back_to_default():
+    router = ModelRouter({"qa": "llama3.2:1b"})
+    
+    assert router.model_for("qa", "llama3:latest") == "llama3.2:1b"
+    assert router.model_for("recommendations", "llama3:latest") == "llama3:latest"
+
+def test_needs_escalation_on_empty_short_or_unsure_answer():
+    router = ModelRouter({})
+    
+    assert router.needs_escalation(None)
+    assert router.needs_escalation("Да.")
+    assert router.needs_escalation("Извините, я не знаю ответа на этот вопрос.")
+    assert router.needs_escalation("Я не уверена, но стоимость около 500 тысяч рублей")
+    assert not router.needs_escalation("Стоимость обучения - 599 000 рублей в год на обеих программах.")
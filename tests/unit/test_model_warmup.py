@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from src.services.model_warmup import ModelWarmupService, parse_hours, in_hours
+from src.services.llm_service import llm_service
+
+def test_working_hours_including_overnight():
+    day, night = parse_hours("8-23"), parse_hours("22-6")
+    
+    assert in_hours(day, datetime(2024, 1, 1, 8)) and not in_hours(day, datetime(2024, 1, 1, 23))
+    assert in_hours(night, datetime(2024, 1, 1, 3)) and not in_hours(night, datetime(2024, 1, 1, 12))
+    assert in_hours(parse_hours(""), datetime(2024, 1, 1, 4))
+
+@pytest.mark.asyncio
+async def test_warm_up_reprimes_prefixes_where_model_was_unloaded():
+    backend = llm_service.pool.backends[0]
+    llm_service._primed_prefixes = {(backend.url, llm_service.model, "hash")}
+    backend.loaded_models = set()
+    
+    with patch.object(llm_service.pool, 'health_check', AsyncMock(return_value=True)), \
+         patch('src.services.model_warmup.storage.load_programs', AsyncMock(return_value=["program"])), \
+         patch('src.services.model_warmup.prompt_prefixes.warmup', AsyncMock()) as warmup, \
+         patch.object(llm_service, 'load_model', AsyncMock(return_value=True)) as load_model:
+        assert await ModelWarmupService().warm_up()
+    
+    assert llm_service._primed_prefixes == set()
+    warmup.assert_awaited_once_with(["program"])
+    load_model.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_start_warm_up_runs_in_background_and_stops():
+    started = asyncio.Event()
+    
+    async def slow_warm_up():
+        started.set()
+        await asyncio.sleep(10)
+    
+    service = ModelWarmupService()
+    with patch.object(service, 'warm_up', side_effect=slow_warm_up):
+        task = service.start_warm_up()
+        assert service.start_warm_up() is task
+        await started.wait()
+        
+        await service.stop()
+    
+    assert task.done()
+
+@pytest.mark.asyncio
+async def test_programs_change_restarts_warm_up_once():
+    cancelled = asyncio.Event()
+    calls = []
+    
+    async def warm_up():
+        calls.append(len(calls))
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    service = ModelWarmupService()
+    with patch.object(service, 'warm_up', side_effect=warm_up):
+        first = service.start_warm_up()
+        await asyncio.sleep(0)
+        
+        await service.on_programs_changed(None)
+        # Прежний прогрев отменен и завершен до запуска нового
+        assert first.done() and cancelled.is_set()
+        second = service._warm_up_task
+        # Прогрев при запуске бота не дублирует уже начатый
+        assert service.start_warm_up() is second
+        await asyncio.sleep(0)
+        await service.stop()
+    
+    assert calls == [0, 1]
+
+@pytest.mark.asyncio
+async def test_background_warm_up_failure_is_logged():
+    service = ModelWarmupService()
+    with patch.object(service, 'warm_up', AsyncMock(side_effect=RuntimeError("boom"))), \
+         patch('src.services.model_warmup.logger') as logger:
+        await service.start_warm_up()
+    
+    logger.error.assert_called_once()
@@ -47,6 +47,24 @@ def test_program_model():
     assert len(program.courses) == 1
     assert program.total_credits == 120
 
+def test_program_content_hashes_ignore_parse_metadata():
+    def make(course_id, parsed_at, credits=5):
+        course = Course(id=course_id, name="Computer Science Basics", credits=credits, semester=1, is_elective=False)
+        return Program(
+            id="ai_masters", name="AI Masters Program", type=ProgramType.AI, url="https://example.com/ai",
+            courses=[course], total_credits=120, duration_semesters=4, parsed_at=parsed_at
+        )
+    
+    program = make("cs101", datetime(2025, 7, 1))
+    
+    # id курсов и parsed_at меняются при каждом парсинге
+    assert make("course_0", datetime(2025, 8, 1)).content_hashes() == program.content_hashes()
+    courses_hash, fields_hash = make("cs101", datetime(2025, 7, 1), credits=6).content_hashes()
+    assert courses_hash != program.content_hashes()[0] and fields_hash == program.content_hashes()[1]
+    
+    copy = program.model_copy(update={"description": "Новое описание"})
+    assert copy.content_hashes()[1] != program.content_hashes()[1]
+
 def test_user_profile_model():
     """Test UserProfile model creation and validation"""
     now = datetime.now()
@@ -0,0 +1,80 @@
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.services.ollama_pool import OllamaPool, NoBackendAvailable, parse_backends, EJECT_AFTER_FAILURES
+
+def _pool(*urls):
+    return OllamaPool([(url, 1.0) for url in urls])
+
+def test_parse_backends_with_weights():
+    assert parse_backends(["http://a:11434/|2", " http://b:11434 ", ""]) == [
+        ("http://a:11434", 2.0), ("http://b:11434", 1.0)
+    ]
+
+@pytest.mark.asyncio
+async def test_least_outstanding_requests_respects_weight():
+    pool = OllamaPool([("http://a", 1.0), ("http://b", 3.0)])
+    picked = []
+    
+    async with pool.acquire("llama3") as first, pool.acquire("llama3") as second, pool.acquire("llama3") as third:
+        picked = [first.url, second.url, third.url]
+    
+    assert picked == ["http://b", "http://b", "http://a"]
+    assert all(backend.in_flight == 0 for backend in pool.backends)
+
+def test_model_affinity_prefers_loaded_and_skips_missing():
+    pool = _pool("http://a", "http://b", "http://c")
+    a, b, c = pool.backends
+    a.models, b.models, c.models = {"llama3"}, {"llama3"}, {"mistral"}
+    b.loaded_models = {"llama3"}
+    b.in_flight = 5
+    
+    assert pool.pick("llama3") is b
+    assert pool.pick("mistral") is c
+    with pytest.raises(NoBackendAvailable):
+        pool.pick("qwen")
+
+def test_failing_backend_is_ejected_with_growing_cooldown():
+    pool = _pool("http://a", "http://b")
+    a = pool.backends[0]
+    
+    for _ in range(EJECT_AFTER_FAILURES):
+        pool.report_failure(a, "timeout")
+    first_cooldown = a.ejected_until - time.monotonic()
+    assert pool.candidates("llama3") == [pool.backends[1]]
+    
+    a.ejected_until = 0.0
+    for _ in range(EJECT_AFTER_FAILURES):
+        pool.report_failure(a, "timeout")
+    assert a.ejected_until - time.monotonic() > first_cooldown
+    
+    pool.report_success(a, "llama3")
+    assert a.ejections == 0 and "llama3" in a.loaded_models
+
+@pytest.mark.asyncio
+async def test_health_check_marks_down_and_reinstates():
+    pool = _pool("http://a", "http://b")
+    
+    async def get(url):
+        if url.startswith("http://a"):
+            raise ConnectionError("refused")
+        response = MagicMock()
+        response.json.return_value = {"models": [{"name": "llama3"}]}
+        return response
+    
+    with patch('httpx.AsyncClient') as mock_client:
+        mock_client.return_value.__aenter__.return_value.get = AsyncMock(side_effect=get)
+        assert await pool.health_check()
+    
+    a, b = pool.backends
+    assert not a.healthy and b.healthy
+    assert b.loaded_models == {"llama3"}
+    assert pool.available_models() == ["llama3"]
+    
+    with patch('httpx.AsyncClient') as mock_client:
+        response = MagicMock()
+        response.json.return_value = {"models": [{"name": "llama3"}]}
+        mock_client.return_value.__aenter__.return_value.get = AsyncMock(return_value=response)
+        await pool.health_check()
+    
+    assert a.healthy
@@ -111,4 +111,68 @@ class TestITMOParser:
         
         courses = parser._extract_courses_from_text(text)
         
-        assert len(courses) == 0 
\ No newline at end of file
+        assert len(courses) == 0 
+    
+    @pytest.mark.asyncio
+    async def test_parse_xlsx_curriculum_streaming(self, parser):
+        import openpyxl
+        from io import BytesIO
+        
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["Учебный план"])
+        sheet.append(["Семестр", "Наименование дисциплины", "З.е.", "Часы"])
+        sheet.append(["Обязательные дисциплины"])
+        sheet.append([1, "Машинное обучение", 6, 216])
+        sheet.append(["Пул выборных дисциплин"])
+        sheet.append([2, "Компьютерное зрение", "4 з.е.", None])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        
+        courses = await parser._parse_xlsx_curriculum(buffer.getvalue())
+        
+        assert [c.name for c in courses] == ["Машинное обучение", "Компьютерное зрение"]
+        assert courses[0].is_elective is False
+        assert courses[1].is_elective is True
+        assert courses[1].semester == 2
+        assert courses[1].hours == 4 * 36
+    
+    @pytest.mark.asyncio
+    async def test_parse_program_page_shares_next_data(self, parser):
+        html = """
+        <html>
+            <head><title>ИТМО</title><script>var x = 1;</script></head>
+            <body>
+                <h1>Искусственный интеллект</h1>
+                <p>Форма обучения: очная</p>
+                <script id="__NEXT_DATA__" type="application/json">
+                    {"props": {"apiProgram": {"academic_plan": "https://api.itmo.su/plan/ai.pdf", "cost": "599 000 ₽"}}}
+                </script>
+            </body>
+        </html>
+        """
+        
+        with patch('httpx.AsyncClient') as mock_client:
+            mock_response = MagicMock()
+            mock_response.text = html
+            mock_response.raise_for_status.return_value = None
+            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
+            
+            with patch.object(parser, '_extract_next_data', wraps=parser._extract_next_data) as next_data_spy, \
+                 patch.object(parser, '_parse_curriculum_file', return_value=[]) as curriculum_mock, \
+                 patch.object(parser, 'load_local_curriculum_files', return_value={}):
+                program = await parser._parse_program_page(ProgramType.AI, "https://abit.itmo.ru/program/master/ai")
+        
+        assert next_data_spy.call_count == 1
+        curriculum_mock.assert_called_once_with("https://api.itmo.su/plan/ai.pdf", ProgramType.AI)
+        assert program.name == "Искусственный интеллект"
+        assert program.details.cost_per_year.startswith("599 000")
+        assert program.details.form_of_study == "очная"
+    
+    def test_build_page_soup_skips_scripts(self, parser):
+        soup = parser._build_page_soup(
+            "<html><head><style>p {}</style></head><body><script>var a;</script><p>Текст</p></body></html>"
+        )
+        
+        assert soup.find('script') is None
+        assert soup.get_text(strip=True) == "Текст"
@@ -0,0 +1,123 @@
+import pytest
+import tempfile
+import shutil
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from datetime import datetime
+from src.data.json_storage import JSONStorage
+from src.data.models import Program, Course, ProgramDetails, ProgramType
+from src.services.program_changes import ProgramChangesService, diff_programs
+
+def make_program(courses, cost="350 000 ₽", program_id="ai"):
+    return Program(
+        id=program_id,
+        name="Искусственный интеллект",
+        type=ProgramType.AI,
+        url="https://example.com/ai",
+        courses=courses,
+        total_credits=sum(course.credits for course in courses),
+        duration_semesters=4,
+        details=ProgramDetails(cost_per_year=cost),
+        parsed_at=datetime.now()
+    )
+
+@pytest.fixture
+def courses():
+    return [
+        Course(id="course_0", name="Машинное обучение", credits=6, semester=1, is_elective=False),
+        Course(id="course_1", name="Компьютерное зрение", credits=4, semester=2, is_elective=True),
+    ]
+
+@pytest.fixture
+def temp_storage():
+    temp_dir = Path(tempfile.mkdtemp())
+    yield JSONStorage(data_dir=temp_dir)
+    shutil.rmtree(temp_dir)
+
+def test_diff_unchanged_programs_ignores_parsed_at(courses):
+    diff = diff_programs([make_program(courses)], [make_program(list(courses))])
+    
+    assert not diff.has_changes
+
+def test_diff_detects_course_and_details_changes(courses):
+    new_courses = [
+        # id сдвинулся, но курс тот же - это не изменение
+        Course(id="course_5", name="Машинное обучение", credits=6, semester=1, is_elective=False),
+        Course(id="course_1", name="Компьютерное зрение", credits=5, semester=2, is_elective=True),
+        Course(id="course_2", name="Обработка естественного языка", credits=4, semester=3, is_elective=True),
+    ]
+    
+    diff = diff_programs([make_program(courses)], [make_program(new_courses, cost="400 000 ₽")])
+    
+    assert diff.affected_program_ids == ["ai"]
+    change = diff.changes[0]
+    assert change.added_courses == ["Обработка естественного языка"]
+    assert change.removed_courses == []
+    assert [c.name for c in change.changed_courses] == ["Компьютерное зрение"]
+    assert change.changed_courses[0].fields == ["credits"]
+    assert change.changed_details == ["cost_per_year"]
+    assert "total_credits" in change.changed_fields
+
+def test_diff_added_and_removed_programs(courses):
+    diff = diff_programs([make_program(courses, program_id="old")], [make_program(courses, program_id="new")])
+    
+    statuses = {change.program_id: change.status for change in diff.changes}
+    assert statuses == {"new": "added", "old": "removed"}
+
+@pytest.mark.asyncio
+async def test_apply_refresh_publishes_only_real_changes(temp_storage, courses):
+    service = ProgramChangesService()
+    handler = AsyncMock()
+    service.subscribe(handler)
+    
+    with patch('src.services.program_changes.storage', temp_storage):
+        first = await service.apply_refresh([make_program(courses)])
+        second = await service.apply_refresh([make_program(courses)])
+    
+    assert first.has_changes
+    assert not second.has_changes
+    handler.assert_awaited_once_with(first)
+    changelog = (temp_storage.static_dir / "programs_changelog.jsonl").read_text(encoding='utf-8')
+    assert len(changelog.strip().splitlines()) == 1
+
+
+@pytest.mark.asyncio
+async def test_rollback_publishes_change_and_survives_refresh(temp_storage, courses):
+    service = ProgramChangesService()
+    handler = AsyncMock()
+    service.subscribe(handler)
+    
+    with patch('src.services.program_changes.storage', temp_storage):
+        await service.apply_refresh([make_program(courses)])
+        await service.apply_refresh([make_program(courses, cost="400 000 ₽")])
+        handler.reset_mock()
+        
+        diff = await service.rollback()
+        refresh = await service.apply_refresh([make_program(courses, cost="400 000 ₽")])
+    
+    assert diff.changes[0].changed_details == ["cost_per_year"]
+    handler.assert_awaited_once_with(diff)
+    # Закрепленная откатом версия не заменяется обновлением
+    assert not refresh.has_changes
+    assert len(temp_storage.list_programs_versions()) == 2
+
+@pytest.mark.asyncio
+async def test_version_switched_by_another_process_is_published(temp_storage, courses):
+    service = ProgramChangesService()
+    handler = AsyncMock()
+    service.subscribe(handler)
+    
+    with patch('src.services.program_changes.storage', temp_storage):
+        await service.apply_refresh([make_program(courses)])
+        await service.apply_refresh([make_program(courses, cost="400 000 ₽")])
+        handler.reset_mock()
+        assert await service.check_current_version() is None
+        
+        # Откат через src.manage меняет только указатель на диске
+        await temp_storage.rollback_programs()
+        diff = await service.check_current_version()
+        repeated = await service.check_current_version()
+    
+    assert diff.changes[0].changed_details == ["cost_per_year"]
+    assert repeated is None
+    handler.assert_awaited_once_with(diff)
@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.services.parser_service import ITMOParser
+from src.services.prompt_prefix import PromptPrefixService
+
+@pytest.fixture
+def programs():
+    return ITMOParser()._get_mock_programs()
+
+def test_prefix_is_built_once_per_snapshot(programs):
+    service = PromptPrefixService()
+    build = MagicMock(side_effect=lambda items: f"каталог из {len(items)} программ")
+    service.register("qa", build)
+    
+    first = service.get("qa", programs)
+    
+    assert service.get("qa", list(programs)) is first
+    build.assert_called_once()
+    
+    # Повторный парсинг тех же данных не меняет отпечаток содержимого
+    service.get("qa", ITMOParser()._get_mock_programs())
+    build.assert_called_once()
+    
+    changed = ITMOParser()._get_mock_programs()
+    changed[0] = changed[0].model_copy(update={"description": "Новое описание"})
+    service.get("qa", changed)
+    assert build.call_count == 2
+
+@pytest.mark.asyncio
+async def test_programs_change_rebuilds_prefix_without_warming_up(programs):
+    service = PromptPrefixService()
+    build = MagicMock(return_value="каталог")
+    warmup = AsyncMock(return_value=True)
+    service.register("qa", build, warmup)
+    service.get("qa", programs)
+    
+    await service.on_programs_changed(MagicMock())
+    service.get("qa", programs)
+    
+    assert build.call_count == 2
+    # Прогревом после обновления данных занимается ModelWarmupService
+    warmup.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_warmup_reserves_context_for_all_prefixes_first(programs):
+    service = PromptPrefixService()
+    calls = []
+    
+    async def warmup(prefix):
+        calls.append(("warmup", prefix))
+        return True
+    
+    service.register("qa", MagicMock(return_value="каталог qa"), warmup, purpose="qa")
+    service.register("recommendations", MagicMock(return_value="каталог рекомендаций"), warmup, purpose="recommendations")
+    
+    with patch('src.services.prompt_prefix.llm_service.reserve_context',
+               side_effect=lambda prefix, purpose: calls.append(("reserve", purpose))):
+        await service.warmup(programs)
+    
+    assert calls == [
+        ("reserve", "qa"), ("reserve", "recommendations"),
+        ("warmup", "каталог qa"), ("warmup", "каталог рекомендаций"),
+    ]
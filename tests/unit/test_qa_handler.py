@@ -3,7 +3,9 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from aiogram.types import Message, User, Chat, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from src.bot.handlers.qa import process_question, enter_qa_mode
+import asyncio
+from src.bot.handlers.qa import process_question, enter_qa_mode, _race_llm_with_local
+from src.services.parser_service import ITMOParser
 from src.bot.states.user_states import UserStates
 from src.data.models import UserProfile, ProgramType
 
@@ -99,4 +101,105 @@ class TestQAHandler:
             await process_question(mock_message, mock_state)
             
             # Проверяем, что было отправлено сообщение об ошибке
-            assert mock_message.answer.call_count >= 1 
\ No newline at end of file
+            assert mock_message.answer.call_count >= 1 
+
+
+class TestAnswerTiers:
+    @pytest.mark.asyncio
+    async def test_race_returns_llm_answer_in_time(self):
+        async def llm():
+            return "Ответ LLM"
+        
+        assert await _race_llm_with_local(llm(), "Локальный ответ", grace=1) == "Ответ LLM"
+    
+    @pytest.mark.asyncio
+    async def test_race_cancels_late_llm_when_local_answer_exists(self):
+        cancelled = asyncio.Event()
+        
+        async def llm():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        assert await _race_llm_with_local(llm(), "Локальный ответ", grace=0.01) is None
+        assert cancelled.is_set()
+    
+    @pytest.mark.asyncio
+    async def test_race_waits_for_llm_without_local_answer(self):
+        async def llm():
+            await asyncio.sleep(0.02)
+            return "Ответ LLM"
+        
+        assert await _race_llm_with_local(llm(), None, grace=0.001) == "Ответ LLM"
+    
+    @pytest.mark.asyncio
+    async def test_exact_course_name_skips_llm(self):
+        message = MagicMock(spec=Message)
+        message.from_user = MagicMock(spec=User)
+        message.from_user.id = 123456
+        message.text = "Глубокое обучение"
+        message.answer = AsyncMock()
+        state = MagicMock(spec=FSMContext)
+        
+        with patch('src.bot.handlers.qa.storage.load_programs', return_value=ITMOParser()._get_mock_programs()), \
+             patch('src.bot.handlers.qa.llm_service.answer_question') as answer_question:
+            await process_question(message, state)
+        
+        answer_question.assert_not_called()
+        message.answer.assert_called_once()
+        assert "Глубокое обучение" in message.answer.call_args[0][0]
+    
+    @pytest.mark.asyncio
+    async def test_second_question_cancels_stale_answer(self):
+        def make_message(text):
+            message = MagicMock(spec=Message)
+            message.from_user = MagicMock(spec=User)
+            message.from_user.id = 777
+            message.text = text
+            processing_msg = MagicMock(spec=Message)
+            processing_msg.delete = AsyncMock()
+            message.answer = AsyncMock(return_value=processing_msg)
+            return message
+        
+        async def answer_question(question, context, deadline=None, retrieved=None):
+            if "первый" in question:
+                await asyncio.sleep(60)
+            return "Ответ на второй вопрос"
+        
+        first, second = make_message("Это первый открытый вопрос"), make_message("А это второй вопрос")
+        state = MagicMock(spec=FSMContext)
+        
+        with patch('src.bot.handlers.qa.storage.load_programs', return_value=[]), \
+             patch('src.bot.handlers.qa.llm_service.answer_question', side_effect=answer_question):
+            first_handler = asyncio.create_task(process_question(first, state))
+            await asyncio.sleep(0.01)
+            await process_question(second, state)
+            await first_handler
+        
+        # Первый вопрос получил только индикатор, который был удален
+        first.answer.assert_called_once()
+        first.answer.return_value.delete.assert_awaited()
+        assert "Ответ на второй вопрос" in second.answer.call_args[0][0]
+    
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_llm_stages(self):
+        message = MagicMock(spec=Message)
+        message.from_user = MagicMock(spec=User)
+        message.from_user.id = 888
+        message.text = "Расскажи, чем хороша магистратура"
+        processing_msg = MagicMock(spec=Message)
+        processing_msg.delete = AsyncMock()
+        message.answer = AsyncMock(return_value=processing_msg)
+        state = MagicMock(spec=FSMContext)
+        
+        with patch('src.bot.handlers.qa.storage.load_programs', return_value=ITMOParser()._get_mock_programs()), \
+             patch('src.bot.handlers.qa.llm_service.breaker', MagicMock(is_open=True)), \
+             patch('src.bot.handlers.qa.llm_service.answer_question') as answer_question, \
+             patch('src.bot.handlers.qa._try_general_llm_answer') as general_answer:
+            await process_question(message, state)
+        
+        answer_question.assert_not_called()
+        general_answer.assert_not_called()
+        assert message.answer.await_count == 2
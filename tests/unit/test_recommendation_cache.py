@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock
+from src.data.models import UserProfile, ProgramsDiff
+from src.services.parser_service import ITMOParser
+from src.services.recommendation_cache import RecommendationCache, profile_key
+
+def _profile(user_id, interests, background="Бакалавр информатики"):
+    return UserProfile(
+        user_id=user_id, background=background, interests=interests, goals=["Карьера в IT"],
+        created_at=datetime.now(), updated_at=datetime.now()
+    )
+
+@pytest.fixture
+def programs():
+    return ITMOParser()._get_mock_programs()
+
+def test_profile_key_ignores_order_case_and_user(programs):
+    first = _profile("1", ["Машинное обучение", "NLP"])
+    second = _profile("2", ["nlp", "Машинное обучение"], background="  бакалавр   ИНФОРМАТИКИ ")
+    other = _profile("3", ["Компьютерное зрение"])
+    
+    assert profile_key(first, programs) == profile_key(second, programs)
+    assert profile_key(first, programs) != profile_key(other, programs)
+
+@pytest.mark.asyncio
+async def test_precomputed_recommendation_is_shared_by_identical_profiles(programs):
+    cache = RecommendationCache()
+    generate = AsyncMock(return_value="Рекомендация")
+    cache.register(generate)
+    
+    cache.precompute(_profile("1", ["NLP"]), programs)
+    results = await asyncio.gather(cache.get(_profile("1", ["NLP"]), programs), cache.get(_profile("2", ["NLP"]), programs))
+    
+    assert results == ["Рекомендация", "Рекомендация"]
+    generate.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_failed_generation_is_not_cached_and_data_change_clears(programs):
+    cache = RecommendationCache()
+    generate = AsyncMock(side_effect=[None, "Рекомендация", "Новая рекомендация"])
+    cache.register(generate)
+    profile = _profile("1", ["NLP"])
+    
+    assert await cache.get(profile, programs) is None
+    assert await cache.get(profile, programs) == "Рекомендация"
+    assert await cache.get(profile, programs) == "Рекомендация"
+    
+    await cache.on_programs_changed(ProgramsDiff(changes=[], created_at=datetime.now()))
+    assert await cache.get(profile, programs) == "Новая рекомендация"
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded(programs):
+    cache = RecommendationCache(max_entries=2)
+    cache.register(AsyncMock(return_value="Рекомендация"))
+    
+    for interest in ["NLP", "CV", "RL"]:
+        await cache.get(_profile("1", [interest]), programs)
+    
+    assert len(cache._entries) == 2
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime
@@ -124,6 +125,8 @@ class TestRecommendationService:
         mock_llm_response = "Сравнение программ"
         
         with patch.object(recommendation_service, '_get_programs', return_value=mock_programs), \
+             patch('src.services.recommendation_service.storage.load_snapshot_artifact', AsyncMock(return_value=None)), \
+             patch('src.services.recommendation_service.storage.save_snapshot_artifact', AsyncMock()), \
              patch('src.services.recommendation_service.llm_service.generate_response', 
                    return_value=mock_llm_response):
             
@@ -137,4 +140,35 @@ class TestRecommendationService:
             
             result = await recommendation_service.compare_programs()
             
-            assert "недостаточно данных" in result.lower() 
\ No newline at end of file
+            assert "недостаточно данных" in result.lower()
+    
+    @pytest.mark.asyncio
+    async def test_comparison_generated_once_per_snapshot(self, recommendation_service, sample_programs, tmp_path):
+        from src.data.json_storage import JSONStorage
+        
+        generate = AsyncMock(return_value="Сравнение программ")
+        with patch.object(recommendation_service, '_get_programs', AsyncMock(return_value=sample_programs)), \
+             patch('src.services.recommendation_service.storage', JSONStorage(tmp_path)), \
+             patch('src.services.recommendation_service.llm_service.generate_response', generate):
+            results = await asyncio.gather(*(recommendation_service.compare_programs() for _ in range(3)))
+            
+            # Перезапуск: кэш в памяти пуст, сравнение читается с диска
+            restarted = RecommendationService()
+            with patch.object(restarted, '_get_programs', AsyncMock(return_value=sample_programs)):
+                assert await restarted.compare_programs() == "Сравнение программ"
+        
+        assert results == ["Сравнение программ"] * 3
+        generate.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_comparison_fallback_is_not_cached(self, recommendation_service, sample_programs, tmp_path):
+        from src.data.json_storage import JSONStorage
+        
+        generate = AsyncMock(side_effect=[None, "Сравнение программ"])
+        with patch.object(recommendation_service, '_get_programs', AsyncMock(return_value=sample_programs)), \
+             patch('src.services.recommendation_service.storage', JSONStorage(tmp_path)), \
+             patch('src.services.recommendation_service.llm_service.generate_response', generate):
+            fallback = await recommendation_service.compare_programs()
+            assert await recommendation_service.compare_programs() == "Сравнение программ"
+        
+        assert "Для детального анализа" in fallback
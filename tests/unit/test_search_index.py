@@ -0,0 +1,139 @@
+import pytest
+from datetime import datetime
+from src.data.json_storage import JSONStorage
+from src.data.models import ProgramChange, ProgramsDiff
+from src.services.parser_service import ITMOParser
+from src.services.program_changes import snapshot_version
+from src.services.search_index import CourseIndex, CourseIndexService, FuzzyNameIndex, bounded_edit_distance, transliterate
+from src.bot.handlers.qa import _try_data_search, _generate_simple_fallback_answer
+
+@pytest.fixture
+def programs():
+    return ITMOParser()._get_mock_programs()
+
+def test_search_exact_course_name(programs):
+    hits = CourseIndex(programs).search_courses("Есть ли курс Глубокое обучение?")
+    
+    assert hits[0].course.name == "Глубокое обучение"
+    assert hits[0].program.id == "ai"
+
+def test_search_partial_word_match(programs):
+    # "компьютерного" совпадает с "компьютерное" по префиксу, "зрение" - точно
+    hits = CourseIndex(programs).search_courses("Что изучают на курсе компьютерного зрение")
+    
+    assert [hit.course.name for hit in hits] == ["Компьютерное зрение"]
+
+@pytest.mark.parametrize("question", [
+    "Какие требования для поступления на обучение?",
+    "Расскажи про обучение в ИТМО",
+    "Нужен ли английский для обучения?",
+])
+def test_search_ignores_single_generic_word(programs, question):
+    # Одно общее слово ("обучение" ~ "обучения") - не упоминание курса: его префикс не второе совпадение
+    assert CourseIndex(programs).search_courses(question) == []
+
+def test_search_ranks_phrase_matches_first(programs):
+    hits = CourseIndex(programs).search_courses("математические методы и глубокое обучение")
+    
+    assert hits[0].course.name == "Глубокое обучение"
+    assert "Математические методы в ИИ" in [hit.course.name for hit in hits[1:]]
+
+def test_search_program_by_name_word(programs):
+    program = CourseIndex(programs).search_program("Расскажи про искусственный интеллект")
+    
+    assert program.id == "ai"
+
+def test_search_course_with_typo(programs):
+    hits = CourseIndex(programs).search_courses("Что такое компютерное зренье?")
+    
+    assert hits[0].course.name == "Компьютерное зрение"
+
+def test_search_course_in_translit(programs):
+    hits = CourseIndex(programs).search_courses("glubokoe obuchenie")
+    
+    assert hits[0].course.name == "Глубокое обучение"
+
+def test_search_without_fuzzy_returns_nothing_for_typo(programs):
+    assert CourseIndex(programs).search_courses("компютерное зренье", fuzzy=False) == []
+
+def test_search_program_with_typo(programs):
+    program = CourseIndex(programs).search_program("Расскажи про искуственный интелект")
+    
+    assert program.id == "ai"
+
+def test_fuzzy_index_matches_name_without_parentheses():
+    index = FuzzyNameIndex(["Компьютерное зрение (продвинутый уровень)", "Машинное обучение"])
+    
+    assert [idx for _, idx in index.search("kompyuternoe zrenie")] == [0]
+    assert index.search("расписание занятий") == []
+
+def test_transliterate():
+    assert transliterate("mashinnoe obuchenie") == "машинное обучение"
+
+def test_bounded_edit_distance():
+    assert bounded_edit_distance("зренье", "зрение", 2) == 1
+    assert bounded_edit_distance("зренье", "обучение", 2) is None
+
+def test_index_service_reuses_index_for_same_snapshot(programs):
+    service = CourseIndexService()
+    
+    first = service.get_index(programs)
+    
+    assert service.get_index(list(programs)) is first
+    # Повторный парсинг тех же данных дает тот же отпечаток содержимого
+    assert service.get_index(ITMOParser()._get_mock_programs()) is first
+    
+    changed = ITMOParser()._get_mock_programs()
+    changed[0].courses[0] = changed[0].courses[0].model_copy(update={"name": "Новый курс"})
+    assert service.get_index(changed) is not first
+
+def test_index_service_rebinds_programs_when_only_details_change(programs):
+    service = CourseIndexService()
+    first = service.get_index(programs)
+    
+    described = ITMOParser()._get_mock_programs()
+    described[0] = described[0].model_copy(update={"description": "Новое описание"})
+    
+    assert service.get_index(described) is first
+    hits = first.search_courses("машинное обучение")
+    assert hits and all(hit.program is described[0] for hit in hits if hit.program.id == described[0].id)
+
+@pytest.mark.asyncio
+async def test_index_service_keeps_index_on_details_only_diff(programs):
+    service = CourseIndexService()
+    first = service.get_index(programs)
+    diff = ProgramsDiff(changes=[ProgramChange(program_id="ai", status="changed", changed_details=["dormitory"])], created_at=datetime.now())
+    
+    await service.on_programs_changed(diff)
+    
+    assert service.get_index(programs) is first
+    
+    diff = ProgramsDiff(changes=[ProgramChange(program_id="ai", status="changed", added_courses=["Новый курс"])], created_at=datetime.now())
+    await service.on_programs_changed(diff)
+    
+    assert "ai" not in service._analyzed
+    assert service.get_index(programs) is not first
+
+@pytest.mark.asyncio
+async def test_index_service_reuses_index_across_storage_loads(programs, tmp_path):
+    storage = JSONStorage(data_dir=tmp_path)
+    version = await storage.save_programs(programs)
+    # Без бинарного снимка программы читаются из JSON
+    storage._programs_binary_file(version).unlink()
+    service = CourseIndexService()
+    
+    first = service.get_index(await storage.load_programs())
+    
+    assert service.get_index(await JSONStorage(data_dir=tmp_path).load_programs()) is first
+    assert snapshot_version(await storage.load_programs()) == snapshot_version(programs)
+
+def test_qa_data_search_uses_index(programs):
+    answer = _try_data_search("Что за курс Этика ИИ и безопасность?", programs)
+    
+    assert "**Этика ИИ и безопасность**" in answer
+    assert "Искусственный интеллект" in answer
+
+def test_qa_fallback_lists_multiple_courses(programs):
+    answer = _generate_simple_fallback_answer("правовые аспекты и этика ии безопасность", programs)
+    
+    assert "Найдено курсов: 2" in answer
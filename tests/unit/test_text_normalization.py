@@ -0,0 +1,28 @@
+from src.utils.text_normalization import stem, normalize, stem_set, contains_phrase, tokenize
+
+def test_russian_inflections_share_stem():
+    assert stem("обучения") == stem("обучением") == stem("обучение")
+    assert stem("компьютерного") == stem("компьютерное")
+    assert stem("нейронных") == stem("нейронные")
+
+def test_english_inflections_share_stem():
+    assert stem("learning") == stem("learned") == stem("learns") == "learn"
+    assert stem("networks") == stem("network")
+
+def test_tokenize_handles_punctuation_and_yo():
+    assert tokenize("Ещё вопрос: NLP-курсы?") == ["еще", "вопрос", "nlp", "курсы"]
+
+def test_normalize_drops_stop_words():
+    assert normalize("Что изучают на курсе машинного обучения?") == ("изуча", "курс", "машин", "обучен")
+    assert len(normalize("что на", keep_stop_words=True)) == 2
+
+def test_normalize_min_length():
+    assert normalize("ИИ и анализ данных", min_length=3) == (stem("анализ"), stem("данных"))
+
+def test_stem_set_matches_across_forms():
+    assert stem_set("машинное обучение") == stem_set("машинного обучения")
+
+def test_contains_phrase_matches_whole_words():
+    assert contains_phrase("Расскажи про погоду", "погода")
+    assert contains_phrase("Веди себя как пират", "веди себя как")
+    assert not contains_phrase("Контроль качества моделей", "роль")
@@ -0,0 +1,39 @@
+from src.utils.token_budget import TokenEstimator, plan_budget, context_size, ANSWER_BUDGETS
+
+def test_estimate_counts_cyrillic_denser_than_latin():
+    estimator = TokenEstimator()
+    
+    assert estimator.estimate("а" * 300) > estimator.estimate("a" * 300)
+
+def test_context_size_rounds_to_power_of_two_within_bounds():
+    assert context_size(100, 2048, 32768) == 2048
+    assert context_size(5000, 2048, 32768) == 8192
+    assert context_size(100000, 2048, 32768) == 32768
+
+def test_budget_grows_with_prompt():
+    estimator = TokenEstimator()
+    
+    short = plan_budget(estimator, "Короткий вопрос", "general", 2048, 32768)
+    long = plan_budget(estimator, "Каталог программ и курсов. " * 800, "qa", 2048, 32768)
+    
+    assert short.num_ctx == 2048
+    assert short.num_predict == ANSWER_BUDGETS['general']
+    assert long.num_ctx >= long.prompt_tokens + long.num_predict
+
+def test_budget_keeps_answer_room_when_prompt_overflows():
+    budget = plan_budget(TokenEstimator(), "текст " * 50000, "qa", 2048, 4096)
+    
+    assert budget.num_ctx == 4096
+    assert budget.num_predict == ANSWER_BUDGETS['qa'] // 4
+
+def test_observe_calibrates_scale_and_ignores_cached_prompts():
+    estimator = TokenEstimator(smoothing=1.0)
+    text = "Машинное обучение и анализ данных. " * 50
+    raw = estimator.estimate(text)
+    
+    estimator.observe(text, int(raw * 1.2))
+    assert 1.15 < estimator.scale < 1.25
+    
+    # Почти весь промпт взят из кэша - замер не учитывается
+    estimator.observe(text, 10)
+    assert 1.15 < estimator.scale < 1.25